@@ -7,9 +7,8 @@ set -euo pipefail
 #  • Xorg dummy driver configuration
 #  • display.service       (Xorg)
 #  • sitrad.service        (Wine Sitrad under virtual display)
-#  • send_to_tb.service    (telemetry push to ThingsBoard)
-#  • send_to_tb.timer      (runs every 30 seconds)
-#  • watchdog.service      (auto-recovery watchdog)
+#  • send_to_tb.service    (telemetry push daemon, sends new rows as they arrive,
+#                            with the Sitrad health monitor / auto-recovery)
 #  • user-level lingering for autostart at boot
 ###############################################################################
 
@@ -127,61 +126,43 @@ RestartSec=3
 WantedBy=default.target
 EOF
 
-# 6) Create send_to_tb.service (push telemetry)
+# 6) Create send_to_tb.service (long-running telemetry push daemon)
 echo "Creating send_to_tb.service..."
 SEND_SCRIPT="$BASEDIR/send_to_tb/main.py"
 cat > "$UNIT_DIR/send_to_tb.service" <<EOF
 [Unit]
-Description=Send telemetry to ThingsBoard
-Wants=sitrad.service
-After=sitrad.service
+Description=Send telemetry to ThingsBoard (daemon, every DAEMON_INTERVAL_SEC)
+Wants=sitrad.service network-online.target
+After=sitrad.service network-online.target
 
 [Service]
-Type=oneshot
+Type=simple
 WorkingDirectory=$BASEDIR/send_to_tb
 Environment=PYTHONUNBUFFERED=1
-ExecStart=$BASEDIR/venv/bin/python3 -u $SEND_SCRIPT
+ExecStartPre=/bin/sleep 20
+ExecStart=$BASEDIR/venv/bin/python3 -u $SEND_SCRIPT --daemon
+KillSignal=SIGTERM
+TimeoutStopSec=60
+Restart=always
+RestartSec=10
 
 [Install]
 WantedBy=default.target
 EOF
 
-# 7) Create send_to_tb.timer (every 30 seconds)
-echo "Creating send_to_tb.timer..."
-cat > "$UNIT_DIR/send_to_tb.timer" <<EOF
-[Unit]
-Description=Run send_to_tb.service every 30 seconds
-Wants=network-online.target
-After=network-online.target
-
-[Timer]
-OnStartupSec=20s
-OnUnitActiveSec=30s
-AccuracySec=1s
-Persistent=true
-
-[Install]
-WantedBy=timers.target
-EOF
-
-# 8) Create watchdog.service (check usb + telemetry)
-echo "Creating watchdog.service..."
-WATCHDOG_SCRIPT="$BASEDIR/scripts/watchdog/watchdog.sh"
-cat > "$UNIT_DIR/watchdog.service" <<EOF
-[Unit]
-Description=Watchdog — Monitors USB and telemetry logs to auto-recover Sitrad
-Wants=sitrad.service
-After=sitrad.service
-
-[Service]
-Type=simple
-ExecStart=$WATCHDOG_SCRIPT
-Restart=always
-RestartSec=5
+# 7) Remove the legacy send_to_tb.timer (replaced by --daemon)
+if [ -f "$UNIT_DIR/send_to_tb.timer" ]; then
+  echo "Removing legacy send_to_tb.timer..."
+  systemctl --user disable --now send_to_tb.timer 2>/dev/null || true
+  rm -f "$UNIT_DIR/send_to_tb.timer"
+fi
 
-[Install]
-WantedBy=default.target
-EOF
+# 8) Remove the legacy watchdog.service (replaced by the daemon's health monitor)
+if [ -f "$UNIT_DIR/watchdog.service" ]; then
+  echo "Removing legacy watchdog.service..."
+  systemctl --user disable --now watchdog.service 2>/dev/null || true
+  rm -f "$UNIT_DIR/watchdog.service"
+fi
 
 # 9) Reload systemd and enable everything
 echo "Reloading systemd user units..."
@@ -190,8 +171,7 @@ systemctl --user daemon-reload
 echo "Enabling and starting services..."
 systemctl --user enable --now display.service
 systemctl --user enable --now sitrad.service
-systemctl --user enable --now send_to_tb.timer
-systemctl --user enable --now watchdog.service
+systemctl --user enable --now send_to_tb.service
 
 # 10) Enable linger so user services auto-start at boot
 echo "Enabling linger for user $(whoami)..."
@@ -204,14 +184,13 @@ Services installed and running:
    - journald retention policy (200M / 7d)
    - display.service      (Xorg dummy only)
    - sitrad.service       (Wine Sitrad using DISPLAY=:1)
-   - send_to_tb.timer     (pushes data every 30 seconds)
-   - watchdog.service     (monitors USB + telemetry, auto-restarts Sitrad)
+   - send_to_tb.service   (daemon, pushes new rows within seconds and
+                           auto-restarts Sitrad on USB loss or stalled data)
 
 To monitor logs:
    journalctl --user -u display.service -f        # Follow Xorg Display logs
    journalctl --user -u sitrad.service -f         # Follow Sitrad logs
-   journalctl --user -u send_to_tb.service -n 50  # Last 50 lines of telemetry-sender logs
-   journalctl --user -u watchdog.service -f       # Follow Watchdog logs
+   journalctl --user -u send_to_tb.service -f     # Follow telemetry-sender logs
    journalctl --disk-usage
 EOF
 
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+fake_mqtt_broker.py — Local stand-in for the ThingsBoard MQTT API (MQTT 3.1.1).
+
+  python fake_mqtt_broker.py [--latency-ms 50] [--p-no-puback 0.01]
+                             [--p-disconnect 0.01] [--seed 1]
+
+Accepts any CONNECT and PUBLISH on v1/devices/me/telemetry or
+v1/gateway/telemetry (plain JSON), and answers QoS 1 publishes:
+  - by closing the connection when an entry carries the poison Temp1 value
+    (-999.9); ThingsBoard has no per-message rejection over MQTT 3.1.1,
+  - by closing the connection, or by never sending the PUBACK, with the
+    given probabilities (the client then times out and retries),
+  - with a PUBACK otherwise, after the configured latency.
+The listening port is printed as "PORT <n>" on the first stdout line; on
+SIGTERM/SIGINT the counters are printed as JSON and the broker exits.
+"""
+
+import json
+import random
+import signal
+import struct
+import argparse
+import threading
+import socketserver
+
+POISON_TEMP1 = -999.9
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+class Stats:
+    """Thread-safe publish counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {
+            "connections": 0, "publishes": 0, "accepted": 0, "entries": 0,
+            "values": 0, "bytes_in": 0, "poisoned": 0, "withheld_pubacks": 0,
+            "disconnects": 0,
+        }
+
+    def add(self, **amounts) -> None:
+        with self.lock:
+            for key, amount in amounts.items():
+                self.counts[key] += amount
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+def telemetry_entries(document) -> list[dict]:
+    """
+    Entries of a device-topic body ([{"ts", "values"}, …] or one entry)
+    or of a gateway-topic body ({device name: [entries]}).
+    """
+    if isinstance(document, list):
+        return document
+    if isinstance(document, dict) and "values" not in document:
+        return [entry for entries in document.values() for entry in entries]
+    return [document]
+
+
+def make_handler(stats: Stats, latency_sec: float, p_no_puback: float,
+                 p_disconnect: float, rng: random.Random):
+    """Build the connection handler class bound to one broker's settings."""
+    rng_lock = threading.Lock()
+
+    class Handler(socketserver.BaseRequestHandler):
+
+        def setup(self):
+            self.send_lock = threading.Lock()
+            stats.add(connections=1)
+
+        def handle(self):
+            try:
+                while True:
+                    packet_type, flags, body = self._read_packet()
+                    if packet_type == CONNECT:
+                        self._send(bytes([CONNACK << 4, 2, 0, 0]))
+                    elif packet_type == PUBLISH:
+                        if not self._on_publish(flags, body):
+                            return
+                    elif packet_type == PINGREQ:
+                        self._send(bytes([PINGRESP << 4, 0]))
+                    elif packet_type == DISCONNECT:
+                        return
+            except (EOFError, OSError):
+                return
+
+        def _on_publish(self, flags: int, body: bytes) -> bool:
+            """Account for one PUBLISH and acknowledge it; False closes the connection."""
+            qos = (flags >> 1) & 3
+            topic_len = struct.unpack(">H", body[:2])[0]
+            offset = 2 + topic_len
+            packet_id = b""
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+            payload = body[offset:]
+            stats.add(publishes=1, bytes_in=len(payload))
+
+            with rng_lock:
+                roll = rng.random()
+            if roll < p_disconnect:
+                stats.add(disconnects=1)
+                return False
+            try:
+                entries = telemetry_entries(json.loads(payload))
+            except ValueError:
+                entries = None
+            if entries is None or any(
+                    (e.get("values") or {}).get("Temp1") == POISON_TEMP1 for e in entries):
+                stats.add(poisoned=1)
+                return False
+
+            stats.add(
+                accepted=1,
+                entries=len(entries),
+                values=sum(len(e.get("values") or {}) for e in entries)
+            )
+            if not qos:
+                return True
+            if roll < p_disconnect + p_no_puback:
+                stats.add(withheld_pubacks=1)
+                return True
+
+            puback = bytes([PUBACK << 4, 2]) + packet_id
+            if latency_sec:
+                # Acknowledge later without blocking the next publishes
+                threading.Timer(latency_sec, self._send_quietly, (puback,)).start()
+            else:
+                self._send(puback)
+            return True
+
+        def _read_packet(self) -> tuple[int, int, bytes]:
+            """Read one control packet: (type, flags, variable header + payload)."""
+            header = self._read(1)[0]
+            length, multiplier = 0, 1
+            while True:
+                digit = self._read(1)[0]
+                length += (digit & 0x7F) * multiplier
+                multiplier *= 128
+                if not digit & 0x80:
+                    break
+            return header >> 4, header & 0x0F, self._read(length)
+
+        def _read(self, size: int) -> bytes:
+            data = b""
+            while len(data) < size:
+                chunk = self.request.recv(size - len(data))
+                if not chunk:
+                    raise EOFError
+                data += chunk
+            return data
+
+        def _send(self, data: bytes) -> None:
+            with self.send_lock:
+                self.request.sendall(data)
+
+        def _send_quietly(self, data: bytes) -> None:
+            try:
+                self._send(data)
+            except OSError:
+                pass
+
+    return Handler
+
+
+class Broker(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local ThingsBoard MQTT stand-in.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--p-no-puback", type=float, default=0.0)
+    parser.add_argument("--p-disconnect", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    stats = Stats()
+    handler = make_handler(
+        stats, args.latency_ms / 1000.0, args.p_no_puback, args.p_disconnect,
+        random.Random(args.seed)
+    )
+    server = Broker(("127.0.0.1", args.port), handler)
+    print(f"PORT {server.server_address[1]}", flush=True)
+
+    def _stop(_signum, _frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        print(json.dumps(stats.snapshot()), flush=True)
+
+
+if __name__ == "__main__":
+    main()
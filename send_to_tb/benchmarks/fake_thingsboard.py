@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+fake_thingsboard.py — Local stand-in for the ThingsBoard device HTTP API.
+
+  python fake_thingsboard.py [--latency-ms 50] [--p429 0.05] [--retry-after 1]
+                             [--p5xx 0.02] [--seed 1]
+
+Accepts POST /api/v1/<token>/telemetry (plain or gzip JSON) and answers:
+  - 400 when an entry carries the poison Temp1 value (-999.9),
+  - 429 with Retry-After, or 503, with the given probabilities,
+  - 200 otherwise, after the configured latency.
+GET /stats returns the counters as JSON. The listening port is printed as
+"PORT <n>" on the first stdout line.
+"""
+
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+POISON_TEMP1 = -999.9
+
+
+class Stats:
+    """Thread-safe request counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {
+            "requests": 0, "accepted": 0, "entries": 0, "values": 0,
+            "bytes_in": 0, "status_400": 0, "status_429": 0, "status_503": 0,
+        }
+
+    def add(self, **amounts) -> None:
+        with self.lock:
+            for key, amount in amounts.items():
+                self.counts[key] += amount
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.counts)
+
+
+def make_handler(stats: Stats, latency_sec: float, p429: float, retry_after: float,
+                 p5xx: float, rng: random.Random):
+    """Build the request handler class bound to one server's settings."""
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoint
+
+        def log_message(self, *_args):
+            pass
+
+        def do_GET(self):
+            if self.path != "/stats":
+                return self._reply(404)
+            self._reply(200, json.dumps(stats.snapshot()).encode())
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            stats.add(requests=1, bytes_in=len(raw))
+            if latency_sec:
+                time.sleep(latency_sec)
+
+            with rng_lock:
+                roll = rng.random()
+            if roll < p429:
+                stats.add(status_429=1)
+                return self._reply(429, headers={"Retry-After": f"{retry_after:g}"})
+            if roll < p429 + p5xx:
+                stats.add(status_503=1)
+                return self._reply(503)
+
+            body = gzip.decompress(raw) if self.headers.get("Content-Encoding") == "gzip" else raw
+            try:
+                document = json.loads(body)
+            except ValueError:
+                stats.add(status_400=1)
+                return self._reply(400, b"invalid JSON")
+
+            entries = document if isinstance(document, list) else [document]
+            if any((e.get("values") or {}).get("Temp1") == POISON_TEMP1 for e in entries):
+                stats.add(status_400=1)
+                return self._reply(400, b"invalid telemetry value")
+
+            stats.add(
+                accepted=1,
+                entries=len(entries),
+                values=sum(len(e.get("values") or {}) for e in entries)
+            )
+            self._reply(200)
+
+        def _reply(self, code: int, body: bytes = b"", headers: dict | None = None):
+            self.send_response(code)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local ThingsBoard HTTP stand-in.")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--p429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--p5xx", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    handler = make_handler(
+        Stats(), args.latency_ms / 1000.0, args.p429, args.retry_after,
+        args.p5xx, random.Random(args.seed)
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    server.daemon_threads = True
+    print(f"PORT {server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
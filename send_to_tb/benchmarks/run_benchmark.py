@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+run_benchmark.py — End-to-end benchmark of one SendToLauncher cycle.
+
+Builds a synthetic Sitrad database, starts the local ThingsBoard stand-in
+(HTTP, or the MQTT broker stand-in with --transport mqtt) and optionally a
+concurrent Sitrad-like writer as separate processes,
+then runs SendToLauncher.start() in this process with the regular
+main.build_launcher() wiring and reports rows/s, peak RSS, CPU time and
+SQLite file growth. Only the launcher is measured: the database generator,
+the server and the writer run in their own processes.
+
+Examples:
+  python benchmarks/run_benchmark.py --rows 100000
+  python benchmarks/run_benchmark.py --rows 50000 --latency-ms 80 --p429 0.05 \\
+      --p5xx 0.02 --poison-every 5000 --writer-rate 20 --env SEND_CONCURRENCY=4
+  python benchmarks/run_benchmark.py --rows 50000 --logging queue --env LOG_LEVEL=INFO \\
+      2>/dev/null
+  python benchmarks/run_benchmark.py --rows 50000 --transport mqtt --latency-ms 20 \\
+      --p-no-puback 0.01 --env POST_TIMEOUT_SEC=2
+
+--logging sync|queue writes the service's log file into the work directory
+(console output goes to stderr) and reports the logging cost of the cycle:
+records, time spent by the logging threads inside handlers, and bytes
+written. "sync" is the former direct console + file setup, "queue" the
+QueueHandler pipeline of utils.log.log_setup.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import logging
+import argparse
+import resource
+import threading
+import tempfile
+import subprocess
+import urllib.request
+from pathlib import Path
+
+bench_dir = Path(__file__).resolve().parent
+pkg_dir = bench_dir.parent
+sys.path.insert(0, str(pkg_dir))
+
+from main import build_launcher
+from utils.config import Config
+from utils.db.db_connect import get_sqlite_connection
+from utils.log.log_setup import setup_logging, stop_logging
+
+BENCH_ENV = {
+    "DEVICE_TOKEN": "benchmark",
+    "BATCH_WINDOW_SEC": "0",
+    "INITIAL_DELAY_MS": "50",
+    "MAX_DELAY_SEC": "2",
+    "LOG_LEVEL": "WARNING",
+    "WATERMARK_FILE": "",
+    "METRICS_TEXTFILE": "",
+    "METRICS_JSON_FILE": "",
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark one send cycle end to end.")
+    parser.add_argument("--rows", type=int, default=100_000, help="telemetry rows to generate")
+    parser.add_argument("--alarms", type=int, default=100, help="alarm rows to generate")
+    parser.add_argument("--controllers", type=int, default=8)
+    parser.add_argument("--poison-every", type=int, default=0,
+                        help="every Nth row is rejected by the server with 400 (0 = none)")
+    parser.add_argument("--no-wal", action="store_true", help="create the DB in rollback-journal mode")
+    parser.add_argument("--writer-rate", type=float, default=0.0,
+                        help="rows/s appended by a concurrent Sitrad-like writer (0 = off)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="server latency per POST")
+    parser.add_argument("--p429", type=float, default=0.0, help="probability of 429 + Retry-After")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds on 429")
+    parser.add_argument("--p5xx", type=float, default=0.0, help="probability of 503")
+    parser.add_argument("--transport", choices=("http", "mqtt"), default="http",
+                        help="send over the HTTP stand-in or the MQTT broker stand-in")
+    parser.add_argument("--p-no-puback", type=float, default=0.0,
+                        help="MQTT: probability that a publish is never acknowledged")
+    parser.add_argument("--p-disconnect", type=float, default=0.0,
+                        help="MQTT: probability that the broker drops the connection on a publish")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra .env setting for the launcher (repeatable)")
+    parser.add_argument("--workdir", help="keep the database here instead of a temp dir")
+    parser.add_argument("--logging", choices=("basic", "sync", "queue"), default="basic",
+                        help="log pipeline to measure (basic = stderr only, not measured)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args()
+
+
+def start_server(args: argparse.Namespace) -> tuple[subprocess.Popen, int]:
+    """Start fake_thingsboard.py or fake_mqtt_broker.py and return (process, port)."""
+    if args.transport == "mqtt":
+        command = [
+            sys.executable, str(bench_dir / "fake_mqtt_broker.py"),
+            "--latency-ms", str(args.latency_ms),
+            "--p-no-puback", str(args.p_no_puback),
+            "--p-disconnect", str(args.p_disconnect),
+        ]
+    else:
+        command = [
+            sys.executable, str(bench_dir / "fake_thingsboard.py"),
+            "--latency-ms", str(args.latency_ms),
+            "--p429", str(args.p429),
+            "--retry-after", str(args.retry_after),
+            "--p5xx", str(args.p5xx),
+        ]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().split()
+    if len(line) != 2 or line[0] != "PORT":
+        proc.kill()
+        raise RuntimeError("fake ThingsBoard server did not start")
+    return proc, int(line[1])
+
+
+def server_stats(args: argparse.Namespace, server: subprocess.Popen, port: int) -> dict:
+    """
+    Fetch the stand-in's counters: from /stats over HTTP; the MQTT broker
+    prints them when stopped.
+    """
+    if args.transport == "mqtt":
+        server.send_signal(signal.SIGTERM)
+        output, _ = server.communicate(timeout=30)
+        return json.loads(output or "{}")
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5) as response:
+        return json.load(response)
+
+
+class TimedHandler(logging.Handler):
+    """
+    Wraps a handler and adds up the time logging callers spend in it, i.e.
+    what a log call costs the thread that made it.
+    """
+
+    def __init__(self, inner: logging.Handler):
+        super().__init__()
+        self.inner = inner
+        self.records = 0
+        self.seconds = 0.0
+        self._counter_lock = threading.Lock()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        started = time.perf_counter()
+        self.inner.handle(record)
+        elapsed = time.perf_counter() - started
+        with self._counter_lock:
+            self.records += 1
+            self.seconds += elapsed
+        return True
+
+
+def configure_logging(mode: str, cfg: Config, workdir: Path) -> list[TimedHandler]:
+    """
+    Install the log pipeline under test; returns the timing wrappers put
+    around the root handlers (none in basic mode).
+    """
+    log_format = "%(asctime)s [%(levelname)s] %(name)s — %(message)s"
+    if mode == "basic":
+        logging.basicConfig(level=cfg.log_level, format=log_format)
+        return []
+
+    if mode == "sync":
+        logs_dir = workdir / "logs"
+        logs_dir.mkdir(parents=True, exist_ok=True)
+        logging.basicConfig(
+            level=cfg.log_level,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+            handlers=[
+                logging.StreamHandler(sys.stderr),
+                logging.FileHandler(logs_dir / cfg.log_file, mode="a")
+            ],
+            force=True
+        )
+    else:
+        setup_logging(
+            workdir,
+            level=cfg.log_level,
+            log_file=cfg.log_file,
+            max_bytes=int(cfg.log_max_mb * 1024 * 1024),
+            backup_count=cfg.log_backup_count,
+            compress=cfg.log_compress,
+            stream=sys.stderr
+        )
+
+    root = logging.getLogger()
+    timers = [TimedHandler(handler) for handler in root.handlers]
+    root.handlers = list(timers)
+    return timers
+
+
+def log_bytes(workdir: Path) -> int:
+    """Bytes in the work directory's log files, rotated archives included."""
+    logs_dir = workdir / "logs"
+    if not logs_dir.is_dir():
+        return 0
+    return sum(path.stat().st_size for path in logs_dir.iterdir() if path.is_file())
+
+
+def file_sizes(db_path: str) -> dict:
+    """Sizes of the database, its WAL and shared-memory files, in bytes."""
+    sizes = {}
+    for name, path in (("db", db_path), ("wal", f"{db_path}-wal"), ("shm", f"{db_path}-shm")):
+        sizes[name] = os.path.getsize(path) if os.path.exists(path) else 0
+    return sizes
+
+
+def count_rows(db_path: str) -> int:
+    """Telemetry rows currently in the database."""
+    conn = get_sqlite_connection(db_path, timeout=30)
+    return conn.execute("SELECT COUNT(*) FROM tc900log").fetchone()[0]
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Prepare the environment, run one cycle and collect the figures."""
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="send_to_tb_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    db_path = str(workdir / "data.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    generate = [
+        sys.executable, str(bench_dir / "synthetic_db.py"), "create", db_path,
+        "--rows", str(args.rows), "--alarms", str(args.alarms),
+        "--controllers", str(args.controllers), "--poison-every", str(args.poison_every),
+    ]
+    if args.no_wal:
+        generate.append("--no-wal")
+    started = time.perf_counter()
+    subprocess.run(generate, check=True)
+    generate_sec = time.perf_counter() - started
+    sizes_before = file_sizes(db_path)
+
+    server, port = start_server(args)
+    writer = None
+    try:
+        os.environ.update(BENCH_ENV)
+        os.environ["DB_PATH"] = db_path
+        os.environ["TB_BASE_URL"] = f"http://127.0.0.1:{port}"
+        if args.transport == "mqtt":
+            os.environ.update({
+                "TRANSPORT": "mqtt",
+                "MQTT_HOST": "127.0.0.1",
+                "MQTT_PORT": str(port),
+                "MQTT_TLS": "false",
+                "MQTT_CLIENT_ID": f"send_to_tb_bench_{os.getpid()}",
+            })
+        for item in args.env:
+            key, _, value = item.partition("=")
+            os.environ[key.strip()] = value.strip()
+
+        cfg = Config.from_env()
+        log_timers = configure_logging(args.logging, cfg, workdir)
+        launcher = build_launcher(cfg)
+
+        if args.writer_rate > 0:
+            writer = subprocess.Popen(
+                [sys.executable, str(bench_dir / "synthetic_db.py"), "write", db_path,
+                 "--rate", str(args.writer_rate), "--controllers", str(args.controllers)],
+                stdout=subprocess.PIPE,
+                text=True
+            )
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        started = time.perf_counter()
+        launcher.start()
+        elapsed = time.perf_counter() - started
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+        writer_inserted = 0
+        if writer:
+            writer.send_signal(signal.SIGTERM)
+            output, _ = writer.communicate(timeout=30)
+            writer_inserted = json.loads(output or "{}").get("inserted", 0)
+            writer = None
+
+        stats = server_stats(args, server, port)
+        for timer in log_timers:
+            timer.inner.flush()
+        if args.logging == "queue":
+            stop_logging()
+    finally:
+        if writer:
+            writer.kill()
+        server.terminate()
+        server.wait(timeout=10)
+
+    cycle = launcher.metrics.last if launcher.metrics else {}
+    rows_sent = cycle.get("rows_sent")
+    cpu_sec = (
+        (usage_after.ru_utime - usage_before.ru_utime)
+        + (usage_after.ru_stime - usage_before.ru_stime)
+    )
+    sizes_after = file_sizes(db_path)
+    report = {
+        "rows_generated": args.rows,
+        "generate_seconds": round(generate_sec, 3),
+        "writer_rows_inserted": writer_inserted,
+        "cycle_seconds": round(elapsed, 3),
+        "rows_sent": rows_sent,
+        "rows_left": count_rows(db_path),
+        "rows_per_second": round(rows_sent / elapsed, 1) if rows_sent and elapsed else None,
+        "cpu_seconds": round(cpu_sec, 3),
+        "cpu_percent": round(100.0 * cpu_sec / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(usage_after.ru_maxrss / 1024.0, 1),
+        "stage_seconds": {
+            stage: round(cycle.get(f"{stage}_seconds", 0.0), 3)
+            for stage in ("fetch", "delete", "compaction")
+        },
+        "retries": cycle.get("retries"),
+        "splits": cycle.get("splits"),
+        "file_bytes_before": sizes_before,
+        "file_bytes_after": sizes_after,
+        "file_growth_bytes": sum(sizes_after.values()) - sum(sizes_before.values()),
+        "server": stats,
+        "logging": {
+            "mode": args.logging,
+            "records": log_timers[0].records if log_timers else None,
+            "caller_seconds": round(sum(t.seconds for t in log_timers), 4) if log_timers else None,
+            "file_bytes": log_bytes(workdir) if log_timers else None,
+        },
+    }
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: dict) -> None:
+    """Human-readable summary."""
+    print(f"rows generated     {report['rows_generated']} ({report['generate_seconds']}s)")
+    if report["writer_rows_inserted"]:
+        print(f"writer inserted    {report['writer_rows_inserted']}")
+    print(f"cycle              {report['cycle_seconds']}s")
+    print(f"rows sent / left   {report['rows_sent']} / {report['rows_left']}")
+    print(f"throughput         {report['rows_per_second']} rows/s")
+    print(f"CPU                {report['cpu_seconds']}s ({report['cpu_percent']}%)")
+    print(f"peak RSS           {report['peak_rss_mb']} MB")
+    stages = ", ".join(f"{k} {v}s" for k, v in report["stage_seconds"].items())
+    print(f"stages             {stages}")
+    print(f"retries / splits   {report['retries']} / {report['splits']}")
+    before, after = report["file_bytes_before"], report["file_bytes_after"]
+    print(f"db / wal bytes     {before['db']} → {after['db']} / {before['wal']} → {after['wal']}"
+          f" (growth {report['file_growth_bytes']})")
+    server = report["server"]
+    if "publishes" in server:
+        print(f"broker             {server['publishes']} publish(es), {server['accepted']} accepted, "
+              f"{server['withheld_pubacks']} PUBACK(s) withheld, {server['disconnects']} disconnect(s), "
+              f"{server['poisoned']} poisoned, {server['connections']} connection(s), "
+              f"{server['bytes_in']} bytes in")
+    else:
+        print(f"server             {server['requests']} request(s), {server['accepted']} accepted, "
+              f"{server['status_429']}×429, {server['status_503']}×503, {server['status_400']}×400, "
+              f"{server['bytes_in']} bytes in")
+    logging_cost = report["logging"]
+    if logging_cost["records"] is not None:
+        print(f"logging ({logging_cost['mode']})    {logging_cost['records']} record(s), "
+              f"{logging_cost['caller_seconds']}s in callers, {logging_cost['file_bytes']} bytes written")
+
+
+def main() -> None:
+    args = parse_args()
+    report = run(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+synthetic_db.py — Builds a Sitrad-like SQLite file for benchmarks, and
+optionally keeps appending rows to it the way Sitrad does.
+
+  python synthetic_db.py create PATH --rows 100000 [--alarms 500] [--poison-every 0]
+                                     [--time-column inserted_ts_ms]
+  python synthetic_db.py write  PATH --rate 20 [--controllers 8]
+
+`write` runs until SIGTERM/SIGINT and then prints {"inserted": N} on stdout.
+"""
+
+import json
+import time
+import random
+import signal
+import sqlite3
+import argparse
+from datetime import datetime, timedelta
+
+TELEMETRY_DDL = """
+    CREATE TABLE IF NOT EXISTS tc900log (
+        id     INTEGER,
+        data   TEXT,
+        Temp1  INTEGER,
+        Temp2  INTEGER,
+        defr   INTEGER,
+        fans   INTEGER,
+        refr   INTEGER,
+        dig1   INTEGER,
+        dig2   INTEGER
+    )
+"""
+
+ALARM_DDL = """
+    CREATE TABLE IF NOT EXISTS rel_alarmes (
+        id         INTEGER,
+        codigo     INTEGER,
+        descricao  TEXT,
+        data       TEXT
+    )
+"""
+
+TELEMETRY_INSERT = """
+    INSERT INTO tc900log (id, data, Temp1, Temp2, defr, fans, refr, dig1, dig2)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Temp1 raw value the fake server rejects with HTTP 400 (-999.9 after scaling)
+POISON_TEMP1 = -9999
+
+CHUNK_ROWS = 50_000
+
+
+class ControllerSimulator:
+    """
+    Random-walk readings for a set of TC-900 controllers, in Sitrad's raw
+    units (tenths of a degree, 0/1 digital states).
+    """
+
+    def __init__(self, controllers: int, seed: int = 1):
+        self.rng = random.Random(seed)
+        self.temps = {addr: self.rng.randint(-250, 60) for addr in range(1, controllers + 1)}
+        self.controllers = controllers
+
+    def row(self, addr: int, when: datetime, poison: bool = False) -> tuple:
+        """One tc900log row for controller addr at time when."""
+        temp = self.temps[addr] + self.rng.randint(-3, 3)
+        self.temps[addr] = temp
+        refr = 1 if temp > -180 else 0
+        return (
+            addr,
+            when.strftime("%Y-%m-%d %H:%M:%S"),
+            POISON_TEMP1 if poison else temp,
+            temp + self.rng.randint(-20, 20),
+            1 if self.rng.random() < 0.02 else 0,
+            refr,
+            refr,
+            self.rng.randint(0, 1),
+            0,
+        )
+
+
+def create_database(
+    path: str,
+    rows: int,
+    alarms: int = 0,
+    controllers: int = 8,
+    poison_every: int = 0,
+    wal: bool = True,
+    seed: int = 1,
+    time_column: str | None = "inserted_ts_ms"
+) -> None:
+    """
+    Create path with `rows` telemetry rows spread over `controllers`
+    addresses, one reading per controller per minute, plus `alarms` alarm rows.
+    Every poison_every-th row (0 = none) carries POISON_TEMP1.
+    With time_column, the rows are stamped from their `data` time, as if the
+    insert stamping had been running (otherwise the migration backfills them
+    all with the same time).
+    """
+    sim = ControllerSimulator(controllers, seed)
+    start = datetime.now() - timedelta(minutes=rows // controllers + 1)
+
+    conn = sqlite3.connect(path)
+    try:
+        if wal:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(TELEMETRY_DDL)
+        conn.execute(ALARM_DDL)
+
+        def telemetry_rows():
+            for i in range(rows):
+                addr = i % controllers + 1
+                when = start + timedelta(minutes=i // controllers)
+                poison = bool(poison_every) and i % poison_every == poison_every - 1
+                yield sim.row(addr, when, poison)
+
+        generator = telemetry_rows()
+        while True:
+            chunk = [row for _, row in zip(range(CHUNK_ROWS), generator)]
+            if not chunk:
+                break
+            with conn:
+                conn.executemany(TELEMETRY_INSERT, chunk)
+
+        if time_column:
+            with conn:
+                conn.execute(f"ALTER TABLE tc900log ADD COLUMN {time_column} INTEGER DEFAULT 0")
+                conn.execute(
+                    f"UPDATE tc900log SET {time_column} = "
+                    f"CAST(strftime('%s', data) AS INTEGER) * 1000 WHERE {time_column} = 0"
+                )
+
+        with conn:
+            conn.executemany(
+                "INSERT INTO rel_alarmes VALUES (?, ?, ?, ?)",
+                [
+                    (i % controllers + 1, 100 + i % 7, f"Alarm {i % 7}",
+                     (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S"))
+                    for i in range(alarms)
+                ]
+            )
+    finally:
+        conn.close()
+
+
+def run_writer(path: str, rate: float, controllers: int = 8, seed: int = 2) -> int:
+    """
+    Insert about `rate` rows per second, one small transaction per controller
+    poll like Sitrad, until SIGTERM/SIGINT. Returns the number of rows inserted.
+    """
+    stop = False
+
+    def _stop(_signum, _frame):
+        nonlocal stop
+        stop = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    sim = ControllerSimulator(controllers, seed)
+    conn = sqlite3.connect(path, timeout=30)
+    interval = 1.0 / rate if rate > 0 else 1.0
+    inserted = 0
+    addr = 1
+    next_at = time.monotonic()
+    try:
+        while not stop:
+            with conn:
+                conn.execute(TELEMETRY_INSERT, sim.row(addr, datetime.now()))
+            inserted += 1
+            addr = addr % controllers + 1
+            next_at += interval
+            time.sleep(max(next_at - time.monotonic(), 0.0))
+    finally:
+        conn.close()
+    return inserted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Synthetic Sitrad database for benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    create = sub.add_parser("create", help="create a database file")
+    create.add_argument("path")
+    create.add_argument("--rows", type=int, default=100_000)
+    create.add_argument("--alarms", type=int, default=0)
+    create.add_argument("--controllers", type=int, default=8)
+    create.add_argument("--poison-every", type=int, default=0)
+    create.add_argument("--no-wal", action="store_true")
+    create.add_argument("--time-column", default="inserted_ts_ms",
+                        help="pre-stamped time column ('' = leave it to the migration)")
+
+    write = sub.add_parser("write", help="append rows like Sitrad until stopped")
+    write.add_argument("path")
+    write.add_argument("--rate", type=float, default=10.0, help="rows per second")
+    write.add_argument("--controllers", type=int, default=8)
+
+    args = parser.parse_args()
+    if args.command == "create":
+        create_database(
+            args.path, args.rows, args.alarms, args.controllers,
+            args.poison_every, wal=not args.no_wal, time_column=args.time_column or None
+        )
+    else:
+        inserted = run_writer(args.path, args.rate, args.controllers)
+        print(json.dumps({"inserted": inserted}), flush=True)
+
+
+if __name__ == "__main__":
+    main()
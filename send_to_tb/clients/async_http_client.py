@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+async_http_client.py — asyncio variant of HttpClient.
+
+Retries, back-off and bisection run as coroutines on one background event
+loop, so a slow POST or a Retry-After pause never holds a worker thread.
+Blocking socket I/O (the shared keep-alive requests.Session) runs in a
+bounded number of executor threads. The synchronous methods stay available,
+so the launcher and the fetcher API are unchanged.
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from .http_client import HttpClient, SENT, REJECTED, UNAVAILABLE
+from .thingsboard_client import ThingsBoardClient
+
+log = logging.getLogger("async_http_client")
+
+
+class AsyncHttpClient(HttpClient):
+    """
+    HttpClient whose send path is driven by an asyncio event loop:
+      - send_resilient_async() / post_with_verdict_async(): coroutines with
+        the same verdicts, splitting rules and Retry-After handling.
+      - submit(): schedule send_resilient_async() from any thread and get a
+        concurrent.futures.Future back.
+      - send_resilient() / post_with_verdict(): blocking wrappers around them.
+    At most max_concurrency POSTs are on the wire at once; bisection halves
+    are probed concurrently.
+    """
+
+    def __init__(self, *args, max_concurrency: int = 4, **kwargs):
+        """
+        Accepts the HttpClient (or subclass) arguments, plus:
+        :param max_concurrency: max number of simultaneous POSTs
+        """
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = max(max_concurrency, 1)
+
+        self._loop = asyncio.new_event_loop()
+        self._io_pool = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="http-io"
+        )
+        self._request_slots = asyncio.Semaphore(self.max_concurrency)
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="http-async-loop", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, batch: list[dict], failed: list | None = None) -> Future:
+        """Schedule send_resilient_async() on the client loop; thread-safe."""
+        return asyncio.run_coroutine_threadsafe(
+            self.send_resilient_async(batch, failed), self._loop
+        )
+
+    def send_resilient(self, batch: list[dict], failed: list | None = None) -> int:
+        """Blocking send_resilient() executed on the client loop."""
+        return self.submit(batch, failed).result()
+
+    def post_with_verdict(self, payload: list[dict]) -> str:
+        """Blocking post_with_verdict() executed on the client loop."""
+        return asyncio.run_coroutine_threadsafe(
+            self.post_with_verdict_async(payload), self._loop
+        ).result()
+
+    async def _attempt_post_async(self, payload: list[dict]):
+        """Run one blocking POST (encoding, observers included) off the loop."""
+        async with self._request_slots:
+            return await self._loop.run_in_executor(self._io_pool, self._attempt_post, payload)
+
+    async def post_with_verdict_async(self, payload: list[dict]) -> str:
+        """
+        Send a single JSON payload with retry/back-off and return its verdict.
+        Back-off pauses are asyncio.sleep(), so other requests keep flowing.
+        """
+        delay = self.initial_delay
+
+        for attempt in range(1, self.max_retry + 1):
+            response = await self._attempt_post_async(payload)
+            if response is None:
+                log.warning("Request failed → retrying in %.2fs", delay)
+                self._count_retry()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+
+            code = response.status_code
+            if 200 <= code < 300:
+                response.close()
+                return SENT
+            if self._should_retry(code):
+                pause, delay = self._next_retry_delay(response, delay, attempt)
+                response.close()
+                await asyncio.sleep(pause)
+                continue
+
+            response.close()
+            self._log_and_drop(code, response)
+            return self._classify_failure(code)
+
+        log.error("Exhausted retries for payload. Dropping.")
+        return UNAVAILABLE
+
+    async def probe_with_verdict_async(self, payload: list[dict]) -> str:
+        """
+        Send a payload once; a retriable answer (or none) falls back to
+        post_with_verdict_async().
+        """
+        response = await self._attempt_post_async(payload)
+        if response is None:
+            return await self.post_with_verdict_async(payload)
+
+        code = response.status_code
+        response.close()
+        if 200 <= code < 300:
+            return SENT
+        if self._should_retry(code):
+            return await self.post_with_verdict_async(payload)
+
+        self._log_and_drop(code, response)
+        return self._classify_failure(code)
+
+    async def send_resilient_async(self, batch: list[dict], failed: list | None = None) -> int:
+        """
+        Coroutine form of send_resilient(): same splitting rules, with both
+        halves of a split sent concurrently.
+        """
+        if not batch:
+            return 0
+
+        groups = self._group_batch(batch)
+        if len(groups) > 1:
+            results = await asyncio.gather(*(
+                self.send_resilient_async(group, failed) for group in groups
+            ))
+            return sum(results)
+
+        if self.isolate_rejected:
+            return await self._send_isolating_async(batch, failed)
+
+        verdict = await self.post_with_verdict_async(batch)
+        if verdict == SENT:
+            return len(batch)
+
+        if len(batch) == 1:
+            return self._handle_failed_single(batch[0], verdict, failed)
+
+        if len(batch) < self.min_batch_size_to_split:
+            log.error("Cannot split batch further. Dropping.")
+            if failed is not None:
+                failed.extend((payload, verdict) for payload in batch)
+            return 0
+
+        results = await asyncio.gather(*(
+            self.send_resilient_async(half, failed) for half in self._split_batch(batch)
+        ))
+        return sum(results)
+
+    async def _send_isolating_async(self, batch: list[dict], failed: list | None) -> int:
+        """Coroutine form of _send_isolating(); suspects are probed concurrently."""
+        suspects = [payload for payload in batch if self._is_known_rejected(payload)]
+        if suspects:
+            log.info("Sending %d previously rejected row(s) on their own", len(suspects))
+            batch = [payload for payload in batch if not self._is_known_rejected(payload)]
+
+        async def send_rest() -> int:
+            if not batch:
+                return 0
+            verdict = await self.post_with_verdict_async(batch)
+            if verdict == SENT:
+                return len(batch)
+            if verdict == REJECTED:
+                return await self._bisect_async(batch, failed)
+            self._fail_all(batch, verdict, failed)
+            return 0
+
+        async def send_suspect(payload: dict) -> int:
+            verdict = await self.probe_with_verdict_async([payload])
+            return await self._bisect_async([payload], failed, verdict)
+
+        results = await asyncio.gather(send_rest(), *(send_suspect(p) for p in suspects))
+        return sum(results)
+
+    async def _bisect_async(
+        self, batch: list[dict], failed: list | None, verdict: str = REJECTED
+    ) -> int:
+        """Coroutine form of _bisect(); both halves are probed concurrently."""
+        if verdict == SENT:
+            self._forget_rejected(batch)
+            return len(batch)
+
+        if verdict == UNAVAILABLE:
+            self._fail_all(batch, verdict, failed)
+            return 0
+
+        if len(batch) == 1:
+            self._remember_rejected(batch[0])
+            return self._handle_failed_single(batch[0], verdict, failed)
+
+        if len(batch) < self.min_batch_size_to_split:
+            log.error("Cannot split batch further. Dropping.")
+            self._fail_all(batch, verdict, failed)
+            return 0
+
+        async def probe_half(half: list[dict]) -> int:
+            return await self._bisect_async(half, failed, await self.probe_with_verdict_async(half))
+
+        results = await asyncio.gather(*(probe_half(half) for half in self._split_batch(batch)))
+        return sum(results)
+
+    def close(self) -> None:
+        """Stop the event loop and the I/O threads, then close the HTTP session."""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+        self._loop.close()
+        self._io_pool.shutdown(wait=True)
+        super().close()
+
+
+class AsyncThingsBoardClient(AsyncHttpClient, ThingsBoardClient):
+    """
+    ThingsBoardClient (URL, payload shaping, logging) on the asyncio send path.
+    Takes the ThingsBoardClient arguments plus max_concurrency.
+    """
+
+    def __init__(self, *args, max_concurrency: int = 4, **kwargs):
+        super().__init__(*args, max_concurrency=max_concurrency, **kwargs)
+        log.info("  async client, max_concurrency = %d", self.max_concurrency)
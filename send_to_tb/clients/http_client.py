@@ -6,17 +6,51 @@ import time
 import random
 import logging
 import requests
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from collections.abc import Callable
+from .payload_encoder import PayloadEncoder
+from .transport import HttpTransport, Transport
 from email.utils import parsedate_to_datetime
 from datetime import datetime, timezone
 
 log = logging.getLogger("http_client")
 
+# Verdicts returned by HttpClient.post_with_verdict()
+SENT = "sent"
+REJECTED = "rejected"        # the server refused this content (e.g. 400, 413, 422)
+UNAVAILABLE = "unavailable"  # retries exhausted, network down, or auth/endpoint problem
+
+
+@dataclass(frozen=True)
+class PostOutcome:
+    """
+    Result of one POST attempt, passed to observers registered on HttpClient.
+    status is None when the request failed without an HTTP response.
+    raw_bytes is the JSON body size, wire_bytes what was actually sent.
+    """
+    status: int | None
+    latency_sec: float
+    rows: int
+    raw_bytes: int = 0
+    wire_bytes: int = 0
+
 
 class HttpClient:
     """
     Generic HTTP client:
       - post_json_with_retry(): send JSON with retries & back-off.
-      - send_resilient(): send batches, splitting on failure.
+      - post_with_verdict(): same, returning SENT / REJECTED / UNAVAILABLE.
+      - send_resilient(): send batches, splitting on failure and reporting
+        every dropped row with its verdict. With isolate_rejected, only content
+        rejections are bisected (one attempt per probe, no back-off) and
+        rejected rowids are remembered so later batches send them on their own.
+      - forget_all(): empty the rejected-rowid cache (rowids renumbered).
+      - add_observer(): get a PostOutcome after every POST attempt.
+      - take_counters(): retries and batch splits since the last call.
+    Bodies go through a Transport: pooled HTTP POST by default, or any
+    transport answering with HTTP-like status codes (e.g. MqttTransport).
     """
 
     def __init__(
@@ -26,7 +60,12 @@ class HttpClient:
         initial_delay: float,
         max_delay: float,
         timeout: float,
-        min_batch_size_to_split: int
+        min_batch_size_to_split: int,
+        pool_maxsize: int = 10,
+        encoder: PayloadEncoder | None = None,
+        isolate_rejected: bool = True,
+        reject_cache_size: int = 10000,
+        transport: Transport | None = None
     ):
         self.post_url = post_url
         self.max_retry = max_retry
@@ -34,21 +73,96 @@ class HttpClient:
         self.max_delay = max_delay
         self.timeout = timeout
         self.min_batch_size_to_split = min_batch_size_to_split
+        self.encoder = encoder or PayloadEncoder()
+        self.isolate_rejected = isolate_rejected
+        self.reject_cache_size = reject_cache_size
+
+        # rowid → None, oldest first; shared by the send workers
+        self._rejected_rowids: OrderedDict[int, None] = OrderedDict()
+        self._reject_lock = threading.Lock()
+
+        self._counter_lock = threading.Lock()
+        self.retries = 0
+        self.splits = 0
+
+        self.transport = transport or HttpTransport(pool_maxsize=pool_maxsize)
+
+        self._observers: list[Callable[[PostOutcome], None]] = []
+
+    def add_observer(self, callback: Callable[[PostOutcome], None]) -> None:
+        """Register a callback invoked with a PostOutcome after each POST attempt."""
+        self._observers.append(callback)
 
-        self.session = requests.Session()
+    def take_counters(self) -> tuple[int, int]:
+        """
+        Return (retries, splits) since the last call and reset them.
+        """
+        with self._counter_lock:
+            counters = (self.retries, self.splits)
+            self.retries = 0
+            self.splits = 0
+        return counters
+
+    def _count_retry(self) -> None:
+        """Count one retry of a POST (network failure or retriable status)."""
+        with self._counter_lock:
+            self.retries += 1
+
+    def _notify(self, outcome: PostOutcome) -> None:
+        """Pass a PostOutcome to every observer; observer errors are logged, not raised."""
+        for callback in self._observers:
+            try:
+                callback(outcome)
+            except Exception:
+                log.exception("PostOutcome observer failed")
+
+    def _url_for(self, payload: list[dict]) -> str:
+        """
+        URL a batch is posted to. The generic client has a single endpoint;
+        subclasses may route per device (all rows of a batch share one).
+        """
+        return self.post_url
+
+    def _group_batch(self, batch: list[dict]) -> list[list[dict]]:
+        """
+        Split a batch into groups that go to the same URL, keeping row order
+        inside each group. The generic client sends everything together.
+        """
+        return [batch]
+
+    def _prepare_body(self, payload: list[dict]) -> list:
+        """
+        Turn a batch of payloads into the JSON document to POST.
+        The generic client sends the batch as-is; subclasses may reshape it.
+        """
+        return payload
 
     def _attempt_post(self, payload: list[dict]) -> requests.Response | None:
-        """Attempt a single POST request."""
+        """Attempt a single POST request and report its outcome to observers."""
+        encoded = self.encoder.encode(self._prepare_body(payload))
+        log.debug(
+            "POST %d row(s): %d → %d bytes on the wire",
+            len(payload), encoded.raw_bytes, encoded.wire_bytes
+        )
+
+        started = time.monotonic()
         try:
-            return self.session.post(
-                self.post_url,
-                headers={"Content-Type": "application/json"},
-                json=payload,
-                timeout=self.timeout
+            response = self.transport.post(
+                self._url_for(payload),
+                encoded.headers,
+                encoded.body,
+                self.timeout
             )
         except Exception as exc:
             log.warning("Network exception: %s", exc)
-            return None
+            response = None
+
+        status = response.status_code if response is not None else None
+        self._notify(PostOutcome(
+            status, time.monotonic() - started, len(payload),
+            encoded.raw_bytes, encoded.wire_bytes
+        ))
+        return response
 
     def _get_retry_after(self, raw: str, default: float) -> float:
         """Parse Retry-After header as seconds or HTTP-date."""
@@ -70,28 +184,44 @@ class HttpClient:
         self, response: requests.Response, delay: float, attempt: int
     ) -> float:
         """Apply back-off based on Retry-After header or double delay."""
+        pause, new_delay = self._next_retry_delay(response, delay, attempt)
+        time.sleep(pause)
+        return new_delay
+
+    def _next_retry_delay(
+        self, response: requests.Response, delay: float, attempt: int
+    ) -> tuple[float, float]:
+        """Return (pause now, next delay) from Retry-After or a jittered doubling."""
         raw = response.headers.get("Retry-After")
         pause = self._get_retry_after(raw, delay)
+        self._count_retry()
 
         log.warning(
             "HTTP %d → sleeping %.2fs (attempt %d/%d)",
             response.status_code, pause, attempt, self.max_retry
         )
-        time.sleep(pause)
         new_delay = min(delay * 2 + random.uniform(0, delay), self.max_delay)
-        return new_delay
+        return pause, new_delay
 
     def post_json_with_retry(self, payload: list[dict]) -> bool:
         """
         Send a single JSON payload (list of dicts) with retry/back-off.
         Returns True on success, False on failure.
         """
+        return self.post_with_verdict(payload) == SENT
+
+    def post_with_verdict(self, payload: list[dict]) -> str:
+        """
+        Send a single JSON payload with retry/back-off and return its verdict:
+        SENT, REJECTED (non-retriable content error) or UNAVAILABLE.
+        """
         delay = self.initial_delay
 
         for attempt in range(1, self.max_retry + 1):
             response = self._attempt_post(payload)
             if response is None:
                 log.warning("Request failed → retrying in %.2fs", delay)
+                self._count_retry()
                 time.sleep(delay)
                 delay = min(delay * 2, self.max_delay)
                 continue
@@ -99,49 +229,177 @@ class HttpClient:
             code = response.status_code
             if 200 <= code < 300:
                 response.close()
-                return True
+                return SENT
             if self._should_retry(code):
                 delay = self._handle_retry_delay(response, delay, attempt)
                 response.close()
                 continue
 
             response.close()
-            return self._log_and_drop(code, response)
+            self._log_and_drop(code, response)
+            return self._classify_failure(code)
 
         log.error("Exhausted retries for payload. Dropping.")
-        return False
+        return UNAVAILABLE
+
+    def probe_with_verdict(self, payload: list[dict]) -> str:
+        """
+        Send a payload once, without sleeping. Content verdicts are final;
+        a retriable answer (or no answer) falls back to post_with_verdict().
+        """
+        response = self._attempt_post(payload)
+        if response is None:
+            return self.post_with_verdict(payload)
+
+        code = response.status_code
+        response.close()
+        if 200 <= code < 300:
+            return SENT
+        if self._should_retry(code):
+            return self.post_with_verdict(payload)
 
-    def send_resilient(self, batch: list[dict]) -> int:
+        self._log_and_drop(code, response)
+        return self._classify_failure(code)
+
+    def send_resilient(self, batch: list[dict], failed: list | None = None) -> int:
         """
         Attempt to send the full batch.
         If it fails, split and retry.
         If it's a single item and fails, drop it.
+        Every dropped payload is appended to failed as (payload, verdict).
         """
         if not batch:
             return 0
 
-        if self.post_json_with_retry(batch):
+        groups = self._group_batch(batch)
+        if len(groups) > 1:
+            return sum(self.send_resilient(group, failed) for group in groups)
+
+        if self.isolate_rejected:
+            return self._send_isolating(batch, failed)
+
+        verdict = self.post_with_verdict(batch)
+        if verdict == SENT:
             return len(batch)
 
         if len(batch) == 1:
-            return self._handle_failed_single(batch[0])
+            return self._handle_failed_single(batch[0], verdict, failed)
 
         if len(batch) < self.min_batch_size_to_split:
             log.error("Cannot split batch further. Dropping.")
+            if failed is not None:
+                failed.extend((payload, verdict) for payload in batch)
             return 0
 
         left, right = self._split_batch(batch)
-        return self.send_resilient(left) + self.send_resilient(right)
+        return self.send_resilient(left, failed) + self.send_resilient(right, failed)
     
+    def _send_isolating(self, batch: list[dict], failed: list | None) -> int:
+        """
+        send_resilient() in isolation mode: rows rejected before are posted
+        one by one, the rest as one batch. A rejected batch is bisected with
+        probes; an unavailable server fails the batch without splitting.
+        """
+        suspects = [payload for payload in batch if self._is_known_rejected(payload)]
+        if suspects:
+            log.info("Sending %d previously rejected row(s) on their own", len(suspects))
+            batch = [payload for payload in batch if not self._is_known_rejected(payload)]
+
+        sent = 0
+        if batch:
+            verdict = self.post_with_verdict(batch)
+            if verdict == SENT:
+                sent = len(batch)
+            elif verdict == REJECTED:
+                sent = self._bisect(batch, failed)
+            else:
+                self._fail_all(batch, verdict, failed)
+
+        for payload in suspects:
+            sent += self._bisect([payload], failed, verdict=self.probe_with_verdict([payload]))
+        return sent
+
+    def _bisect(self, batch: list[dict], failed: list | None, verdict: str = REJECTED) -> int:
+        """
+        Isolate the rejected rows of a batch whose verdict is already known.
+        Each half is probed once; only halves that are rejected again are split.
+        """
+        if verdict == SENT:
+            self._forget_rejected(batch)
+            return len(batch)
+
+        if verdict == UNAVAILABLE:
+            self._fail_all(batch, verdict, failed)
+            return 0
+
+        if len(batch) == 1:
+            self._remember_rejected(batch[0])
+            return self._handle_failed_single(batch[0], verdict, failed)
+
+        if len(batch) < self.min_batch_size_to_split:
+            log.error("Cannot split batch further. Dropping.")
+            self._fail_all(batch, verdict, failed)
+            return 0
+
+        sent = 0
+        for half in self._split_batch(batch):
+            sent += self._bisect(half, failed, verdict=self.probe_with_verdict(half))
+        return sent
+
+    @staticmethod
+    def _fail_all(batch: list[dict], verdict: str, failed: list | None) -> None:
+        """Record every payload of batch in failed with the same verdict."""
+        log.error("Dropping %d row(s) (%s)", len(batch), verdict)
+        if failed is not None:
+            failed.extend((payload, verdict) for payload in batch)
+
+    def _is_known_rejected(self, payload: dict) -> bool:
+        """True if the payload's rowid was rejected by the server before."""
+        rowid = payload.get("rowid")
+        with self._reject_lock:
+            return rowid is not None and rowid in self._rejected_rowids
+
+    def _remember_rejected(self, payload: dict) -> None:
+        """Add the payload's rowid to the bounded rejected-rowid cache."""
+        rowid = payload.get("rowid")
+        if rowid is None or self.reject_cache_size <= 0:
+            return
+        with self._reject_lock:
+            self._rejected_rowids[rowid] = None
+            self._rejected_rowids.move_to_end(rowid)
+            while len(self._rejected_rowids) > self.reject_cache_size:
+                self._rejected_rowids.popitem(last=False)
+
+    def _forget_rejected(self, batch: list[dict]) -> None:
+        """Drop rowids from the cache once they were accepted (e.g. reused rowids)."""
+        with self._reject_lock:
+            for payload in batch:
+                self._rejected_rowids.pop(payload.get("rowid"), None)
+
+    def forget_all(self) -> None:
+        """Empty the rejected-rowid cache (e.g. after a VACUUM renumbered the rowids)."""
+        with self._reject_lock:
+            self._rejected_rowids.clear()
+
     def close(self) -> None:
-        """Close the HTTP session."""
-        self.session.close()
+        """Close the transport (HTTP session or broker connection)."""
+        self.transport.close()
 
     @staticmethod
     def _should_retry(status_code: int) -> bool:
         """Return True if status_code is retriable (e.g. 408, 429, 500, 502-504)."""
         return status_code in (408, 429, 500, 502, 503, 504)
 
+    @staticmethod
+    def _classify_failure(status_code: int) -> str:
+        """
+        REJECTED for content errors; UNAVAILABLE for 401/403/404, which
+        point at the token or endpoint rather than at the rows.
+        """
+        if status_code in (401, 403, 404):
+            return UNAVAILABLE
+        return REJECTED
+
     @staticmethod
     def _log_and_drop(status_code: int, response: requests.Response) -> bool:
         """Log specific error and stop retrying."""
@@ -151,15 +409,18 @@ class HttpClient:
             log.error("HTTP %d error: %s", status_code, response.text.strip())
         return False
 
-    @staticmethod
-    def _split_batch(batch: list[dict]) -> tuple[list[dict], list[dict]]:
-        """Split batch in two halves."""
+    def _split_batch(self, batch: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Split batch in two halves (counted in splits)."""
+        with self._counter_lock:
+            self.splits += 1
         mid = len(batch) // 2
         return batch[:mid], batch[mid:]
 
     @staticmethod
-    def _handle_failed_single(payload: dict) -> int:
-        """Log dropped payload with RowId and return 0."""
-        row_id = payload.get("values", {}).get("RowId", "?")
-        log.error("Dropping RowId=%s", row_id)
+    def _handle_failed_single(payload: dict, verdict: str, failed: list | None) -> int:
+        """Log dropped payload with its rowid, record it in failed and return 0."""
+        row_id = payload.get("rowid", "?")
+        log.error("Dropping RowId=%s (%s)", row_id, verdict)
+        if failed is not None:
+            failed.append((payload, verdict))
         return 0
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+mqtt_transport.py — MQTT transport for HttpClient (optional, needs paho-mqtt >= 2.0).
+Keeps one persistent session to the broker and publishes each body with
+QoS 1; post() returns only once the broker's PUBACK arrived, so the
+launcher deletes rows strictly after the broker took responsibility.
+"""
+import time
+import logging
+import threading
+from .transport import Transport, TransportResponse
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # optional dependency, only needed with TRANSPORT=mqtt
+    mqtt = None
+
+log = logging.getLogger("mqtt_transport")
+
+
+class MqttTransport(Transport):
+    """
+    QoS 1 publisher over a persistent MQTT session:
+      - one connection, kept alive and re-established by the paho network loop,
+      - clean_session=False with a stable client_id, so unacknowledged
+        publishes survive a reconnect,
+      - at most max_inflight publishes awaiting PUBACK; further callers wait.
+    Answers are mapped to HTTP-like codes: 200 on PUBACK, 503 when not
+    connected or the publish was refused, 504 when the PUBACK timed out.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        client_id: str,
+        use_tls: bool = True,
+        keepalive_sec: int = 60,
+        max_inflight: int = 20,
+        connect_timeout: float = 10.0
+    ):
+        """
+        :param host:            broker host name
+        :param port:            broker port (8883 with TLS, 1883 without)
+        :param username:        MQTT user name (the ThingsBoard access token)
+        :param client_id:       stable client id of the persistent session
+        :param use_tls:         connect with TLS using the system CA store
+        :param keepalive_sec:   MQTT keep-alive interval
+        :param max_inflight:    max publishes awaiting their PUBACK
+        :param connect_timeout: how long post() waits for a (re)connection
+        """
+        if mqtt is None:
+            raise RuntimeError("TRANSPORT=mqtt requires paho-mqtt: pip install 'paho-mqtt>=2.0'")
+
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.max_inflight = max(max_inflight, 1)
+
+        self._connected = threading.Event()
+        self._window = threading.BoundedSemaphore(self.max_inflight)
+
+        self._client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            client_id=client_id,
+            clean_session=False
+        )
+        self._client.username_pw_set(username)
+        if use_tls:
+            self._client.tls_set()
+        self._client.max_inflight_messages_set(self.max_inflight)
+        self._client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+
+        self._client.connect_async(host, port, keepalive=keepalive_sec)
+        self._client.loop_start()
+
+    def post(self, address: str, headers: dict, body: bytes, timeout: float) -> TransportResponse:
+        """
+        Publish body on the address topic with QoS 1 and wait for its PUBACK.
+        headers are ignored: MQTT carries no content metadata.
+        """
+        if not self._connected.wait(self.connect_timeout):
+            return TransportResponse(503, f"not connected to {self.host}:{self.port}")
+
+        deadline = time.monotonic() + timeout
+        if not self._window.acquire(timeout=timeout):
+            return TransportResponse(504, "in-flight window full")
+        try:
+            info = self._client.publish(address, body, qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return TransportResponse(503, mqtt.error_string(info.rc))
+            info.wait_for_publish(timeout=max(deadline - time.monotonic(), 0.0))
+            if not info.is_published():
+                return TransportResponse(504, "PUBACK timeout")
+            return TransportResponse(200)
+        except (RuntimeError, ValueError) as exc:
+            return TransportResponse(503, str(exc))
+        finally:
+            self._window.release()
+
+    def close(self) -> None:
+        """Disconnect cleanly and stop the network loop."""
+        self._client.disconnect()
+        self._client.loop_stop()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties) -> None:
+        """Mark the session usable once the broker accepted the connection."""
+        if reason_code.is_failure:
+            log.error("MQTT connection to %s:%d refused: %s", self.host, self.port, reason_code)
+            return
+        log.info(
+            "MQTT connected to %s:%d (session present: %s)",
+            self.host, self.port, flags.session_present
+        )
+        self._connected.set()
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties) -> None:
+        """Block new publishes until the network loop has reconnected."""
+        self._connected.clear()
+        level = logging.WARNING if reason_code.is_failure else logging.INFO
+        log.log(level, "MQTT disconnected from %s:%d: %s", self.host, self.port, reason_code)
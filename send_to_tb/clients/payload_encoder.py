@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+payload_encoder.py — Encodes telemetry payloads into HTTP request bodies.
+Optional compact JSON separators and gzip Content-Encoding, with per-thread
+reusable buffers and running byte counters (JSON size vs. bytes on the wire).
+"""
+
+import io
+import gzip
+import json
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """
+    One encoded request body with its headers and size before/after compression.
+    """
+    body: bytes
+    headers: dict
+    raw_bytes: int
+    wire_bytes: int
+
+
+class PayloadEncoder:
+    """
+    Turns a list of payload dicts into request bytes:
+      - compact=False reproduces requests' json= encoding (", " / ": " separators),
+      - compact=True drops the spaces,
+      - gzip_enabled compresses bodies of at least gzip_min_bytes
+        and sets Content-Encoding: gzip.
+    """
+
+    def __init__(
+        self,
+        compact: bool = False,
+        gzip_enabled: bool = False,
+        gzip_level: int = 6,
+        gzip_min_bytes: int = 512
+    ):
+        """
+        :param compact:         use (",", ":") separators
+        :param gzip_enabled:    gzip bodies of at least gzip_min_bytes
+        :param gzip_level:      gzip compression level (1-9)
+        :param gzip_min_bytes:  smaller bodies are sent uncompressed
+        """
+        self.compact = compact
+        self.gzip_enabled = gzip_enabled
+        self.gzip_level = gzip_level
+        self.gzip_min_bytes = gzip_min_bytes
+
+        separators = (",", ":") if compact else (", ", ": ")
+        self._json = json.JSONEncoder(separators=separators, allow_nan=False, ensure_ascii=False)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.raw_total = 0
+        self.wire_total = 0
+
+    def encode(self, payload: list[dict]) -> EncodedBody:
+        """
+        Encode payload and update the running byte counters.
+        """
+        raw = self._json.encode(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+
+        body = raw
+        if self.gzip_enabled and len(raw) >= self.gzip_min_bytes:
+            body = self._gzip(raw)
+            headers["Content-Encoding"] = "gzip"
+
+        with self._lock:
+            self.raw_total += len(raw)
+            self.wire_total += len(body)
+        return EncodedBody(body, headers, len(raw), len(body))
+
+    def take_totals(self) -> tuple[int, int]:
+        """
+        Return (raw_total, wire_total) since the last call and reset them.
+        """
+        with self._lock:
+            totals = (self.raw_total, self.wire_total)
+            self.raw_total = 0
+            self.wire_total = 0
+        return totals
+
+    def _gzip(self, raw: bytes) -> bytes:
+        """
+        Gzip raw into this thread's reusable buffer (mtime=0 for stable output).
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+
+        with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=self.gzip_level, mtime=0) as gz:
+            gz.write(raw)
+        return buffer.getvalue()
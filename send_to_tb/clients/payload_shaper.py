@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+payload_shaper.py — Reshapes a batch of internal payloads into ThingsBoard telemetry entries.
+Strips internal fields (rowid, …) and merges rows sharing the same ts into one entry,
+while keeping the rowids of every merged row as a separate manifest.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ShapedBatch:
+    """
+    Wire entries ({"ts", "values"}) plus the rowids of every row they carry.
+    """
+    entries: list[dict]
+    rowids: list[int]
+
+
+def shape_batch(batch: list[dict]) -> ShapedBatch:
+    """
+    Merge payloads by ts, in first-seen order. When two rows share a ts and a key,
+    the later row wins — the same result ThingsBoard gives, since it stores
+    one value per (ts, key). Payloads without a ts are kept as separate entries.
+    """
+    merged: dict[int, dict] = {}
+    entries: list[dict] = []
+    rowids: list[int] = []
+
+    for payload in batch:
+        rowid = payload.get("rowid")
+        if rowid is not None:
+            rowids.append(rowid)
+
+        values = payload.get("values") or {}
+        ts = payload.get("ts")
+        if ts is None:
+            entries.append({"values": dict(values)})
+            continue
+
+        entry_values = merged.get(ts)
+        if entry_values is None:
+            entry_values = merged[ts] = {}
+            entries.append({"ts": ts, "values": entry_values})
+        entry_values.update(values)
+
+    return ShapedBatch(entries, rowids)
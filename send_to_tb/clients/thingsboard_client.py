@@ -1,16 +1,36 @@
 #!/usr/bin/env python3
 """
 thingsboard_client.py — ThingsBoard-specific HTTP client subclass.
+Talks to the device HTTP API by default, or to the device / gateway MQTT
+topics when given an MqttTransport.
 """
 import logging
+import threading
 from .http_client import HttpClient
+from .payload_encoder import PayloadEncoder
+from .payload_shaper import shape_batch
+from .transport import Transport
+from .mqtt_transport import MqttTransport
 
 log = logging.getLogger("thingsboard_client")
 
+TELEMETRY_URL = "{base_url}/api/v1/{token}/telemetry"
+MQTT_TELEMETRY_TOPIC = "v1/devices/me/telemetry"
+MQTT_GATEWAY_TOPIC = "v1/gateway/telemetry"
+
 
 class ThingsBoardClient(HttpClient):
     """
     HttpClient configured for ThingsBoard using constructor injection.
+    With shape_payloads, rowids are stripped and rows sharing a ts are merged
+    into one telemetry entry before the POST; retries and splits still work
+    on the original rows, so the launcher deletes by its own rowid list.
+    With device_tokens (gateway mode), each batch is split by the payloads'
+    "device" field and every group is posted with that device's token over
+    the same pooled session; unmapped devices fall back to device_token.
+    Over MQTT, gateway mode uses the gateway telemetry topic instead: one
+    connection authenticated with device_token (the gateway device), with
+    rows published as {gateway_device_name.format(device=…): [entries]}.
     """
 
     def __init__(
@@ -20,21 +40,118 @@ class ThingsBoardClient(HttpClient):
         initial_delay: float,
         max_delay: float,
         timeout: float,
-        min_batch_size_to_split: int
+        min_batch_size_to_split: int,
+        pool_maxsize: int = 10,
+        encoder: PayloadEncoder | None = None,
+        shape_payloads: bool = False,
+        isolate_rejected: bool = True,
+        reject_cache_size: int = 10000,
+        device_tokens: dict[str, str] | None = None,
+        transport: Transport | None = None,
+        gateway_device_name: str | None = None,
+        base_url: str = "https://thingsboard.cloud"
     ):
         """
         Initialize the ThingsBoard client with explicitly provided settings.
+        device_tokens maps a controller address to its ThingsBoard device token.
+        gateway_device_name (MQTT only) is the device-name template, e.g. "TC-900 {device}".
+        base_url is the ThingsBoard HTTP endpoint (cloud, self-hosted or a local stand-in).
         """
-        post_url = f"https://thingsboard.cloud/api/v1/{device_token}/telemetry"
+        base_url = base_url.rstrip("/")
+        self.shape_payloads = shape_payloads
+        self.gateway_device_name = None
+        self.device_urls = {}
+        self._unmapped_devices: set[str] = set()
+        self._unmapped_lock = threading.Lock()
+
+        if isinstance(transport, MqttTransport):
+            post_url = MQTT_TELEMETRY_TOPIC
+            if gateway_device_name:
+                self.gateway_device_name = gateway_device_name
+                post_url = MQTT_GATEWAY_TOPIC
+        else:
+            post_url = TELEMETRY_URL.format(base_url=base_url, token=device_token)
+            self.device_urls = {
+                device: TELEMETRY_URL.format(base_url=base_url, token=token)
+                for device, token in (device_tokens or {}).items()
+            }
         super().__init__(
             post_url=post_url,
             max_retry=max_retry,
             initial_delay=initial_delay,
             max_delay=max_delay,
             timeout=timeout,
-            min_batch_size_to_split=min_batch_size_to_split
+            min_batch_size_to_split=min_batch_size_to_split,
+            pool_maxsize=pool_maxsize,
+            encoder=encoder,
+            isolate_rejected=isolate_rejected,
+            reject_cache_size=reject_cache_size,
+            transport=transport
         )
         self._log_config(post_url, max_retry, initial_delay, max_delay, timeout, min_batch_size_to_split)
+        log.info("  compact_json = %s, gzip = %s", self.encoder.compact, self.encoder.gzip_enabled)
+        log.info("  shape_payloads = %s", shape_payloads)
+        log.info("  isolate_rejected = %s, reject_cache_size = %d", isolate_rejected, reject_cache_size)
+        if self.device_urls:
+            log.info("  gateway mode: %d device token(s) for %s",
+                     len(self.device_urls), ", ".join(sorted(self.device_urls)))
+        if self.gateway_device_name:
+            log.info("  gateway mode over MQTT, device names '%s'", self.gateway_device_name)
+
+    def _group_batch(self, batch: list[dict]) -> list[list[dict]]:
+        """
+        In gateway mode, group rows by their "device" field (first-seen order).
+        """
+        if not self.device_urls:
+            return [batch]
+        groups: dict[str | None, list[dict]] = {}
+        for payload in batch:
+            groups.setdefault(payload.get("device"), []).append(payload)
+        return list(groups.values())
+
+    def _url_for(self, payload: list[dict]) -> str:
+        """
+        Telemetry URL of the batch's device; device_token's URL if unmapped.
+        """
+        if not self.device_urls or not payload:
+            return self.post_url
+        device = payload[0].get("device")
+        url = self.device_urls.get(device)
+        if url is None:
+            self._warn_unmapped(device)
+            return self.post_url
+        return url
+
+    def _warn_unmapped(self, device: str | None) -> None:
+        """Log once per device that has no entry in DEVICE_TOKENS."""
+        with self._unmapped_lock:
+            if device in self._unmapped_devices:
+                return
+            self._unmapped_devices.add(device)
+        log.warning("No token for device %r — sending its rows with DEVICE_TOKEN", device)
+
+    def _prepare_body(self, payload: list[dict]) -> list:
+        """
+        Send {"ts", "values"} entries grouped by ts instead of raw payloads.
+        The MQTT gateway topic always gets entries keyed by device name.
+        """
+        if self.gateway_device_name:
+            return self._gateway_body(payload)
+        if not self.shape_payloads:
+            return payload
+        shaped = shape_batch(payload)
+        log.debug("Shaped %d row(s) into %d entry(ies)", len(shaped.rowids), len(shaped.entries))
+        return shaped.entries
+
+    def _gateway_body(self, payload: list[dict]) -> dict:
+        """
+        Build the gateway telemetry document: {device name: [{"ts", "values"}, …]}.
+        """
+        by_device: dict[str, list[dict]] = {}
+        for row in payload:
+            name = self.gateway_device_name.format(device=row.get("device"))
+            by_device.setdefault(name, []).append(row)
+        return {name: shape_batch(rows).entries for name, rows in by_device.items()}
 
     @staticmethod
     def _log_config(url, retry, delay, max_delay, timeout, split):
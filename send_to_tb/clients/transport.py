@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+transport.py — Wire transports used by HttpClient.
+A transport delivers one encoded body to an address and answers with an
+HTTP-like response (status_code, headers, text, close()), so the client's
+retry, split and verdict logic works the same whatever carries the bytes.
+"""
+import requests
+from dataclasses import dataclass, field
+from requests.adapters import HTTPAdapter
+
+
+@dataclass
+class TransportResponse:
+    """
+    HTTP-like answer produced by non-HTTP transports.
+    status_code follows HTTP meaning (200 delivered, 503 unavailable, …).
+    """
+    status_code: int
+    text: str = ""
+    headers: dict = field(default_factory=dict)
+
+    def close(self) -> None:
+        """Nothing to release; present for parity with requests.Response."""
+
+
+class Transport:
+    """
+    Base transport: post() sends one body and returns a response object,
+    or raises on a connection-level failure (the client then retries).
+    """
+
+    def post(self, address: str, headers: dict, body: bytes, timeout: float):
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release connections."""
+
+
+class HttpTransport(Transport):
+    """
+    HTTP POST over one pooled keep-alive requests.Session.
+    """
+
+    def __init__(self, pool_maxsize: int = 10):
+        """
+        :param pool_maxsize: max keep-alive connections kept per host
+        """
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, address: str, headers: dict, body: bytes, timeout: float) -> requests.Response:
+        """POST body to the address URL."""
+        return self.session.post(address, headers=headers, data=body, timeout=timeout)
+
+    def close(self) -> None:
+        """Close the HTTP session."""
+        self.session.close()
@@ -1,29 +1,37 @@
 #!/usr/bin/env python3
 """
-data_fetcher.py — Abstract base for fetching all rows and building telemetry payloads.
-No more “last_id” file.
+data_fetcher.py — Abstract base for fetching rows page by page and building telemetry payloads.
+Paging is driven by an in-memory cursor that restarts from a committed watermark each pass.
+iter_payloads() streams payloads lazily so callers never hold the whole backlog.
 """
 
 import os
 from abc import ABC, abstractmethod
+from collections.abc import Iterator
 
 
 class DataFetcher(ABC):
     """
     Every DataFetcher must:
-      1. implement fetch_rows() → return raw rows list,
+      1. implement fetch_rows() → return the next page of raw rows (empty when exhausted),
       2. implement build_payload(row) → convert a row into a JSON-friendly dict,
-      3. fetch_and_prepare() combines fetch_rows() + build_payload(row).
+      3. fetch_and_prepare() combines fetch_rows() + build_payload(row) for one page,
+         iter_payloads() does the same lazily over every page.
+    Fetchers that support paging also override rewind() and commit_watermark();
+    those with an insert-time column can override iter_time_range(),
+    purge_older_than(), iter_rollups() and delete_rollups().
     """
 
     def __init__(self):
-        pass
+        # Newest insert time (ms) among the rows turned into payloads; it
+        # outlives the rows, which are deleted once sent.
+        self.newest_ts_ms = 0
 
     @abstractmethod
     def fetch_rows(self) -> list:
         """
-        Retrieve all raw rows from the source (e.g., SQLite).
-        Return a list of row-like objects.
+        Retrieve the next page of raw rows from the source (e.g., SQLite).
+        Return a list of row-like objects, or an empty list when no rows are left.
         """
         ...
 
@@ -35,9 +43,77 @@ class DataFetcher(ABC):
         """
         ...
 
+    def rewind(self) -> None:
+        """
+        Start a new pass over the source from the last committed watermark.
+        """
+
+    def commit_watermark(self, rowid: int) -> None:
+        """
+        Record that every row up to and including rowid has been handled.
+        """
+
+    def backlog_size(self) -> int | None:
+        """
+        Number of rows still waiting in the source, or None if unknown.
+        """
+        return None
+
+    def backlog_estimate(self) -> int | None:
+        """
+        Cheap approximation of backlog_size(); the exact count by default.
+        """
+        return self.backlog_size()
+
+    def iter_time_range(self, start_ms: int, end_ms: int | None = None) -> Iterator[dict]:
+        """
+        Yield payloads for rows inserted in [start_ms, end_ms), without consuming them.
+        """
+        return iter(())
+
+    def purge_older_than(self, max_age_sec: float) -> int:
+        """
+        Delete rows older than max_age_sec without sending them; return the count.
+        """
+        return 0
+
+    def iter_rollups(self, end_ms: int, bucket_ms: int) -> Iterator[dict]:
+        """
+        Yield one min/max/avg payload per time bucket for rows inserted before end_ms.
+        """
+        return iter(())
+
+    def delete_rollups(self, rollups: list[dict]) -> int:
+        """
+        Delete the rows summarized by the given rollup payloads; return the count.
+        """
+        return 0
+
+    def iter_rows(self) -> Iterator:
+        """
+        Yield raw rows one by one across all pages.
+        The default walks fetch_rows() until it returns an empty page;
+        subclasses may stream straight from a database cursor instead.
+        """
+        while True:
+            rows = self.fetch_rows()
+            if not rows:
+                return
+            yield from rows
+
+    def iter_payloads(self) -> Iterator[dict]:
+        """
+        Generator version of fetch_and_prepare() over every page:
+        yields each non-None build_payload(row) as soon as its row is read.
+        """
+        for row in self.iter_rows():
+            pl = self.build_payload(row)
+            if pl is not None:
+                yield pl
+
     def fetch_and_prepare(self) -> list[dict]:
         """
-        1. Call fetch_rows() to get all rows.
+        1. Call fetch_rows() to get the next page of rows.
         2. For each row, call build_payload(row) and keep non-None results.
         3. Return the list of payloads (each payload contains "rowid", "ts", and "values").
         """
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+sitrad_alarm_fetcher.py — SQLite-based DataFetcher for Sitrad's alarm table.
+Streams rel_alarmes rows in rowid order with keyset pagination and turns
+each one into a telemetry entry whose keys are the row's columns prefixed
+with "alarm_". Every pass starts from the beginning of the table: alarms
+are deleted once acknowledged, so what is left is new or was not accepted.
+"""
+
+import os
+import time
+import logging
+import sqlite3
+from collections.abc import Iterator
+from .data_fetcher import DataFetcher
+from utils.db.db_connect import get_sqlite_connection
+
+log = logging.getLogger("sitrad_alarm_fetcher")
+
+
+class SitradAlarmFetcher(DataFetcher):
+    """
+    Concrete DataFetcher for the rel_alarmes table.
+    The table's columns are read as they are (the alarm schema is Sitrad's,
+    not ours), so the payload carries every non-empty column. The timestamp
+    comes from time_column, read as SQLite date text; rows without a
+    parsable time are stamped with the time they were read. Both have a
+    one-second resolution, and ThingsBoard keeps one value per (ts, key),
+    so the milliseconds carry rowid % 1000: alarms of the same second get
+    distinct entries instead of overwriting each other.
+    Payloads identify their row with "alarm_rowid" rather than "rowid", so
+    they are never mistaken for telemetry rows (rejected-row cache, outbox).
+    time_column and device_column are checked against the table at init:
+    DEVICE_COLUMN names a tc900log column that rel_alarmes may not have, so
+    a missing one is dropped (alarms then go to the default device).
+    With an outbox_table, alarms rejected before are skipped until their
+    retry time is due.
+    """
+
+    KEY_PREFIX = "alarm_"
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float,
+        table: str = "rel_alarmes",
+        time_column: str | None = "data",
+        page_size: int = 500,
+        device_column: str | None = None,
+        outbox_table: str | None = None
+    ):
+        """
+        :param db_path:       path to the SQLite database file
+        :param timeout:       SQLite connection timeout in seconds
+        :param table:         alarm table name
+        :param time_column:   column holding the alarm date/time, None to use the read time
+        :param page_size:     max number of rows returned by one fetch_rows() call
+        :param device_column: optional controller-address column (gateway mode)
+        :param outbox_table:  optional alarm Outbox table holding retry times
+        """
+        super().__init__()
+        self.db_path = db_path
+        self.timeout = timeout
+        self.table = table
+        self.time_column = time_column
+        self.page_size = page_size
+        self.device_column = device_column
+        self.outbox_table = outbox_table
+        self._drop_missing_columns()
+
+        ts_select = "NULL"
+        if self.time_column:
+            ts_select = f"CAST(strftime('%s', {self.time_column}) AS INTEGER) * 1000"
+        retry_filter = ""
+        if outbox_table:
+            retry_filter = (
+                f"\n               AND rowid NOT IN "
+                f"(SELECT row_ref FROM {outbox_table} WHERE next_retry_ms > ?)"
+            )
+        self._fetch_sql = f"""
+            SELECT rowid AS alarm_rowid, {ts_select} AS alarm_ts, *
+              FROM {table}
+             WHERE rowid > ?{retry_filter}
+             ORDER BY rowid
+             LIMIT ?
+        """
+        self._cursor = 0
+
+    def _drop_missing_columns(self) -> None:
+        """
+        Set time_column / device_column to None, with a warning, when the
+        alarm table lacks them. Left as configured if the database cannot
+        be read yet.
+        """
+        if not (self.time_column or self.device_column) or not os.path.isfile(self.db_path):
+            return
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            columns = {row["name"] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+        except sqlite3.Error as e:
+            log.error("SQLite error reading '%s' columns: %s", self.table, e)
+            return
+
+        if self.time_column and self.time_column not in columns:
+            log.warning(
+                "Alarm table '%s' has no column '%s' — alarms stamped with their read time.",
+                self.table, self.time_column
+            )
+            self.time_column = None
+        if self.device_column and self.device_column not in columns:
+            log.warning(
+                "Alarm table '%s' has no column '%s' — alarms sent without a device.",
+                self.table, self.device_column
+            )
+            self.device_column = None
+
+    def rewind(self) -> None:
+        """Restart from the first row of the table."""
+        self._cursor = 0
+
+    def fetch_rows(self) -> list[sqlite3.Row]:
+        """
+        Fetch the next page of alarm rows after the cursor and advance it.
+        Returns an empty list when done, on error, or if the table is missing.
+        """
+        if not os.path.isfile(self.db_path):
+            log.error("Database not found: %s", self.db_path)
+            return []
+
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            params = (self._cursor, self.page_size)
+            if self.outbox_table:
+                params = (self._cursor, int(time.time() * 1000), self.page_size)
+            cursor = conn.execute(self._fetch_sql, params)
+            rows = cursor.fetchmany(self.page_size)
+            cursor.close()
+        except sqlite3.Error as e:
+            log.error("SQLite error reading '%s': %s", self.table, e)
+            return []
+
+        if rows:
+            self._cursor = rows[-1]["alarm_rowid"]
+        return rows
+
+    def iter_rows(self) -> Iterator[sqlite3.Row]:
+        """
+        Stream every page; each page's statement is closed before its rows
+        are yielded, like SitradDataFetcher.iter_rows().
+        """
+        while True:
+            rows = self.fetch_rows()
+            yield from rows
+            if len(rows) < self.page_size:
+                return
+
+    def backlog_size(self) -> int | None:
+        """Count the alarm rows waiting in the table (None on SQLite error)."""
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            return conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return None
+
+    def build_payload(self, row: sqlite3.Row) -> dict | None:
+        """
+        Convert an alarm row into {'alarm_rowid', 'ts', 'values'}, plus
+        'device' in gateway mode. A row without any value gets empty values:
+        the launcher counts it as sent without posting it, so it is deleted
+        instead of being read again every cycle.
+        """
+        skipped = {"alarm_rowid", "alarm_ts", self.device_column}
+        values = {
+            f"{self.KEY_PREFIX}{key}": row[key]
+            for key in row.keys()
+            if key not in skipped and row[key] is not None
+        }
+        if not values:
+            log.debug("Alarm RowId=%s has no values — deleted unsent", row["alarm_rowid"])
+
+        second_ms = row["alarm_ts"] or int(time.time()) * 1000
+        ts = second_ms + row["alarm_rowid"] % 1000
+        payload = {"alarm_rowid": row["alarm_rowid"], "ts": ts, "values": values}
+        if self.device_column:
+            device = row[self.device_column]
+            payload["device"] = None if device is None else str(device)
+        return payload
@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 """
 sitrad_data_fetcher.py — SQLite-based DataFetcher for TC-900 logs.
-Ensures the schema is migrated, then fetches all rows each run,
-builds a payload containing exactly the wanted fields.
-Rows are expected to be deleted by the caller after processing.
+Ensures the schema is migrated, then fetches rows in rowid order using
+keyset pagination (WHERE rowid > ? ORDER BY rowid LIMIT ?) so memory per page
+is bounded, and builds a payload containing exactly the wanted fields.
+Rows are expected to be deleted by the caller after processing; the caller
+commits a rowid high-water mark that the next pass starts from.
+Time-window reads (replays), age-based purges and catch-up rollups go
+through the index on the time column that schema v2 creates.
 """
 
 import os
 import math
+import time
 import logging
 import sqlite3
+from collections.abc import Iterator
 from .data_fetcher import DataFetcher
+from utils.db.db_cleaner import delete_rows_older_than, delete_rows_in_time_ranges
 from utils.db.db_connect import get_sqlite_connection
 from utils.db.db_schema_manager import ensure_schema
 
@@ -20,20 +27,82 @@ log = logging.getLogger("sitrad_data_fetcher")
 class SitradDataFetcher(DataFetcher):
     """
     Concrete DataFetcher for the tc900log table in a SQLite database.
-    On init, ensures the time‐column and trigger are in place.
-    fetch_rows() retrieves all rows ordered by rowid.
+    On init, ensures the time‐column and its insert stamping are in place.
+    fetch_rows() retrieves the next page of rows after the in-memory cursor;
+    iter_rows() streams the same pages, one fetchmany() per page.
     build_payload() reads the reliable insert‐timestamp column.
+    The committed watermark lives in memory and, if watermark_file is set,
+    is persisted there so a restarted process resumes from it.
+    With an outbox table, rows being retried are skipped by the fresh pages
+    and yielded afterwards, once their retry time is due.
+    With a device_column (gateway mode), each payload carries the controller
+    address it was logged for under "device" (None when the row has none).
+    iter_time_range() and purge_older_than() work on insert-time windows
+    and leave the watermark alone; so do iter_rollups() and delete_rollups(),
+    which summarize old rows per time bucket and then drop them.
     """
 
-    SQL_QUERY_TEMPLATE = """
+    SQL_COLUMNS = """
         SELECT rowid,
                ROUND(Temp1/10.0, 2) AS t1,
                ROUND(Temp2/10.0, 2) AS t2,
                defr, fans, refr,
-               dig1, dig2,
+               dig1, dig2,{device_select}
                {time_column} AS ts
           FROM {table}
+    """
+
+    SQL_QUERY_TEMPLATE = SQL_COLUMNS + """
+         WHERE rowid > ?{outbox_filter}
          ORDER BY rowid
+         LIMIT ?
+    """
+
+    SQL_RETRY_TEMPLATE = SQL_COLUMNS + """
+         WHERE rowid IN (
+                SELECT row_ref
+                  FROM {outbox_table}
+                 WHERE next_retry_ms <= ?
+                 ORDER BY attempts, row_ref
+                 LIMIT ?)
+         ORDER BY rowid
+    """
+
+    # Catch-up rollups: SQLite aggregates each bucket (per device in gateway
+    # mode, where rows without a device are left to the raw pages) while
+    # walking the time-column index; key → column expression.
+    ROLLUP_KEYS = {
+        "Temp1": "ROUND(Temp1/10.0, 2)",
+        "Temp2": "ROUND(Temp2/10.0, 2)",
+        "defr":  "defr",
+        "fans":  "fans",
+        "refr":  "refr",
+        "dig1":  "dig1",
+        "dig2":  "dig2",
+    }
+    ROLLUP_STATS = {
+        "min": "MIN({expr})",
+        "max": "MAX({expr})",
+        "avg": "ROUND(AVG({expr}), 2)",
+    }
+
+    SQL_ROLLUP_TEMPLATE = """
+        SELECT {time_column} / ? * ? AS bucket,{device_select}
+               COUNT(*) AS row_count,
+               {aggregates}
+          FROM {table}
+         WHERE {time_column} < ?{device_filter}{outbox_filter}
+         GROUP BY {group_by}
+         ORDER BY bucket
+    """
+
+    # Keyset paging on (time, rowid): the time-column index holds the rowid,
+    # so each page is an index range scan in this exact order.
+    SQL_RANGE_TEMPLATE = SQL_COLUMNS + """
+         WHERE {time_column} >= ? AND {time_column} < ?
+           AND ({time_column}, rowid) > (?, ?)
+         ORDER BY {time_column}, rowid
+         LIMIT ?
     """
 
     def __init__(
@@ -42,7 +111,12 @@ class SitradDataFetcher(DataFetcher):
         timeout: float,
         schema_version: int,
         time_column: str,
-        tables: dict
+        tables: dict,
+        page_size: int = 500,
+        watermark_file: str | None = None,
+        incremental_auto_vacuum: bool = False,
+        outbox_table: str | None = None,
+        device_column: str | None = None
     ):
         """
         :param db_path:         path to the SQLite database file
@@ -50,6 +124,11 @@ class SitradDataFetcher(DataFetcher):
         :param schema_version:  PRAGMA user_version target for migration
         :param time_column:     name of the INTEGER column holding insert‐timestamp (ms)
         :param tables:          dict with 'telemetry' → telemetry table name
+        :param page_size:       max number of rows returned by one fetch_rows() call
+        :param watermark_file:  optional file persisting the committed rowid watermark
+        :param incremental_auto_vacuum: switch the database to auto_vacuum=INCREMENTAL
+        :param outbox_table:    optional Outbox table whose rows are retried on schedule
+        :param device_column:   optional controller-address column (gateway mode)
         """
         super().__init__()
         self.db_path = db_path
@@ -57,26 +136,100 @@ class SitradDataFetcher(DataFetcher):
         self.schema_version = schema_version
         self.time_column = time_column
         self.tables = tables
+        self.page_size = page_size
+        self.watermark_file = watermark_file
+        self.outbox_table = outbox_table
+        self.device_column = device_column
 
         self.telemetry_table = tables.get("telemetry", "tc900log")
 
+        outbox_filter = ""
+        if outbox_table:
+            outbox_filter = f"\n           AND rowid NOT IN (SELECT row_ref FROM {outbox_table})"
+        device_select = ""
+        if device_column:
+            device_select = f"\n               {device_column} AS device,"
         self._fetch_sql = self.SQL_QUERY_TEMPLATE.format(
             table=self.telemetry_table,
-            time_column=self.time_column
+            time_column=self.time_column,
+            outbox_filter=outbox_filter,
+            device_select=device_select
+        )
+        self._retry_sql = self.SQL_RETRY_TEMPLATE.format(
+            table=self.telemetry_table,
+            time_column=self.time_column,
+            outbox_table=outbox_table,
+            device_select=device_select
+        )
+        self._reused_sql = (
+            f"SELECT MAX(rowid) FROM {self.telemetry_table} WHERE rowid <= ?{outbox_filter}"
+        )
+        self._range_sql = self.SQL_RANGE_TEMPLATE.format(
+            table=self.telemetry_table,
+            time_column=self.time_column,
+            device_select=device_select
+        )
+        self._rollup_sql = self.SQL_ROLLUP_TEMPLATE.format(
+            table=self.telemetry_table,
+            time_column=self.time_column,
+            device_select=device_select,
+            device_filter=f"\n           AND {device_column} IS NOT NULL" if device_column else "",
+            outbox_filter=outbox_filter,
+            aggregates=",\n               ".join(
+                f'{aggregate.format(expr=expr)} AS "{key}_{stat}"'
+                for key, expr in self.ROLLUP_KEYS.items()
+                for stat, aggregate in self.ROLLUP_STATS.items()
+            ),
+            group_by="bucket, device" if device_column else "bucket"
         )
 
-        ensure_schema(
+        vacuumed = ensure_schema(
             db_path=self.db_path,
             table=self.telemetry_table,
             time_column=self.time_column,
             target_version=self.schema_version,
-            timeout=self.timeout
+            timeout=self.timeout,
+            incremental_auto_vacuum=incremental_auto_vacuum
         )
 
+        self.watermark = self._load_watermark()
+        if vacuumed:
+            self.commit_watermark(0)
+            self._clear_outbox()
+        self._cursor = self.watermark
+
+    def rewind(self) -> None:
+        """
+        Restart paging from the committed watermark.
+        Sent rows are deleted, so any row left at or below the watermark that
+        the outbox does not track is new: SQLite reused the rowids freed by
+        deleting the highest rows (or VACUUM renumbered them). The watermark
+        is then reset to 0 rather than skipping those rows, even once the
+        reused rowids have caught up with it.
+        """
+        reused = self._reused_rowid() if self.watermark else None
+        if reused:
+            log.info(
+                "Rowid %d at or below watermark %d is new (rowids reused) — resetting watermark.",
+                reused, self.watermark
+            )
+            self.commit_watermark(0)
+        self._cursor = self.watermark
+
+    def commit_watermark(self, rowid: int) -> None:
+        """
+        Set the committed watermark (and persist it if a watermark_file is configured).
+        """
+        if rowid == self.watermark:
+            return
+        self.watermark = rowid
+        self._save_watermark(rowid)
+
     def fetch_rows(self) -> list[sqlite3.Row]:
         """
-        Open the SQLite database and fetch all rows from the telemetry table.
-        Returns a list of sqlite3.Row objects or an empty list on error.
+        Fetch the next page (at most page_size rows) with rowid above the cursor,
+        then advance the cursor past it.
+        Returns a list of sqlite3.Row objects or an empty list when done or on error.
         """
         if not os.path.isfile(self.db_path):
             log.error("Database not found: %s", self.db_path)
@@ -84,20 +237,266 @@ class SitradDataFetcher(DataFetcher):
 
         try:
             with get_sqlite_connection(self.db_path, self.timeout) as conn:
-                conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
-                cursor.execute(self._fetch_sql)
-                return cursor.fetchall()
+                cursor.execute(self._fetch_sql, (self._cursor, self.page_size))
+                rows = cursor.fetchall()
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return []
+
+        if rows:
+            self._cursor = rows[-1]["rowid"]
+        return rows
+
+    def iter_rows(self) -> Iterator[sqlite3.Row]:
+        """
+        Stream rows page by page and advance the cursor as rows are yielded.
+        Each keyset page is read with one fetchmany() and its cursor closed
+        before any row is yielded, so no read transaction stays open while
+        the caller sends the rows. The caller's deletes (and incremental
+        vacuums) run on the delete worker's own pooled connection, in
+        transactions separate from these reads. An open read would pin the
+        WAL snapshot, so checkpoints could not complete. Memory stays bounded
+        by page_size.
+        """
+        if not os.path.isfile(self.db_path):
+            log.error("Database not found: %s", self.db_path)
+            return
+
+        while True:
+            try:
+                conn = get_sqlite_connection(self.db_path, self.timeout)
+                cursor = conn.execute(self._fetch_sql, (self._cursor, self.page_size))
+                rows = cursor.fetchmany(self.page_size)
+                cursor.close()
+            except sqlite3.Error as e:
+                log.error("SQLite error: %s", e)
+                return
+
+            for row in rows:
+                self._cursor = row["rowid"]
+                yield row
+
+            if len(rows) < self.page_size:
+                break
+
+        if self.outbox_table:
+            yield from self._fetch_due_retries()
+
+    def iter_time_range(self, start_ms: int, end_ms: int | None = None) -> Iterator[dict]:
+        """
+        Yield payloads for rows inserted in [start_ms, end_ms) in time order,
+        one page_size keyset page at a time. Rows are not consumed: the paging
+        cursor and the watermark are untouched, so this serves replays.
+        """
+        if not os.path.isfile(self.db_path):
+            log.error("Database not found: %s", self.db_path)
+            return
+
+        if end_ms is None:
+            end_ms = int(time.time() * 1000) + 1
+        last_ts, last_rowid = start_ms - 1, 0
+        while True:
+            try:
+                conn = get_sqlite_connection(self.db_path, self.timeout)
+                cursor = conn.execute(
+                    self._range_sql, (start_ms, end_ms, last_ts, last_rowid, self.page_size)
+                )
+                rows = cursor.fetchmany(self.page_size)
+                cursor.close()
+            except sqlite3.Error as e:
+                log.error("SQLite error: %s", e)
+                return
+
+            for row in rows:
+                last_ts, last_rowid = row["ts"], row["rowid"]
+                payload = self.build_payload(row)
+                if payload is not None:
+                    yield payload
+
+            if len(rows) < self.page_size:
+                break
+
+    def purge_older_than(self, max_age_sec: float) -> int:
+        """
+        Delete rows inserted more than max_age_sec ago without sending them.
+        Returns the number of rows deleted (0 on SQLite error).
+        """
+        cutoff_ms = int((time.time() - max_age_sec) * 1000)
+        try:
+            return delete_rows_older_than(
+                db_path=self.db_path,
+                table_name=self.telemetry_table,
+                time_column=self.time_column,
+                cutoff_ms=cutoff_ms,
+                timeout=self.timeout
+            )
+        except sqlite3.Error:
+            return 0
+
+    def iter_rollups(self, end_ms: int, bucket_ms: int) -> Iterator[dict]:
+        """
+        Yield one payload per bucket_ms-wide bucket (and device) of the rows
+        inserted before end_ms, oldest first: "<key>_min", "<key>_max" and
+        "<key>_avg" for each telemetry key plus "rollup_rows", stamped with
+        the bucket start. "rollup_range" holds what delete_rollups() needs.
+        Rows queued in the outbox are left out. The buckets are read in one
+        query, so no statement stays open while they are sent.
+        """
+        if not os.path.isfile(self.db_path):
+            log.error("Database not found: %s", self.db_path)
+            return
+
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            rows = conn.execute(self._rollup_sql, (bucket_ms, bucket_ms, end_ms)).fetchall()
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return
+
+        names = [f"{key}_{stat}" for key in self.ROLLUP_KEYS for stat in self.ROLLUP_STATS]
+        for row in rows:
+            values = {name: row[name] for name in names if row[name] is not None}
+            values["rollup_rows"] = row["row_count"]
+            bucket = row["bucket"]
+            payload = {"ts": bucket, "values": values}
+            if self.device_column:
+                payload["device"] = str(row["device"])
+                payload["rollup_range"] = (bucket, bucket + bucket_ms, row["device"])
+            else:
+                payload["rollup_range"] = (bucket, bucket + bucket_ms)
+            yield payload
+
+    def delete_rollups(self, rollups: list[dict]) -> int:
+        """
+        Delete the rows summarized by rollup payloads from iter_rollups(),
+        in one transaction. Returns the number of rows deleted (0 on SQLite error).
+        """
+        try:
+            return delete_rows_in_time_ranges(
+                db_path=self.db_path,
+                table_name=self.telemetry_table,
+                time_column=self.time_column,
+                ranges=[payload["rollup_range"] for payload in rollups],
+                timeout=self.timeout,
+                device_column=self.device_column,
+                outbox_table=self.outbox_table
+            )
+        except sqlite3.Error:
+            return 0
+
+    def _fetch_due_retries(self) -> list[sqlite3.Row]:
+        """
+        Return at most page_size outbox rows whose retry time has come,
+        fewest attempts first. The paging cursor is left untouched.
+        """
+        now_ms = int(time.time() * 1000)
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            cursor = conn.execute(self._retry_sql, (now_ms, self.page_size))
+            rows = cursor.fetchall()
+            cursor.close()
         except sqlite3.Error as e:
             log.error("SQLite error: %s", e)
             return []
+        if rows:
+            log.info("Retrying %d row(s) from the outbox", len(rows))
+        return rows
+
+    def _clear_outbox(self) -> None:
+        """
+        Drop every outbox entry: after a VACUUM its row references point at
+        renumbered rows. The rows themselves are simply fetched again.
+        """
+        if not self.outbox_table:
+            return
+        try:
+            with get_sqlite_connection(self.db_path, self.timeout) as conn:
+                conn.execute(f"DELETE FROM {self.outbox_table}")
+        except sqlite3.Error as e:
+            log.warning("Could not clear outbox '%s': %s", self.outbox_table, e)
+
+    def backlog_size(self) -> int | None:
+        """
+        Count the rows left in the telemetry table (None on SQLite error).
+        """
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            return conn.execute(f"SELECT COUNT(*) FROM {self.telemetry_table}").fetchone()[0]
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return None
+
+    def backlog_estimate(self) -> int | None:
+        """
+        Approximate backlog_size() from the rowid span (two index seeks
+        instead of a COUNT(*)). Gaps left by deleted rows inside the span
+        are counted too; None on SQLite error.
+        """
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            low, high = conn.execute(
+                f"SELECT MIN(rowid), MAX(rowid) FROM {self.telemetry_table}"
+            ).fetchone()
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return None
+        if high is None:
+            return 0
+        return high - low + 1
+
+    def _reused_rowid(self) -> int | None:
+        """
+        Return the highest rowid at or below the watermark that is not in the
+        outbox (0 if none), or None on error.
+        """
+        if not os.path.isfile(self.db_path):
+            return None
+        try:
+            with get_sqlite_connection(self.db_path, self.timeout) as conn:
+                row = conn.execute(self._reused_sql, (self.watermark,)).fetchone()
+                return row[0] or 0
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return None
+
+    def _load_watermark(self) -> int:
+        """
+        Read the persisted watermark, or return 0 if none is configured or readable.
+        """
+        if not self.watermark_file or not os.path.isfile(self.watermark_file):
+            return 0
+        try:
+            with open(self.watermark_file, "r", encoding="utf-8") as fh:
+                value = int(fh.read().strip() or 0)
+            log.info("Loaded rowid watermark %d from %s", value, self.watermark_file)
+            return value
+        except (OSError, ValueError) as e:
+            log.warning("Ignoring unreadable watermark file %s: %s", self.watermark_file, e)
+            return 0
+
+    def _save_watermark(self, rowid: int) -> None:
+        """
+        Atomically write the watermark to watermark_file (no-op if not configured).
+        """
+        if not self.watermark_file:
+            return
+        tmp_path = f"{self.watermark_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                fh.write(str(rowid))
+            os.replace(tmp_path, self.watermark_file)
+        except OSError as e:
+            log.warning("Could not persist watermark to %s: %s", self.watermark_file, e)
 
     def build_payload(self, row: sqlite3.Row) -> dict:
         """
         Convert a database row into a telemetry payload dict.
-        Returns {'rowid', 'ts', 'values'} dict.
+        Returns {'rowid', 'ts', 'values'} dict, plus 'device' in gateway mode.
         """
         ts = row["ts"]
+        if ts and ts > self.newest_ts_ms:
+            self.newest_ts_ms = ts
         values = {
             "Temp1": self._clean_value(row["t1"]),
             "Temp2": self._clean_value(row["t2"]),
@@ -108,7 +507,11 @@ class SitradDataFetcher(DataFetcher):
             "dig2":  row["dig2"],
         }
         filtered = {k: v for k, v in values.items() if v is not None}
-        return {"rowid": row["rowid"], "ts": ts, "values": filtered}
+        payload = {"rowid": row["rowid"], "ts": ts, "values": filtered}
+        if self.device_column:
+            device = row["device"]
+            payload["device"] = None if device is None else str(device)
+        return payload
 
     @staticmethod
     def _clean_value(value) -> float | int | None:
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+adaptive_batch_sizer.py — AIMD batch-size controller fed by HttpClient post outcomes.
+Grows the batch size additively while POSTs are fast and healthy, and cuts it
+multiplicatively on 408/429/5xx, network errors or slow responses.
+"""
+
+import time
+import logging
+import threading
+from clients.http_client import PostOutcome
+
+log = logging.getLogger("adaptive_batch_sizer")
+
+
+class AdaptiveBatchSizer:
+    """
+    Additive-increase / multiplicative-decrease controller for the batch size.
+    Register observe() with HttpClient.add_observer(), read size when
+    building the next batch and report the rows it got with note_batch().
+    Growth needs full batches from the source: POSTs can carry fewer rows
+    (deadband-suppressed rows, per-device groups, bisection halves), so it
+    is judged on rows fetched rather than rows posted. Decreases are applied at most once per
+    latency_target_sec so a burst of retries counts as one congestion signal,
+    and increases wait out the same period after a decrease.
+    """
+
+    CONGESTION_CODES = (408, 429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        initial_size: int,
+        min_size: int,
+        max_size: int,
+        increase_step: int,
+        decrease_factor: float,
+        latency_target_sec: float
+    ):
+        """
+        :param initial_size:        starting batch size (clamped to [min_size, max_size])
+        :param min_size:            lower bound for the batch size
+        :param max_size:            upper bound for the batch size
+        :param increase_step:       rows added after each healthy POST while batches are full
+        :param decrease_factor:     multiplier applied on congestion (0 < f < 1)
+        :param latency_target_sec:  POSTs slower than this count as congestion
+        """
+        self.min_size = max(min_size, 1)
+        self.max_size = max(max_size, self.min_size)
+        self.increase_step = max(increase_step, 1)
+        self.decrease_factor = decrease_factor
+        self.latency_target_sec = latency_target_sec
+
+        self._size = min(max(initial_size, self.min_size), self.max_size)
+        self._batches_full = False
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+        log.info(
+            "Adaptive batch size: start=%d, min=%d, max=%d, +%d / x%.2f, latency target=%.2fs",
+            self._size, self.min_size, self.max_size,
+            self.increase_step, self.decrease_factor, self.latency_target_sec
+        )
+
+    @property
+    def size(self) -> int:
+        """Current batch size."""
+        return self._size
+
+    def note_batch(self, rows: int) -> None:
+        """
+        Record how many rows the latest batch was built from; a batch
+        shorter than size means the source ran dry and growth pauses.
+        """
+        self._batches_full = rows >= self._size
+
+    def observe(self, outcome: PostOutcome) -> None:
+        """
+        Update the batch size from one POST outcome.
+        Content errors (other 4xx) say nothing about the link and are ignored.
+        """
+        if outcome.status is None:
+            self._decrease("network error/timeout")
+        elif outcome.status in self.CONGESTION_CODES:
+            self._decrease(f"HTTP {outcome.status}")
+        elif 200 <= outcome.status < 300:
+            if outcome.latency_sec > self.latency_target_sec:
+                self._decrease(f"slow POST {outcome.latency_sec:.2f}s")
+            elif self._batches_full:
+                self._increase(outcome.latency_sec)
+
+    def _increase(self, latency_sec: float) -> None:
+        """Additive increase, bounded by max_size; held off right after a decrease."""
+        with self._lock:
+            if time.monotonic() - self._last_decrease < self.latency_target_sec:
+                return
+            new_size = min(self._size + self.increase_step, self.max_size)
+            if new_size == self._size:
+                return
+            log.info("Batch size %d → %d (healthy POST %.2fs)", self._size, new_size, latency_sec)
+            self._size = new_size
+
+    def _decrease(self, reason: str) -> None:
+        """Multiplicative decrease, bounded by min_size and rate-limited."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease < self.latency_target_sec:
+                log.debug("Batch size kept at %d (%s, decrease cooling down)", self._size, reason)
+                return
+            self._last_decrease = now
+            new_size = max(int(self._size * self.decrease_factor), self.min_size)
+            if new_size == self._size:
+                return
+            log.info("Batch size %d → %d (%s)", self._size, new_size, reason)
+            self._size = new_size
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+cycle_metrics.py — Per-cycle performance metrics and their export.
+CycleMetrics collects timings, row/byte counts and the POST latency
+histogram (fed by HttpClient observers and the launcher); MetricsExporter
+writes them after each cycle as a node-exporter textfile and/or a JSON
+status file. Counters and the histogram are cumulative for the process,
+timings and sizes describe the last cycle.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from clients.http_client import PostOutcome
+
+log = logging.getLogger("cycle_metrics")
+
+PREFIX = "send_to_tb"
+
+
+class CycleMetrics:
+    """
+    Thread-safe metrics store shared by the send workers, the delete worker
+    and the launcher loop. observe_post() is an HttpClient observer.
+    """
+
+    LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+        # cumulative since process start
+        self.cycles_total = 0
+        self.rows_sent_total = 0
+        self.rows_failed_total = 0
+        self.retries_total = 0
+        self.splits_total = 0
+        self.json_bytes_total = 0
+        self.wire_bytes_total = 0
+        self.posts_total: dict[str, int] = {}
+        self.latency_buckets = [0] * len(self.LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+        self.last = {}
+        self._cycle_started = 0.0
+        self._reset_cycle()
+
+    def start_cycle(self) -> None:
+        """Zero the per-cycle figures and start the cycle clock."""
+        with self._lock:
+            self._reset_cycle()
+        self._cycle_started = time.monotonic()
+
+    def observe_post(self, outcome: PostOutcome) -> None:
+        """HttpClient observer: count the POST, its status class, bytes and latency."""
+        status = f"{outcome.status // 100}xx" if outcome.status is not None else "error"
+        with self._lock:
+            self.posts_total[status] = self.posts_total.get(status, 0) + 1
+            self.json_bytes_total += outcome.raw_bytes
+            self.wire_bytes_total += outcome.wire_bytes
+            self.latency_sum += outcome.latency_sec
+            self.latency_count += 1
+            for i, bound in enumerate(self.LATENCY_BUCKETS):
+                if outcome.latency_sec <= bound:
+                    self.latency_buckets[i] += 1
+            self._cycle["posts"] += 1
+            self._cycle["post_seconds"] += outcome.latency_sec
+            self._cycle["wire_bytes"] += outcome.wire_bytes
+
+    @contextmanager
+    def timed(self, stage: str):
+        """Add the duration of the with-block to the cycle's '<stage>_seconds'."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{stage}_seconds", time.perf_counter() - started)
+
+    def add(self, name: str, amount: float) -> None:
+        """Add amount to a per-cycle figure (rows_fetched, delete_seconds, …)."""
+        with self._lock:
+            self._cycle[name] = self._cycle.get(name, 0) + amount
+
+    def record_batch(self, sent: int, failed: int) -> None:
+        """Count one completed batch's delivered and failed rows."""
+        with self._lock:
+            self.rows_sent_total += sent
+            self.rows_failed_total += failed
+            self._cycle["rows_sent"] += sent
+            self._cycle["rows_failed"] += failed
+
+    def finish_cycle(
+        self,
+        retries: int,
+        splits: int,
+        backlog_rows: int | None,
+        db_bytes: int,
+        wal_bytes: int
+    ) -> dict:
+        """
+        Close the cycle: fold in client counters and storage sizes, and
+        return the last-cycle snapshot (also kept as .last).
+        """
+        with self._lock:
+            self.cycles_total += 1
+            self.retries_total += retries
+            self.splits_total += splits
+            cycle = dict(self._cycle)
+            cycle.update(
+                duration_seconds=time.monotonic() - self._cycle_started,
+                finished_at=time.time(),
+                retries=retries,
+                splits=splits,
+                backlog_rows=backlog_rows,
+                db_bytes=db_bytes,
+                wal_bytes=wal_bytes,
+            )
+            self.last = cycle
+        return cycle
+
+    def to_json(self) -> dict:
+        """Last-cycle snapshot plus cumulative totals, JSON-ready."""
+        with self._lock:
+            return {
+                "last_cycle": dict(self.last),
+                "totals": {
+                    "cycles": self.cycles_total,
+                    "rows_sent": self.rows_sent_total,
+                    "rows_failed": self.rows_failed_total,
+                    "retries": self.retries_total,
+                    "splits": self.splits_total,
+                    "json_bytes": self.json_bytes_total,
+                    "wire_bytes": self.wire_bytes_total,
+                    "posts": dict(self.posts_total),
+                    "post_latency_avg_seconds": (
+                        self.latency_sum / self.latency_count if self.latency_count else None
+                    ),
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            last = dict(self.last)
+            lines: list[str] = []
+
+            def metric(name, kind, help_text, samples):
+                lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{PREFIX}_{name}{labels} {value}")
+
+            metric("cycles_total", "counter", "Completed send cycles.",
+                   [("", self.cycles_total)])
+            metric("last_cycle_timestamp_seconds", "gauge", "Unix time the last cycle finished.",
+                   [("", last.get("finished_at"))])
+            metric("cycle_duration_seconds", "gauge", "Wall time of the last cycle.",
+                   [("", last.get("duration_seconds"))])
+            metric("cycle_stage_seconds", "gauge", "Time spent per stage in the last cycle.",
+                   [(f'{{stage="{stage}"}}', last.get(f"{stage}_seconds", 0.0))
+                    for stage in ("fetch", "delete", "compaction")])
+            metric("cycle_rows", "gauge", "Rows handled in the last cycle.",
+                   [(f'{{kind="{kind}"}}', last.get(f"rows_{kind}", 0))
+                    for kind in ("fetched", "sent", "failed")])
+            metric("rows_sent_total", "counter", "Rows delivered to the server.",
+                   [("", self.rows_sent_total)])
+            metric("rows_failed_total", "counter", "Rows the server did not accept.",
+                   [("", self.rows_failed_total)])
+            metric("payload_bytes_total", "counter", "Request body bytes, before and after encoding.",
+                   [('{kind="json"}', self.json_bytes_total), ('{kind="wire"}', self.wire_bytes_total)])
+            metric("posts_total", "counter", "POST attempts by HTTP status class.",
+                   [(f'{{status="{status}"}}', count) for status, count in sorted(self.posts_total.items())])
+            metric("retries_total", "counter", "POST retries after a retriable failure.",
+                   [("", self.retries_total)])
+            metric("splits_total", "counter", "Batch splits while isolating failures.",
+                   [("", self.splits_total)])
+
+            lines.append(f"# HELP {PREFIX}_post_latency_seconds POST round-trip time.")
+            lines.append(f"# TYPE {PREFIX}_post_latency_seconds histogram")
+            for bound, count in zip(self.LATENCY_BUCKETS, self.latency_buckets):
+                lines.append(f'{PREFIX}_post_latency_seconds_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{PREFIX}_post_latency_seconds_bucket{{le="+Inf"}} {self.latency_count}')
+            lines.append(f"{PREFIX}_post_latency_seconds_sum {self.latency_sum}")
+            lines.append(f"{PREFIX}_post_latency_seconds_count {self.latency_count}")
+
+            metric("backlog_rows", "gauge", "Telemetry rows left in the database after the last cycle.",
+                   [("", last.get("backlog_rows"))])
+            metric("db_file_bytes", "gauge", "Size of the SQLite database and its WAL.",
+                   [('{file="db"}', last.get("db_bytes")), ('{file="wal"}', last.get("wal_bytes"))])
+        return "\n".join(lines) + "\n"
+
+    def _reset_cycle(self) -> None:
+        """Zero the per-cycle figures (caller holds the lock or is __init__)."""
+        self._cycle = {
+            "rows_fetched": 0,
+            "rows_sent": 0,
+            "rows_failed": 0,
+            "posts": 0,
+            "post_seconds": 0.0,
+            "wire_bytes": 0,
+            "fetch_seconds": 0.0,
+            "delete_seconds": 0.0,
+            "compaction_seconds": 0.0,
+        }
+
+
+class MetricsExporter:
+    """
+    Writes CycleMetrics after each cycle. Files are replaced atomically,
+    so node-exporter and readers of the status file never see partial output.
+    """
+
+    def __init__(self, textfile_path: str | None = None, json_path: str | None = None):
+        """
+        :param textfile_path: node-exporter textfile (*.prom), None to skip
+        :param json_path:     JSON status file, None to skip
+        """
+        self.textfile_path = textfile_path
+        self.json_path = json_path
+
+    def export(self, metrics: CycleMetrics) -> None:
+        """Write the enabled outputs; failures are logged, never raised."""
+        if self.textfile_path:
+            self._write_atomic(self.textfile_path, metrics.to_prometheus())
+        if self.json_path:
+            self._write_atomic(self.json_path, json.dumps(metrics.to_json(), indent=2) + "\n")
+
+    @staticmethod
+    def _write_atomic(path: str, text: str) -> None:
+        """Write text to path via a temporary file and os.replace()."""
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", path, e)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+cycle_profiler.py — Sampling profiler for send cycles (PROFILE=true / --profile).
+A background thread samples the stack of every thread at a fixed interval,
+so the send and delete workers are covered (cProfile only sees the thread
+that enabled it). Each sample is attributed to a pipeline stage, from the
+innermost frame that belongs to a known module or function, and to a state
+from the leaf frame: CPU, I/O (socket, TLS, SQLite calls), sleep (rate
+limit and retry back-off) or wait (blocked on another thread).
+Per cycle, the collapsed stacks are written to a .folded file (flamegraph.pl
+and speedscope read it) and a stage × state summary is logged.
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import linecache
+import threading
+from pathlib import Path
+from collections import Counter
+from contextlib import contextmanager
+
+log = logging.getLogger("cycle_profiler")
+
+CPU, IO, SLEEP, WAIT = "cpu", "io", "sleep", "wait"
+STATES = (CPU, IO, SLEEP, WAIT)
+IDLE = "idle"
+
+# Innermost match wins; functions take precedence over their module
+FUNCTION_STAGES = {
+    ("http_client.py", "_handle_retry_delay"): "retry_backoff",
+    ("send_launcher.py", "_complete_batch"): "await_send",
+    ("send_launcher.py", "_drain_deletes"): "await_delete",
+    ("send_launcher.py", "_settle_batch"): "delete",
+    ("send_launcher.py", "_delete_batch_rowids"): "delete",
+    ("send_launcher.py", "_purge_expired"): "delete",
+    ("send_launcher.py", "_forward_alarms"): "alarms",
+    ("send_launcher.py", "_settle_alarms"): "delete",
+    ("send_launcher.py", "_catch_up"): "catch_up",
+    ("sitrad_data_fetcher.py", "iter_rollups"): "catch_up",
+    ("sitrad_data_fetcher.py", "delete_rollups"): "delete",
+    ("sitrad_data_fetcher.py", "backlog_size"): "backlog_count",
+    ("send_launcher.py", "_compact"): "compaction",
+    ("send_launcher.py", "_publish_metrics"): "metrics",
+}
+MODULE_STAGES = {
+    "data_fetcher.py": "fetch",
+    "sitrad_data_fetcher.py": "fetch",
+    "sitrad_alarm_fetcher.py": "alarms",
+    "deadband_filter.py": "deadband",
+    "payload_encoder.py": "encode",
+    "payload_shaper.py": "encode",
+    "http_client.py": "post",
+    "async_http_client.py": "post",
+    "thingsboard_client.py": "post",
+    "transport.py": "post",
+    "mqtt_transport.py": "post",
+    "rate_limiter.py": "rate_limit",
+    "db_cleaner.py": "delete",
+    "db_outbox.py": "delete",
+    "db_compactor.py": "compaction",
+    "cycle_metrics.py": "metrics",
+    "db_change_watcher.py": "change_watch",
+    "health_monitor.py": "health",
+}
+SLEEP_STAGES = {"rate_limit", "retry_backoff"}
+
+IO_MODULES = {"socket.py", "ssl.py", "selectors.py"}
+BLOCKING_FUNCTIONS = {
+    ("threading.py", "wait"),
+    ("threading.py", "acquire"),
+    ("_base.py", "result"),
+    ("queue.py", "get"),
+}
+# Leaf frames of a parked pool worker or event loop: not part of any stage
+IDLE_FUNCTIONS = {("thread.py", "_worker"), ("queue.py", "get"), ("selectors.py", "select")}
+# Background loops parked between two iterations (their work runs in
+# inner frames, which are mapped to a stage before these are reached)
+IDLE_LOOPS = {("health_monitor.py", "_run")}
+SQLITE_CALL = re.compile(r"\.(execute|executemany|executescript|fetchone|fetchmany|fetchall|commit|rollback)\(")
+
+
+class CycleProfiler:
+    """
+    Samples all threads while a cycle runs. Use profile() around one cycle;
+    each call produces one .folded file (the newest `keep` are kept) and
+    one summary log record.
+    """
+
+    def __init__(self, output_dir: str | Path, interval_sec: float = 0.01, keep: int = 20):
+        """
+        :param output_dir:   directory receiving cycle-*.folded files
+        :param interval_sec: time between two samples
+        :param keep:         number of profile files kept (oldest deleted first)
+        """
+        self.output_dir = Path(output_dir)
+        self.interval_sec = max(interval_sec, 0.001)
+        self.keep = max(keep, 1)
+
+        self._stacks: Counter = Counter()
+        self._seconds: Counter = Counter()
+        self._line_states: dict[tuple[str, int], str] = {}
+        self._profiles = 0
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    @contextmanager
+    def profile(self, label: str = "cycle"):
+        """Sample every thread for the duration of the with-block."""
+        self._stacks.clear()
+        self._seconds.clear()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        started = time.perf_counter()
+        self._sampler.start()
+        try:
+            yield
+        finally:
+            self._stop.set()
+            self._sampler.join()
+            wall_sec = time.perf_counter() - started
+            self._write(label)
+            self._log_summary(label, wall_sec)
+
+    def _run(self) -> None:
+        """Sampler thread: one sample per interval, weighted by the real gap."""
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_sec):
+            now = time.perf_counter()
+            self._sample(own_id, now - last)
+            last = now
+
+    def _sample(self, own_id: int, weight: float) -> None:
+        """Attribute weight seconds to the current stack of every other thread."""
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((os.path.basename(code.co_filename), code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+
+            stage = self._stage_of(stack)
+            leaf = stack[0]
+            if stage == IDLE or (stage is None and (leaf[0], leaf[1]) in IDLE_FUNCTIONS):
+                continue
+            stage = stage or "other"
+            state = self._state_of(leaf, stage)
+
+            thread = re.sub(r"_\d+$", "", names.get(thread_id, str(thread_id)))
+            frames = ";".join(f"{module}:{func}" for module, func, _, _ in reversed(stack))
+            self._stacks[f"{thread};{frames};[{stage}/{state}]"] += 1
+            self._seconds[(stage, state)] += weight
+
+    @staticmethod
+    def _stage_of(stack: list) -> str | None:
+        """
+        Stage of the innermost frame belonging to a known function or module,
+        IDLE if an idle background loop is reached first.
+        """
+        for module, func, _, _ in stack:
+            if (module, func) in IDLE_LOOPS:
+                return IDLE
+            stage = FUNCTION_STAGES.get((module, func)) or MODULE_STAGES.get(module)
+            if stage:
+                return stage
+        return None
+
+    def _state_of(self, leaf: tuple, stage: str) -> str:
+        """Classify the leaf frame as CPU, I/O, sleep or wait."""
+        module, func, filename, lineno = leaf
+        if module in IO_MODULES:
+            return IO
+        if (module, func) in BLOCKING_FUNCTIONS:
+            return SLEEP if stage in SLEEP_STAGES else WAIT
+
+        key = (filename, lineno)
+        state = self._line_states.get(key)
+        if state is None:
+            line = linecache.getline(filename, lineno)
+            if "sleep(" in line:
+                state = SLEEP
+            elif SQLITE_CALL.search(line):
+                state = IO
+            else:
+                state = CPU
+            self._line_states[key] = state
+        return state
+
+    def _write(self, label: str) -> None:
+        """Write the collapsed stacks, then delete the oldest files beyond keep."""
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            # Cycles woken by the change watcher can end within one second:
+            # milliseconds and a per-process counter keep the names apart.
+            self._profiles += 1
+            now = time.time()
+            stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+            path = self.output_dir / f"{label}-{stamp}-{self._profiles:04d}.folded"
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+
+            profiles = sorted(self.output_dir.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+            for old in profiles[:-self.keep]:
+                old.unlink()
+        except OSError as e:
+            log.warning("Could not write profile to %s: %s", self.output_dir, e)
+
+    def _log_summary(self, label: str, wall_sec: float) -> None:
+        """Log thread-seconds per stage, split by state, busiest stage first."""
+        per_stage: dict[str, Counter] = {}
+        for (stage, state), seconds in self._seconds.items():
+            per_stage.setdefault(stage, Counter())[state] += seconds
+
+        lines = [f"Profile of {label}: {wall_sec:.2f}s wall, thread-seconds per stage "
+                 f"({' / '.join(STATES)}):"]
+        for stage, states in sorted(per_stage.items(), key=lambda item: -sum(item[1].values())):
+            split = " / ".join(f"{states[state]:.2f}" for state in STATES)
+            lines.append(f"  {stage:<14} {sum(states.values()):7.2f}s  ({split})")
+        log.info("\n".join(lines))
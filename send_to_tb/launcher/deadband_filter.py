@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+deadband_filter.py — Change-only telemetry filter with periodic keyframes.
+Drops values that stay within a per-key deadband of the last value sent,
+and lets a full keyframe through every keyframe_interval_sec.
+State lives in memory, so it carries over between daemon cycles, and is
+kept per device when payloads carry a "device" field (gateway mode).
+"""
+
+import logging
+from collections.abc import Iterator
+
+log = logging.getLogger("deadband_filter")
+
+_MISSING = object()
+
+
+class DeadbandFilter:
+    """
+    Filters payload values against the last value sent for each key:
+      - numeric values pass when |new - last| > deadband(key),
+      - other values pass when they differ from the last one,
+      - every value passes on a keyframe.
+    A payload whose values are all filtered out is kept with empty values,
+    so the caller still deletes its row without posting it.
+    """
+
+    def __init__(
+        self,
+        deadbands: dict[str, float],
+        default_deadband: float,
+        keyframe_interval_sec: float
+    ):
+        """
+        :param deadbands:             per-key deadband, e.g. {"Temp1": 0.1}
+        :param default_deadband:      deadband for keys not listed (0 = any change)
+        :param keyframe_interval_sec: send every value at least this often (by row ts)
+        """
+        self.deadbands = deadbands
+        self.default_deadband = default_deadband
+        self.keyframe_interval_ms = int(keyframe_interval_sec * 1000)
+
+        # keyed by payload["device"] (None outside gateway mode)
+        self._last_sent: dict[str | None, dict[str, object]] = {}
+        self._last_keyframe_ts: dict[str | None, int] = {}
+        self._reset_counters()
+
+    def filter_stream(self, payloads: Iterator[dict]) -> Iterator[dict]:
+        """
+        Lazily apply the filter to a payload stream.
+        """
+        for payload in payloads:
+            yield self.apply(payload)
+
+    def apply(self, payload: dict) -> dict:
+        """
+        Return a copy of payload keeping only the values worth sending.
+        """
+        values = payload.get("values") or {}
+        ts = payload.get("ts") or 0
+        device = payload.get("device")
+        last_sent = self._last_sent.setdefault(device, {})
+        self.values_in += len(values)
+
+        if self._keyframe_due(device, ts):
+            self._last_keyframe_ts[device] = ts
+            kept = dict(values)
+        else:
+            kept = {k: v for k, v in values.items() if self._changed(last_sent, k, v)}
+
+        last_sent.update(kept)
+        self.values_out += len(kept)
+        if not kept:
+            self.rows_suppressed += 1
+        return {**payload, "values": kept}
+
+    def reset(self) -> None:
+        """
+        Forget the last-sent state (e.g. after a failed send) so the next row is a keyframe.
+        """
+        self._last_sent.clear()
+        self._last_keyframe_ts.clear()
+
+    def take_counters(self) -> tuple[int, int, int]:
+        """
+        Return (values_in, values_out, rows_suppressed) since the last call and reset them.
+        """
+        counters = (self.values_in, self.values_out, self.rows_suppressed)
+        self._reset_counters()
+        return counters
+
+    def _reset_counters(self) -> None:
+        """Zero the per-cycle counters."""
+        self.values_in = 0
+        self.values_out = 0
+        self.rows_suppressed = 0
+
+    def _keyframe_due(self, device: str | None, ts: int) -> bool:
+        """True when no keyframe was sent yet for device or the interval has elapsed."""
+        last_keyframe_ts = self._last_keyframe_ts.get(device)
+        if last_keyframe_ts is None:
+            return True
+        return ts - last_keyframe_ts >= self.keyframe_interval_ms
+
+    def _changed(self, last_sent: dict[str, object], key: str, value) -> bool:
+        """True when value moved outside the key's deadband since it was last sent."""
+        last = last_sent.get(key, _MISSING)
+        if last is _MISSING:
+            return True
+        if self._is_number(value) and self._is_number(last):
+            return abs(value - last) > self.deadbands.get(key, self.default_deadband)
+        return value != last
+
+    @staticmethod
+    def _is_number(value) -> bool:
+        """True for int/float values (bools are compared as plain values)."""
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
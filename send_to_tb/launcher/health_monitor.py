@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+health_monitor.py — In-process Sitrad watchdog for daemon mode.
+A background thread checks, every few seconds:
+  - ingest freshness: when Sitrad last wrote a reading. Sent rows are
+    deleted within seconds, so MAX(time column) of the telemetry table
+    (an index lookup since schema v2) only covers rows still waiting; the
+    ingest probes report the newest insert time the daemon has seen,
+  - the FTDI USB-serial adapter: bound interfaces under the ftdi_sio
+    driver in sysfs; a present → absent transition is a disconnect.
+A stall or a disconnect restarts Sitrad (`wineserver -k` by default), with the
+cooldown and /tmp flag files of the former scripts/watchdog/watchdog.sh.
+"""
+
+import os
+import re
+import time
+from collections.abc import Callable, Iterable
+import sqlite3
+import logging
+import threading
+import subprocess
+from utils.db.db_connect import get_sqlite_connection
+
+log = logging.getLogger("health_monitor")
+
+# sysfs entries of bound USB interfaces look like "1-1.2:1.0"
+USB_INTERFACE = re.compile(r"^\d+-[\d.]+:\d+\.\d+$")
+
+
+class HealthMonitor:
+    """
+    Watches Sitrad from inside the send_to_tb daemon.
+    Recovery follows the shell watchdog's semantics:
+      - no reset within min_reset_interval_sec of the previous one, whose
+        time is kept in last_reset_file (shared with any other watchdog),
+      - after a reset, reset_flag_file is touched; whoever consumes the flag
+        (this monitor included) restarts its staleness count from zero.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float,
+        table: str,
+        time_column: str,
+        check_interval_sec: float = 5.0,
+        stale_after_sec: float = 120.0,
+        min_reset_interval_sec: float = 10.0,
+        ftdi_sysfs_dir: str | None = "/sys/bus/usb/drivers/ftdi_sio",
+        reset_flag_file: str = "/tmp/watchdog_reset",
+        last_reset_file: str = "/tmp/watchdog_last_reset",
+        reset_command: tuple[str, ...] = ("wineserver", "-k"),
+        ingest_probes: Iterable[Callable[[], int | None]] = ()
+    ):
+        """
+        :param db_path:                path to the SQLite database file
+        :param timeout:                SQLite connection timeout in seconds
+        :param table:                  telemetry table Sitrad writes to
+        :param time_column:            insert-timestamp column (ms)
+        :param check_interval_sec:     time between two checks
+        :param stale_after_sec:        no new row for this long means Sitrad stalled
+        :param min_reset_interval_sec: cooldown between two resets
+        :param ftdi_sysfs_dir:         ftdi_sio driver directory in sysfs, None to skip
+        :param reset_flag_file:        touched after each reset
+        :param last_reset_file:        holds the Unix time of the last reset
+        :param reset_command:          command restarting Sitrad
+        :param ingest_probes:          callables returning the newest insert time (ms)
+                                       seen elsewhere (fetcher, change watcher)
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.table = table
+        self.time_column = time_column
+        self.check_interval_sec = check_interval_sec
+        self.stale_after_sec = stale_after_sec
+        self.min_reset_interval_sec = min_reset_interval_sec
+        self.ftdi_sysfs_dir = ftdi_sysfs_dir
+        self.reset_flag_file = reset_flag_file
+        self.last_reset_file = last_reset_file
+        self.reset_command = tuple(reset_command)
+        self.ingest_probes = tuple(ingest_probes)
+
+        self._max_ts_sql = f"SELECT MAX({time_column}) FROM {table}"
+        # Newest insert time seen by any source, kept across checks
+        self.last_ingest_ms = 0
+        self._baseline = time.time()
+        self._ftdi_present: bool | None = None
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the check loop on a daemon thread."""
+        self._consume_reset_flag()
+        self._thread = threading.Thread(target=self._run, name="health", daemon=True)
+        self._thread.start()
+        log.info(
+            "Health monitor started (check every %.0fs, stale after %.0fs)",
+            self.check_interval_sec, self.stale_after_sec
+        )
+
+    def stop(self) -> None:
+        """Stop the check loop and wait for it."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        """Check until stopped; a failing check is logged and retried."""
+        while not self._stop_event.wait(self.check_interval_sec):
+            try:
+                self.check()
+            except Exception:
+                log.exception("Health check failed:")
+
+    def check(self) -> None:
+        """One pass: reset flag, FTDI state, then ingest freshness."""
+        if self._consume_reset_flag():
+            log.info("Reset flag detected — staleness count reset")
+
+        if self._ftdi_disconnected():
+            log.warning("FTDI adapter disconnected — triggering recovery")
+            self.trigger_recovery()
+            return
+
+        now = time.time()
+        newest = max([self._newest_ingest_ms() or 0] + [probe() or 0 for probe in self.ingest_probes])
+        if newest > self.last_ingest_ms:
+            self.last_ingest_ms = newest
+        age = now - max(self.last_ingest_ms / 1000.0, self._baseline)
+        if age >= self.stale_after_sec:
+            log.warning("No new Sitrad rows for %.0fs — triggering recovery", age)
+            self.trigger_recovery()
+
+    def trigger_recovery(self) -> bool:
+        """
+        Restart Sitrad unless the previous reset is too recent.
+        Returns True if the reset command ran.
+        """
+        now = time.time()
+        since_last = now - self._last_reset_time()
+        if since_last < self.min_reset_interval_sec:
+            log.info(
+                "Skipping recovery — last reset was %.0fs ago (min = %.0fs)",
+                since_last, self.min_reset_interval_sec
+            )
+            return False
+
+        log.warning("Triggering Wine recovery via %s", " ".join(self.reset_command))
+        try:
+            subprocess.run(self.reset_command, timeout=30, check=False)
+        except (OSError, subprocess.SubprocessError) as e:
+            log.error("Recovery command failed: %s", e)
+
+        try:
+            with open(self.reset_flag_file, "a", encoding="utf-8"):
+                pass
+            with open(self.last_reset_file, "w", encoding="utf-8") as fh:
+                fh.write(f"{int(now)}\n")
+        except OSError as e:
+            log.warning("Could not write watchdog flag files: %s", e)
+        self._baseline = now
+        return True
+
+    def _consume_reset_flag(self) -> bool:
+        """Remove the reset flag if present and restart the staleness count."""
+        try:
+            os.remove(self.reset_flag_file)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            log.warning("Could not remove %s: %s", self.reset_flag_file, e)
+            return False
+        self._baseline = time.time()
+        return True
+
+    def _last_reset_time(self) -> float:
+        """Unix time of the last reset (0 if unknown)."""
+        try:
+            with open(self.last_reset_file, "r", encoding="utf-8") as fh:
+                return float(fh.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0.0
+
+    def _ftdi_disconnected(self) -> bool:
+        """
+        True on a present → absent transition of the FTDI adapter.
+        Absent at start-up is only logged: there is nothing to recover yet.
+        """
+        if not self.ftdi_sysfs_dir:
+            return False
+        try:
+            present = any(USB_INTERFACE.match(name) for name in os.listdir(self.ftdi_sysfs_dir))
+        except OSError:
+            present = False
+
+        previous, self._ftdi_present = self._ftdi_present, present
+        if previous is None:
+            if not present:
+                log.warning("No FTDI adapter bound under %s", self.ftdi_sysfs_dir)
+            return False
+        if present and not previous:
+            log.info("FTDI adapter connected")
+        return previous and not present
+
+    def _newest_ingest_ms(self) -> int | None:
+        """MAX(time column) of the telemetry table, None if empty or on error."""
+        try:
+            conn = get_sqlite_connection(self.db_path, self.timeout)
+            return conn.execute(self._max_ts_sql).fetchone()[0]
+        except sqlite3.Error as e:
+            log.error("SQLite error: %s", e)
+            return None
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+rate_limiter.py — Minimum-spacing rate limiter shared by concurrent senders.
+"""
+
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Hands out start slots spaced at least min_interval_sec apart,
+    however many threads ask for them. The first slot is immediate.
+    """
+
+    def __init__(self, min_interval_sec: float):
+        """
+        :param min_interval_sec: minimum delay between two granted slots
+        """
+        self.min_interval_sec = max(min_interval_sec, 0.0)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self, stop_event: threading.Event | None = None) -> bool:
+        """
+        Block until the next slot is due.
+        Returns False if stop_event was set while waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval_sec
+
+        delay = slot - now
+        if delay <= 0:
+            return True
+        if stop_event is None:
+            time.sleep(delay)
+            return True
+        return not stop_event.wait(delay)
@@ -2,17 +2,45 @@
 """
 send_launcher.py — Batch launcher with post-send batch deletion.
 Orchestrates:
-  1) fetch_and_prepare() from DataFetcher (returns list of payloads with "rowid")
-  2) chunk payloads by max_batch_size
-  3) send each batch via HttpClient.send_resilient()
-  4) for each batch, if fully sent, collect ALL rowids and delete them in bulk
-  5) enforce batch_window_sec delay between batches
-  6) at the end, clear all rows from the alarm table
+  1) iter_payloads() from DataFetcher, a lazy stream of payloads with "rowid"
+  2) pull batches of max_batch_size from the stream as they are needed
+  3) send each batch via HttpClient.send_resilient() on a bounded worker pool
+     (send_concurrency batches in flight) or, with an AsyncHttpClient, via
+     its submit() on the client's event loop (max_concurrency in flight)
+  4) for each batch, collect the delivered rowids and delete them in bulk
+     on a single delete worker (overlapping the next POSTs), record rejected
+     rows in the Outbox, and advance the fetcher's rowid watermark
+  5) space batch starts by batch_window_sec through a shared RateLimiter
+  6) with an alarm fetcher, forward the alarm table first over the same
+     client and delete the acknowledged alarms together with the first
+     telemetry batch (otherwise the alarm table is cleared at the end);
+     rejected alarms go to their own Outbox when one is configured
+  7) when the backlog passes catchup_backlog_rows, send rows older than the
+     catch-up horizon as per-bucket min/max/avg rollups first (aggregated
+     in SQL) and delete the buckets they cover; recent rows still go raw
+  8) let the DbCompactor decide once whether to checkpoint or VACUUM
+In daemon mode, run_forever() repeats the cycle on a fixed interval,
+reusing the same fetcher and client until stop() is called; with a
+DbChangeWatcher, a cycle starts as soon as Sitrad commits new rows and the
+interval is only a fallback.
+With retention_days, rows older than that are purged unsent at cycle start;
+replay() re-sends a past time window without deleting anything.
 """
 
 import time
 import logging
-from utils.db.db_cleaner import delete_rows, delete_all_rows
+import os
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager, nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from collections.abc import Iterator
+from clients.http_client import REJECTED, UNAVAILABLE
+from clients.async_http_client import AsyncHttpClient
+from launcher.rate_limiter import RateLimiter
+from utils.db.db_cleaner import delete_rows, delete_rows_by_table, delete_all_rows
+from utils.db.db_connect import close_all_connections, connection_stats
 
 log = logging.getLogger("send_launcher")
 
@@ -20,97 +48,726 @@ log = logging.getLogger("send_launcher")
 class SendToLauncher:
     """
     Launches the telemetry pipeline by combining a DataFetcher and HttpClient.
-    Payloads are sent in batches of max_batch_size; each batch fully sent
-    has all its rowids collected and deleted in one SQL transaction.
-    After all batches are processed, the alarms table is cleared.
+    Payloads are sent in batches of max_batch_size, up to send_concurrency
+    at a time; each batch fully sent has all its rowids collected and
+    deleted in one SQL transaction on a dedicated delete worker.
+    Alarms are forwarded before the telemetry when an alarm_fetcher is set,
+    and cleared unsent after it otherwise.
     """
 
-    def __init__(self, fetcher, client, max_batch_size: int, batch_window_sec: float):
+    def __init__(
+        self,
+        fetcher,
+        client,
+        max_batch_size: int,
+        batch_window_sec: float,
+        compactor=None,
+        send_concurrency: int = 1,
+        batch_sizer=None,
+        deadband=None,
+        outbox=None,
+        metrics=None,
+        metrics_exporter=None,
+        retention_days: float = 0.0,
+        profiler=None,
+        alarm_fetcher=None,
+        alarm_outbox=None,
+        change_watcher=None,
+        catchup_backlog_rows: int = 0,
+        catchup_horizon_sec: float = 6 * 3600,
+        catchup_bucket_sec: float = 900,
+        backlog_count_interval_sec: float = 60.0
+    ):
         """
         :param fetcher:         Instance of DataFetcher (fetcher.db_path must exist)
         :param client:          Instance of HttpClient (ThingsBoardClient)
         :param max_batch_size:  Max number of payloads per batch
-        :param batch_window_sec: Delay in seconds between batch sends
+        :param batch_window_sec: Minimum delay in seconds between two batch starts
+        :param compactor:       Optional DbCompactor applying the compaction policy
+        :param send_concurrency: Max number of batches in flight at once (an
+                                AsyncHttpClient's max_concurrency replaces it)
+        :param batch_sizer:     Optional AdaptiveBatchSizer overriding max_batch_size
+        :param deadband:        Optional DeadbandFilter applied between fetch and send
+                                (forces send_concurrency to 1)
+        :param outbox:          Optional Outbox tracking and quarantining rejected rows
+        :param metrics:         Optional CycleMetrics filled during each cycle
+        :param metrics_exporter: Optional MetricsExporter writing metrics after each cycle
+        :param retention_days:  Purge unsent rows older than this at cycle start (0 = never)
+        :param profiler:        Optional CycleProfiler sampling each cycle
+        :param alarm_fetcher:   Optional SitradAlarmFetcher whose rows are forwarded
+        :param alarm_outbox:    Optional Outbox tracking and quarantining rejected alarms
+        :param change_watcher:  Optional DbChangeWatcher waking run_forever() on new rows
+        :param catchup_backlog_rows: Backlog size that switches old rows to rollups (0 = never)
+        :param catchup_horizon_sec:  Rows younger than this are always sent raw
+        :param catchup_bucket_sec:   Width of one rollup bucket
+        :param backlog_count_interval_sec: Min time between two backlog COUNT(*) queries
         """
         self.fetcher = fetcher
         self.client = client
         self.max_batch_size = max_batch_size
         self.batch_window_sec = batch_window_sec
+        self.compactor = compactor
+        self.send_concurrency = max(send_concurrency, 1)
+        self._async_send = isinstance(client, AsyncHttpClient)
+        if self._async_send:
+            # Batches are coroutines on the client's loop: its POST window
+            # is the batch window too, with no send-pool thread per batch.
+            self.send_concurrency = client.max_concurrency
+        if deadband and self.send_concurrency > 1:
+            # A batch is filtered against the values of the batches before it;
+            # with several in flight, one failing would leave later batches
+            # suppressed against values the server never received.
+            log.warning(
+                "Deadband filtering sends one batch at a time — send_concurrency %d ignored.",
+                self.send_concurrency
+            )
+            self.send_concurrency = 1
+        self.batch_sizer = batch_sizer
+        self.deadband = deadband
+        self.outbox = outbox
+        self.metrics = metrics
+        self.metrics_exporter = metrics_exporter
+        self.retention_days = retention_days
+        self.profiler = profiler
+        self.alarm_fetcher = alarm_fetcher
+        self.alarm_outbox = alarm_outbox
+        self.change_watcher = change_watcher
+        self.catchup_backlog_rows = catchup_backlog_rows
+        self.catchup_horizon_sec = catchup_horizon_sec
+        self.catchup_bucket_sec = catchup_bucket_sec
+        self.backlog_count_interval_sec = backlog_count_interval_sec
 
-    def _fetch_payloads(self) -> list[dict]:
+        self._stop_event = threading.Event()
+        self._rate_limiter = RateLimiter(batch_window_sec)
+        self._send_pool = ThreadPoolExecutor(
+            max_workers=self.send_concurrency, thread_name_prefix="send"
+        )
+        self._delete_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="delete")
+        self._pending_deletes: deque[Future] = deque()
+        self._batch_no = 0
+        self._deleted_rows = 0
+        self._watermark_blocked = False
+        self._link_down = False
+        self._acked_alarms: list[int] = []
+        self._backlog: int | None = None
+        self._backlog_counted_at: float | None = None
+        self._periodic = False
+
+    def _fetch_payloads(self) -> Iterator[dict]:
         """
-        Retrieve fresh telemetry payloads from the fetcher.
+        Return a lazy stream of telemetry payloads from the fetcher,
+        passed through the deadband filter when one is configured.
         Each payload is a dict containing keys "rowid", "ts", and "values".
         """
-        payloads = self.fetcher.fetch_and_prepare()
+        payloads = self.fetcher.iter_payloads()
+        if self.metrics:
+            payloads = self._timed_fetch(payloads)
+        if self.deadband:
+            return self.deadband.filter_stream(payloads)
         return payloads
 
-    def _send_in_chunks(self, payloads: list[dict]) -> None:
+    def _timed_fetch(self, payloads: Iterator[dict]) -> Iterator[dict]:
         """
-        Loop through payloads in batches of max_batch_size,
-        delegate each batch to _process_batch(),
-        and enforce delay between batches.
+        Pass the fetcher stream through, adding the time spent inside it
+        to the cycle's fetch_seconds and counting rows_fetched.
         """
-        total = len(payloads)
-        log.info(f"Processing {total} payload(s) in batches of {self.max_batch_size}.")
-        if total == 0:
-            log.error("[NO_DATA] No payloads to send — skipping telemetry push.")
-            return
+        try:
+            while True:
+                with self.metrics.timed("fetch"):
+                    payload = next(payloads, None)
+                if payload is None:
+                    return
+                self.metrics.add("rows_fetched", 1)
+                yield payload
+        finally:
+            payloads.close()
+
+    def _timed(self, stage: str):
+        """Context manager timing a stage into the metrics, if enabled."""
+        return self.metrics.timed(stage) if self.metrics else nullcontext()
+
+    def _batch_size(self) -> int:
+        """
+        Size of the next batch: the adaptive size if enabled, else max_batch_size.
+        """
+        if self.batch_sizer:
+            return self.batch_sizer.size
+        return self.max_batch_size
+
+    def _iter_batches(self, payloads: Iterator[dict]) -> Iterator[list[dict]]:
+        """
+        Group a payload stream into lists of at most _batch_size() payloads,
+        pulling only as many payloads as the next batch needs. The adaptive
+        sizer is told how many rows each batch got.
+        """
+        while batch := list(islice(payloads, self._batch_size())):
+            if self.batch_sizer:
+                self.batch_sizer.note_batch(len(batch))
+            yield batch
+
+    def _send_in_chunks(self, payloads: Iterator[dict]) -> int:
+        """
+        Loop through the payload stream in batches of _batch_size() and
+        keep up to send_concurrency batches in flight on the send pool.
+        Batch starts are spaced by the shared batch_window_sec rate limit.
+        Batches are completed in submission order by _complete_batch(),
+        so the watermark only advances over a contiguous run of sent batches.
+        Returns the number of payloads processed; nothing is pulled from the
+        stream when the server was already found unavailable this cycle.
+        """
+        if self._link_down:
+            log.warning("Server unavailable — skipping telemetry, rows deferred to next cycle.")
+            return 0
+
+        log.info(
+            f"Processing payloads in batches of {self._batch_size()} "
+            f"({self.send_concurrency} in flight)."
+        )
+        total = 0
+        in_flight: deque = deque()
+
+        try:
+            for batch in self._iter_batches(payloads):
+                if not self._rate_limiter.wait(self._stop_event):
+                    log.info("Stop requested — remaining batches left for next run.")
+                    break
+
+                if self._link_down:
+                    log.warning("Server unavailable — remaining rows deferred to next cycle.")
+                    break
+
+                total += len(batch)
+                self._batch_no += 1
+                in_flight.append((self._batch_no, batch, self._submit_batch(batch)))
 
-        for batch_no, start in enumerate(range(0, total, self.max_batch_size), start=1):
-            batch = payloads[start: start + self.max_batch_size]
-            self._process_batch(batch, batch_no)
-            time.sleep(self.batch_window_sec)
+                while len(in_flight) >= self.send_concurrency:
+                    self._complete_batch(*in_flight.popleft())
 
-        log.info("All batches processed.")
+                if self._stop_event.is_set():
+                    log.info("Stop requested — remaining batches left for next run.")
+                    break
+        finally:
+            while in_flight:
+                self._complete_batch(*in_flight.popleft())
+            self._drain_deletes()
 
-    def _process_batch(self, batch: list[dict], batch_no: int) -> None:
+        return total
+
+    def _submit_batch(self, batch: list[dict]) -> Future:
         """
-        Send one batch via client.send_resilient(),
-        delete its rowids if fully sent, and log the result.
+        Start sending a batch; the Future resolves to _send_batch()'s result.
+        An AsyncHttpClient runs it on its event loop, any other client on a
+        send-pool thread.
         """
-        sent = self.client.send_resilient(batch)
+        if not self._async_send:
+            return self._send_pool.submit(self._send_batch, batch)
+
+        to_send = [entry for entry in batch if entry.get("values")]
+        suppressed = len(batch) - len(to_send)
+        failed: list = []
+        result: Future = Future()
+        if not to_send:
+            result.set_result((suppressed, failed))
+            return result
 
-        if sent == len(batch):
-            self._delete_batch_rowids(batch)
+        def settle(sending: Future) -> None:
+            try:
+                result.set_result((sending.result() + suppressed, failed))
+            except Exception as e:
+                result.set_exception(e)
+
+        self.client.submit(to_send, failed).add_done_callback(settle)
+        return result
+
+    def _send_batch(self, batch: list[dict]) -> tuple[int, list]:
+        """
+        Send-pool job: post the payloads that still carry values.
+        Rows emptied by the deadband filter count as sent, so they get deleted.
+        Returns (sent, failed) where failed holds (payload, verdict) pairs.
+        """
+        to_send = [entry for entry in batch if entry.get("values")]
+        suppressed = len(batch) - len(to_send)
+        failed: list = []
+        if not to_send:
+            return suppressed, failed
+        return self.client.send_resilient(to_send, failed) + suppressed, failed
+
+    def _complete_batch(self, batch_no: int, batch: list[dict], future: Future) -> None:
+        """
+        Wait for one batch's send, log the result, and queue a settle job on
+        the delete worker (so it overlaps with the next POSTs): delivered rows
+        are deleted, rejected rows go to the outbox when one is configured.
+        Unavailable rows stay in place, block the watermark and end the cycle.
+        """
+        try:
+            sent, failed = future.result()
+        except Exception:
+            log.exception(f"Batch {batch_no}: send failed")
+            sent, failed = 0, [(entry, UNAVAILABLE) for entry in batch]
 
         log.info(f"Batch {batch_no}: sent {sent}/{len(batch)}")
 
-    def _delete_batch_rowids(self, batch: list[dict]) -> None:
+        failed_rowids = {payload.get("rowid") for payload, _ in failed}
+        delivered = [entry for entry in batch if entry.get("rowid") not in failed_rowids]
+        rejected = [payload for payload, verdict in failed if verdict == REJECTED]
+        if self.metrics:
+            self.metrics.record_batch(len(delivered), len(failed))
+
+        if failed:
+            if self.deadband:
+                self.deadband.reset()
+            if len(rejected) < len(failed):
+                self._link_down = True
+            if len(rejected) < len(failed) or not self.outbox:
+                self._watermark_blocked = True
+
+        commit_rowid = None
+        if not self._watermark_blocked:
+            commit_rowid = max(entry["rowid"] for entry in batch)
+
+        alarm_rowids, self._acked_alarms = self._acked_alarms, []
+        self._pending_deletes.append(self._delete_pool.submit(
+            self._settle_batch,
+            delivered,
+            rejected if self.outbox else [],
+            commit_rowid,
+            alarm_rowids
+        ))
+
+        while self._pending_deletes and self._pending_deletes[0].done():
+            self._collect_delete(self._pending_deletes.popleft())
+
+    def _settle_batch(
+        self,
+        delivered: list[dict],
+        rejected: list[dict],
+        commit_rowid: int | None,
+        alarm_rowids: list[int] = ()
+    ) -> int:
+        """
+        Delete worker job: remove delivered rowids and acknowledged alarm
+        rowids in one transaction (and the outbox entries), record rejected
+        rows in the outbox, run the incremental compaction step and, if
+        allowed, advance the fetcher watermark.
+        Returns the number of rows removed.
         """
-        Collect all rowids from a batch and delete them in one SQL transaction.
+        with self._timed("delete"):
+            deleted = self._delete_batch_rowids(delivered, alarm_rowids)
+            if self.outbox:
+                self.outbox.clear([entry["rowid"] for entry in delivered])
+                deleted += self.outbox.record_failures(rejected, REJECTED)
+            if self.alarm_outbox:
+                self.alarm_outbox.clear(list(alarm_rowids))
+        if deleted and self.compactor:
+            with self._timed("compaction"):
+                self.compactor.after_delete()
+        if commit_rowid is not None and commit_rowid > self.fetcher.watermark:
+            self.fetcher.commit_watermark(commit_rowid)
+        return deleted
+
+    def _collect_delete(self, future: Future) -> None:
+        """
+        Add a finished delete job to the cycle's deleted-row count.
+        A failed delete stops the watermark from advancing further.
+        """
+        try:
+            self._deleted_rows += future.result()
+        except Exception:
+            log.exception("Deleting sent rows failed:")
+            self._watermark_blocked = True
+
+    def _drain_deletes(self) -> None:
+        """
+        Wait for every queued delete job of this cycle.
+        """
+        while self._pending_deletes:
+            self._collect_delete(self._pending_deletes.popleft())
+
+    def _delete_batch_rowids(self, batch: list[dict], alarm_rowids: list[int] = ()) -> int:
+        """
+        Collect all rowids from a batch and delete them, with the given
+        alarm rowids, in one SQL transaction.
+        Returns the number of rowids deleted.
         """
         rowids = [entry["rowid"] for entry in batch if entry.get("rowid") is not None]
-        if not rowids:
-            return
+        if not alarm_rowids:
+            if not rowids:
+                return 0
+            return delete_rows(
+                db_path=self.fetcher.db_path,
+                table_name=self.fetcher.tables["telemetry"],
+                rowids=rowids,
+                timeout=self.fetcher.timeout
+            )
 
-        delete_rows(
+        return delete_rows_by_table(
             db_path=self.fetcher.db_path,
-            table_name=self.fetcher.tables["telemetry"],
-            rowids=rowids,
+            rowids_by_table={
+                self.fetcher.tables["telemetry"]: rowids,
+                self.alarm_fetcher.table: list(alarm_rowids),
+            },
             timeout=self.fetcher.timeout
         )
 
-    def start(self):
+    def _forward_alarms(self) -> None:
+        """
+        Send the alarm table in batches over the telemetry client. The rowids
+        of accepted alarms (and of empty alarm rows, which are not posted)
+        are kept for the first telemetry settle job, so
+        they are deleted in the same transaction. Rejected alarms are
+        recorded in the alarm outbox (retried with back-off, quarantined
+        after its max_attempts) or, without one, stay in the table for the
+        next cycle. Stops when the server is unavailable.
         """
-        Entry point:
-          1) Fetch all payloads (list of dicts with "rowid", "ts", "values").
-          2) Chunk them by max_batch_size and call _send_in_chunks().
-          3) After all telemetry rows are sent & deleted, clear the alarm table.
+        self.alarm_fetcher.rewind()
+        payloads = self.alarm_fetcher.iter_payloads()
+        forwarded = 0
+        try:
+            for batch in self._iter_batches(payloads):
+                if not self._rate_limiter.wait(self._stop_event):
+                    break
+                _sent, failed = self._send_batch(batch)
+                failed_ids = {id(payload) for payload, _ in failed}
+                acked = [entry["alarm_rowid"] for entry in batch if id(entry) not in failed_ids]
+                self._acked_alarms.extend(acked)
+                forwarded += len(acked)
+                rejected = [payload for payload, verdict in failed if verdict == REJECTED]
+                if rejected and self.alarm_outbox:
+                    with self._timed("delete"):
+                        self._deleted_rows += self.alarm_outbox.record_failures(rejected, REJECTED)
+                elif rejected:
+                    log.error("%d alarm(s) rejected by the server, kept for the next cycle.", len(rejected))
+                if len(rejected) < len(failed):
+                    log.warning("Server unavailable — alarms deferred to next cycle.")
+                    self._link_down = True
+                    break
+        finally:
+            payloads.close()
+        if forwarded:
+            log.info("Forwarded %d alarm(s)", forwarded)
+
+    def _catch_up(self) -> None:
+        """
+        Once the backlog reaches catchup_backlog_rows, send the rows older
+        than the horizon as one min/max/avg rollup per bucket (aggregated by
+        SQLite over the time-column index), deleting the buckets of each
+        accepted batch in one transaction. Rejected rollups keep their rows
+        for the next cycle; stops when the server is unavailable.
+        """
+        if self.catchup_backlog_rows <= 0 or self._link_down:
+            return
+        backlog = self._backlog_rows()
+        if backlog is None or backlog < self.catchup_backlog_rows:
+            return
+
+        bucket_ms = max(int(self.catchup_bucket_sec * 1000), 1000)
+        horizon_ms = int((time.time() - self.catchup_horizon_sec) * 1000)
+        end_ms = horizon_ms // bucket_ms * bucket_ms
+        log.warning(
+            "Catch-up: backlog of %d row(s) — rolling up rows older than %.1fh into %ds buckets",
+            backlog, self.catchup_horizon_sec / 3600, bucket_ms // 1000
+        )
+
+        sent = deleted = 0
+        rollups = self.fetcher.iter_rollups(end_ms, bucket_ms)
+        try:
+            for batch in self._iter_batches(rollups):
+                if not self._rate_limiter.wait(self._stop_event):
+                    break
+                _sent, failed = self._send_batch(batch)
+                failed_ids = {id(payload) for payload, _ in failed}
+                acked = [entry for entry in batch if id(entry) not in failed_ids]
+                if acked:
+                    with self._timed("delete"):
+                        deleted += self.fetcher.delete_rollups(acked)
+                    sent += len(acked)
+                if any(verdict == UNAVAILABLE for _, verdict in failed):
+                    log.warning("Server unavailable — catch-up deferred to next cycle.")
+                    self._link_down = True
+                    break
+                if failed:
+                    log.error("%d rollup(s) rejected by the server, rows kept for the next cycle.", len(failed))
+        finally:
+            rollups.close()
+
+        self._deleted_rows += deleted
+        if sent:
+            self._backlog_counted_at = None
+            log.info("Catch-up: sent %d rollup(s) replacing %d row(s)", sent, deleted)
+
+    def _settle_alarms(self) -> None:
+        """
+        Delete acknowledged alarms that no telemetry batch took along.
+        """
+        if not self._acked_alarms:
+            return
+        alarm_rowids, self._acked_alarms = self._acked_alarms, []
+        self._deleted_rows += self._settle_batch([], [], None, alarm_rowids)
+
+    def _log_encoding_totals(self) -> None:
+        """
+        Log JSON bytes vs. bytes on the wire for this cycle's POSTs.
+        """
+        raw, wire = self.client.encoder.take_totals()
+        if raw:
+            log.info(
+                "Payload bytes this cycle: %d JSON → %d on the wire (%.0f%%)",
+                raw, wire, 100.0 * wire / raw
+            )
+
+    def _log_deadband_counters(self) -> None:
+        """
+        Log how many values the deadband filter let through this cycle.
+        """
+        if not self.deadband:
+            return
+        values_in, values_out, suppressed = self.deadband.take_counters()
+        log.info(
+            "Deadband: kept %d/%d value(s), %d row(s) deleted without sending",
+            values_out, values_in, suppressed
+        )
+
+    def _backlog_rows(self) -> int | None:
+        """
+        Rows left in the telemetry table. fetcher.backlog_size() is a full
+        COUNT(*), so in daemon mode it runs at most once per
+        backlog_count_interval_sec and the last count is reused in between.
+        One-shot runs (timer, replay) would count on every invocation, so
+        they use fetcher.backlog_estimate() instead.
+        """
+        if not self._periodic:
+            return self.fetcher.backlog_estimate()
+        now = time.monotonic()
+        if (self._backlog_counted_at is None
+                or now - self._backlog_counted_at >= self.backlog_count_interval_sec):
+            self._backlog = self.fetcher.backlog_size()
+            self._backlog_counted_at = now
+        return self._backlog
+
+    def _publish_metrics(self) -> None:
+        """
+        Close the cycle's metrics (client counters, backlog, file sizes)
+        and hand them to the exporter.
+        """
+        if not self.metrics:
+            return
+        retries, splits = self.client.take_counters()
+        db_path = self.fetcher.db_path
+        cycle = self.metrics.finish_cycle(
+            retries=retries,
+            splits=splits,
+            backlog_rows=self._backlog_rows(),
+            db_bytes=self._file_size(db_path),
+            wal_bytes=self._file_size(f"{db_path}-wal")
+        )
+        log.info(
+            "Cycle metrics: %.2fs total, fetch %.2fs, delete %.2fs, compaction %.2fs, "
+            "%d POST(s), %d retry(ies), %d split(s), backlog %s row(s)",
+            cycle["duration_seconds"], cycle["fetch_seconds"], cycle["delete_seconds"],
+            cycle["compaction_seconds"], cycle["posts"], retries, splits, cycle["backlog_rows"]
+        )
+        if self.metrics_exporter:
+            self.metrics_exporter.export(self.metrics)
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        """Size of path in bytes, 0 if it does not exist."""
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _compact(self) -> None:
+        """
+        Apply the end-of-cycle compaction policy. A full VACUUM may renumber
+        rowids: outbox entries are carried over to their rows' new rowids
+        around it, and the fetcher watermark and the client's rejected-rowid
+        cache are reset when one ran.
+        """
+        with self._timed("compaction"):
+            vacuumed = self.compactor and self.compactor.end_cycle(
+                self._deleted_rows, self._outboxes_across_vacuum
+            )
+        if vacuumed:
+            self.fetcher.commit_watermark(0)
+            self.client.forget_all()
+
+    @contextmanager
+    def _outboxes_across_vacuum(self):
+        """Carry the telemetry and alarm outbox entries across a VACUUM."""
+        with ExitStack() as stack:
+            for outbox in (self.outbox, self.alarm_outbox):
+                if outbox:
+                    stack.enter_context(outbox.across_vacuum())
+            yield
+
+    def _purge_expired(self) -> None:
+        """
+        Drop rows past the retention age before they are fetched; they count
+        as deleted rows for the compaction policy.
+        """
+        if self.retention_days <= 0:
+            return
+        with self._timed("delete"):
+            purged = self.fetcher.purge_older_than(self.retention_days * 86400)
+        if purged:
+            log.warning(
+                "Retention: purged %d unsent row(s) older than %g day(s)",
+                purged, self.retention_days
+            )
+            self._deleted_rows += purged
+
+    def replay(self, start_ms: int, end_ms: int | None = None) -> int:
+        """
+        Re-send the rows inserted in [start_ms, end_ms) in batches, without
+        deleting them or moving the watermark (the rows may already have been
+        sent). Stops at the first batch the server does not fully accept.
+        Returns the number of payloads delivered.
+        """
+        log.info("[REPLAY_START] Replaying rows inserted from %d to %s", start_ms, end_ms or "now")
+        delivered = 0
+        payloads = self.fetcher.iter_time_range(start_ms, end_ms)
+        for batch in self._iter_batches(payloads):
+            if not self._rate_limiter.wait(self._stop_event):
+                break
+            sent, failed = self._send_batch(batch)
+            delivered += sent
+            if failed:
+                log.warning("Replay stopped: %d row(s) not accepted by the server.", len(failed))
+                break
+        log.info("[REPLAY_DONE] %d payload(s) replayed", delivered)
+        return delivered
+
+    def run_cycle(self) -> None:
+        """
+        Run a single telemetry cycle, under the profiler if one is configured.
+        """
+        if not self.profiler:
+            self._run_cycle()
+            return
+        with self.profiler.profile():
+            self._run_cycle()
+
+    def _run_cycle(self) -> None:
+        """
+        Run a single telemetry cycle:
+          0) Purge rows past the retention age, if configured, forward
+             the alarm table when an alarm fetcher is set, and roll up old
+             rows when the backlog calls for catch-up.
+          1) Stream payloads (dicts with "rowid", "ts", "values") from the watermark.
+          2) Send them in batches of max_batch_size via _send_in_chunks().
+          3) Delete acknowledged alarms no telemetry batch took along or,
+             without an alarm fetcher, clear the alarm table.
+          4) Apply the compaction policy once.
+          5) Publish the cycle's metrics, if enabled.
+        The fetcher and client are left open for the next cycle.
         """
         log.info("[TELEMETRY_START] Starting telemetry cycle")
+        if self.metrics:
+            self.metrics.start_cycle()
+
+        self._batch_no = 0
+        self._deleted_rows = 0
+        self._watermark_blocked = False
+        self._link_down = False
 
+        self._purge_expired()
+        for outbox in (self.outbox, self.alarm_outbox):
+            if outbox:
+                outbox.prune()
+        self._acked_alarms = []
+        if self.alarm_fetcher:
+            self._forward_alarms()
+        self._catch_up()
+
+        self.fetcher.rewind()
         payloads = self._fetch_payloads()
-        self._send_in_chunks(payloads)
+        try:
+            total = self._send_in_chunks(payloads)
+        finally:
+            payloads.close()
 
-        delete_all_rows(
-            db_path=self.fetcher.db_path,
-            table_name=self.fetcher.tables["alarm"],
-            timeout=self.fetcher.timeout
-        )
+        if total:
+            log.info(f"All batches processed ({total} payload(s)).")
+            self._log_encoding_totals()
+            self._log_deadband_counters()
+        elif not self._link_down:
+            log.error("[NO_DATA] No payloads to send — skipping telemetry push.")
 
-        self.client.close()
-        log.info("Http client closed.")
+        if self.alarm_fetcher:
+            self._settle_alarms()
+        else:
+            with self._timed("delete"):
+                self._deleted_rows += delete_all_rows(
+                    db_path=self.fetcher.db_path,
+                    table_name=self.fetcher.tables["alarm"],
+                    timeout=self.fetcher.timeout
+                )
+
+        self._compact()
+        self._publish_metrics()
 
         log.info("[TELEMETRY_DONE] Telemetry cycle completed")
 
+    def start(self):
+        """
+        One-shot entry point: run a single cycle, then close the client.
+        """
+        try:
+            self.run_cycle()
+        finally:
+            self.close()
+
+    def run_forever(self, interval_sec: float) -> None:
+        """
+        Daemon entry point: run a cycle every interval_sec seconds
+        (measured from the start of each cycle) until stop() is called.
+        With a change watcher, the next cycle starts early once new rows
+        are committed. A failing cycle is logged and the loop keeps going.
+        The launcher is left open: the caller calls close() once nothing
+        else uses it (e.g. after stopping the health monitor, which reads
+        the database on its own thread).
+        """
+        self._periodic = True
+        if self.change_watcher:
+            log.info("Daemon mode started (on new rows, fallback interval = %.1fs)", interval_sec)
+        else:
+            log.info("Daemon mode started (interval = %.1fs)", interval_sec)
+        try:
+            while not self._stop_event.is_set():
+                started = time.monotonic()
+                try:
+                    self.run_cycle()
+                except Exception:
+                    log.exception("Telemetry cycle failed:")
+
+                remaining = max(interval_sec - (time.monotonic() - started), 0)
+                if self.change_watcher:
+                    self.change_watcher.wait(remaining, self._stop_event)
+                else:
+                    self._stop_event.wait(remaining)
+        finally:
+            log.info("Daemon mode stopped.")
+
+    def stop(self) -> None:
+        """
+        Request a clean shutdown: the current batch finishes,
+        then the loop exits. Safe to call from a signal handler.
+        """
+        self._stop_event.set()
+
+    def close(self) -> None:
+        """Stop the worker pools, close the HTTP client and every pooled SQLite connection."""
+        self._send_pool.shutdown(wait=True)
+        self._delete_pool.shutdown(wait=True)
+        self.client.close()
+        log.info("Http client closed.")
+        if self.change_watcher:
+            self.change_watcher.close()
+
+        stats = connection_stats()
+        close_all_connections()
+        log.info(
+            "SQLite connections closed (opened=%d, reused=%d).",
+            stats["opened"], stats["reused"]
+        )
@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """
 main.py — Entrypoint: load .env, configure logging, purge logs, and start loop.
+Run once per invocation (systemd timer) or, with --daemon, as a long-running
+process that repeats the cycle every DAEMON_INTERVAL_SEC until SIGTERM.
 """
 
 import os
 import sys
+import time
+import signal
 import logging
+import argparse
+import dataclasses
 from pathlib import Path
 
 pkg_dir = Path(__file__).resolve().parent
@@ -13,8 +19,20 @@ sys.path.insert(0, str(pkg_dir))
 
 from dotenv import load_dotenv
 from clients.thingsboard_client import ThingsBoardClient
+from clients.async_http_client import AsyncThingsBoardClient
+from clients.payload_encoder import PayloadEncoder
+from clients.mqtt_transport import MqttTransport
 from fetchers.sitrad_data_fetcher import SitradDataFetcher
+from fetchers.sitrad_alarm_fetcher import SitradAlarmFetcher
 from launcher.send_launcher import SendToLauncher
+from launcher.adaptive_batch_sizer import AdaptiveBatchSizer
+from launcher.deadband_filter import DeadbandFilter
+from launcher.cycle_metrics import CycleMetrics, MetricsExporter
+from launcher.cycle_profiler import CycleProfiler
+from launcher.health_monitor import HealthMonitor
+from utils.db.db_change_watcher import DbChangeWatcher
+from utils.db.db_compactor import DbCompactor
+from utils.db.db_outbox import Outbox
 from utils.log.log_cleaner import purge_old_logs
 from utils.log.log_setup import setup_logging
 from utils.config import Config
@@ -31,44 +49,296 @@ def build_launcher(cfg: Config) -> SendToLauncher:
         "alarm": cfg.alarm_table
     }
 
+    # Created first: the fetcher's queries reference the outbox table.
+    outbox = None
+    if cfg.outbox_enabled:
+        outbox = Outbox(
+            db_path=cfg.db_path,
+            timeout=cfg.sqlite_timeout_sec,
+            telemetry_table=cfg.telemetry_table,
+            outbox_table=cfg.outbox_table,
+            dead_letter_table=cfg.dead_letter_table,
+            max_attempts=cfg.outbox_max_attempts,
+            retry_base_sec=cfg.outbox_retry_base_sec,
+            retry_max_sec=cfg.outbox_retry_max_sec
+        )
+
+    alarm_outbox = None
+    if cfg.outbox_enabled and cfg.forward_alarms:
+        alarm_outbox = Outbox(
+            db_path=cfg.db_path,
+            timeout=cfg.sqlite_timeout_sec,
+            telemetry_table=cfg.alarm_table,
+            outbox_table=cfg.alarm_outbox_table,
+            dead_letter_table=cfg.dead_letter_table,
+            max_attempts=cfg.outbox_max_attempts,
+            retry_base_sec=cfg.outbox_retry_base_sec,
+            retry_max_sec=cfg.outbox_retry_max_sec,
+            id_key="alarm_rowid"
+        )
+
     fetcher = SitradDataFetcher(
         db_path=cfg.db_path,
         timeout=cfg.sqlite_timeout_sec,
         schema_version=cfg.schema_version,
         time_column=cfg.time_column_name,
-        tables=tables
+        tables=tables,
+        page_size=cfg.fetch_page_size,
+        watermark_file=cfg.watermark_file,
+        incremental_auto_vacuum=cfg.compaction_mode == "incremental",
+        outbox_table=outbox.outbox_table if outbox else None,
+        device_column=cfg.device_column
     )
 
-    client = ThingsBoardClient(
+    alarm_fetcher = None
+    if cfg.forward_alarms:
+        alarm_fetcher = SitradAlarmFetcher(
+            db_path=cfg.db_path,
+            timeout=cfg.sqlite_timeout_sec,
+            table=cfg.alarm_table,
+            time_column=cfg.alarm_time_column,
+            page_size=cfg.fetch_page_size,
+            device_column=cfg.device_column,
+            outbox_table=alarm_outbox.outbox_table if alarm_outbox else None
+        )
+
+    transport = None
+    gateway_device_name = None
+    gzip_body = cfg.gzip_body
+    if cfg.transport == "mqtt":
+        transport = MqttTransport(
+            host=cfg.mqtt_host,
+            port=cfg.mqtt_port,
+            username=cfg.device_token,
+            client_id=cfg.mqtt_client_id,
+            use_tls=cfg.mqtt_tls,
+            keepalive_sec=cfg.mqtt_keepalive_sec,
+            max_inflight=cfg.mqtt_max_inflight,
+            connect_timeout=cfg.post_timeout_sec
+        )
+        # ThingsBoard MQTT expects plain JSON; one topic serves every device.
+        gzip_body = False
+        if cfg.device_column:
+            gateway_device_name = cfg.gateway_device_name
+
+    client_kwargs = {}
+    client_cls = ThingsBoardClient
+    if cfg.async_client:
+        client_cls = AsyncThingsBoardClient
+        client_kwargs["max_concurrency"] = cfg.http_max_concurrency
+
+    client = client_cls(
         device_token=cfg.device_token,
         max_retry=cfg.max_retry,
         initial_delay=cfg.initial_delay_sec,
         max_delay=cfg.max_delay_sec,
         timeout=cfg.post_timeout_sec,
-        min_batch_size_to_split=cfg.min_batch_size_to_split
+        min_batch_size_to_split=cfg.min_batch_size_to_split,
+        pool_maxsize=max(cfg.send_concurrency, cfg.http_max_concurrency, 10),
+        encoder=PayloadEncoder(
+            compact=cfg.compact_json,
+            gzip_enabled=gzip_body,
+            gzip_level=cfg.gzip_level,
+            gzip_min_bytes=cfg.gzip_min_bytes
+        ),
+        shape_payloads=cfg.shape_payloads,
+        isolate_rejected=cfg.isolate_rejected,
+        reject_cache_size=cfg.reject_cache_size,
+        device_tokens=cfg.device_tokens,
+        transport=transport,
+        gateway_device_name=gateway_device_name,
+        base_url=cfg.tb_base_url,
+        **client_kwargs
+    )
+
+    batch_sizer = None
+    if cfg.adaptive_batch:
+        batch_sizer = AdaptiveBatchSizer(
+            initial_size=cfg.max_batch_size,
+            min_size=cfg.adaptive_min_batch_size,
+            max_size=cfg.adaptive_max_batch_size,
+            increase_step=cfg.adaptive_increase_step,
+            decrease_factor=cfg.adaptive_decrease_factor,
+            latency_target_sec=cfg.adaptive_latency_target_sec
+        )
+        client.add_observer(batch_sizer.observe)
+
+    deadband = None
+    if cfg.deadband_enabled:
+        deadband = DeadbandFilter(
+            deadbands=cfg.deadband_keys,
+            default_deadband=cfg.deadband_default,
+            keyframe_interval_sec=cfg.keyframe_interval_sec
+        )
+
+    metrics = None
+    metrics_exporter = None
+    if cfg.metrics_enabled:
+        metrics = CycleMetrics()
+        client.add_observer(metrics.observe_post)
+        if cfg.metrics_textfile or cfg.metrics_json_file:
+            metrics_exporter = MetricsExporter(cfg.metrics_textfile, cfg.metrics_json_file)
+
+    profiler = None
+    if cfg.profile_enabled:
+        profiler = CycleProfiler(
+            output_dir=pkg_dir / cfg.profile_dir,
+            interval_sec=cfg.profile_interval_ms / 1000.0,
+            keep=cfg.profile_keep
+        )
+
+    compactor = DbCompactor(
+        db_path=cfg.db_path,
+        timeout=cfg.sqlite_timeout_sec,
+        mode=cfg.compaction_mode,
+        incremental_pages=cfg.incremental_vacuum_pages,
+        checkpoint_interval_sec=cfg.wal_checkpoint_interval_sec,
+        checkpoint_wal_bytes=int(cfg.wal_checkpoint_size_mb * 1024 * 1024),
+        full_vacuum_freelist_ratio=cfg.full_vacuum_freelist_ratio
     )
 
+    change_watcher = None
+    if cfg.db_watch:
+        change_watcher = DbChangeWatcher(
+            db_path=cfg.db_path,
+            timeout=cfg.sqlite_timeout_sec,
+            table=cfg.telemetry_table,
+            time_column=cfg.time_column_name,
+            poll_interval_sec=cfg.db_watch_poll_ms / 1000.0,
+            settle_sec=cfg.db_watch_settle_ms / 1000.0,
+            max_latency_sec=cfg.db_watch_max_latency_sec
+        )
+
     return SendToLauncher(
         fetcher,
         client,
         max_batch_size=cfg.max_batch_size,
-        batch_window_sec=cfg.batch_window_sec
+        batch_window_sec=cfg.batch_window_sec,
+        compactor=compactor,
+        send_concurrency=cfg.send_concurrency,
+        batch_sizer=batch_sizer,
+        deadband=deadband,
+        outbox=outbox,
+        metrics=metrics,
+        metrics_exporter=metrics_exporter,
+        retention_days=cfg.retention_days,
+        profiler=profiler,
+        alarm_fetcher=alarm_fetcher,
+        alarm_outbox=alarm_outbox,
+        change_watcher=change_watcher,
+        catchup_backlog_rows=cfg.catchup_backlog_rows,
+        catchup_horizon_sec=cfg.catchup_horizon_hours * 3600,
+        catchup_bucket_sec=cfg.catchup_bucket_sec,
+        backlog_count_interval_sec=cfg.metrics_backlog_interval_sec
+    )
+
+def build_health_monitor(cfg: Config, launcher: SendToLauncher) -> HealthMonitor:
+    """
+    Instantiate the Sitrad health monitor run alongside the daemon loop.
+    Sent rows are deleted right away, so the monitor also reads the newest
+    insert time the launcher's fetcher and, with DB_WATCH, the change watcher
+    have seen; the watcher sees a row before the cycle it triggers sends it.
+    """
+    probes = [lambda: launcher.fetcher.newest_ts_ms]
+    if launcher.change_watcher:
+        probes.append(lambda: launcher.change_watcher.newest_ms)
+
+    return HealthMonitor(
+        db_path=cfg.db_path,
+        timeout=cfg.sqlite_timeout_sec,
+        table=cfg.telemetry_table,
+        time_column=cfg.time_column_name,
+        check_interval_sec=cfg.health_check_interval_sec,
+        stale_after_sec=cfg.health_stale_after_sec,
+        min_reset_interval_sec=cfg.health_min_reset_interval_sec,
+        ftdi_sysfs_dir=cfg.ftdi_sysfs_dir,
+        reset_flag_file=cfg.watchdog_reset_flag,
+        last_reset_file=cfg.watchdog_last_reset_file,
+        reset_command=cfg.health_reset_command,
+        ingest_probes=probes
+    )
+
+def parse_args() -> argparse.Namespace:
+    """
+    Parse command-line options.
+    """
+    parser = argparse.ArgumentParser(description="Push Sitrad telemetry to ThingsBoard.")
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="keep running and repeat the cycle every DAEMON_INTERVAL_SEC until SIGTERM"
+    )
+    parser.add_argument(
+        "--replay-hours",
+        type=float,
+        metavar="N",
+        help="re-send the rows inserted in the last N hours (nothing is deleted), then exit"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile each cycle (same as PROFILE=true)"
     )
+    return parser.parse_args()
+
+def install_signal_handlers(launcher: SendToLauncher) -> None:
+    """
+    Route SIGTERM/SIGINT to launcher.stop() for a clean daemon shutdown.
+    """
+    def _handle(signum, _frame):
+        logging.getLogger("send_to_thingsboard").info(
+            "Received %s — stopping after current batch.", signal.Signals(signum).name
+        )
+        launcher.stop()
+
+    signal.signal(signal.SIGTERM, _handle)
+    signal.signal(signal.SIGINT, _handle)
 
 def main():
     """
     Entrypoint: load .env, configure logger, purge old logs,
     then start the data-push loop to ThingsBoard Cloud.
     """
+    args = parse_args()
     load_dotenv(dotenv_path)
 
     try:
         cfg = Config.from_env()
-        log = setup_logging(pkg_dir, level=cfg.log_level, log_file=cfg.log_file)
+        if args.profile:
+            cfg = dataclasses.replace(cfg, profile_enabled=True)
+        log = setup_logging(
+            pkg_dir,
+            level=cfg.log_level,
+            log_file=cfg.log_file,
+            max_bytes=int(cfg.log_max_mb * 1024 * 1024),
+            backup_count=cfg.log_backup_count,
+            compress=cfg.log_compress
+        )
         purge_old_logs(logs_path, max_age_days=cfg.purge_log_days)
 
         launcher = build_launcher(cfg)
-        launcher.start()
+        if args.replay_hours:
+            start_ms = int((time.time() - args.replay_hours * 3600) * 1000)
+            try:
+                launcher.replay(start_ms)
+            finally:
+                launcher.close()
+        elif args.daemon:
+            install_signal_handlers(launcher)
+            monitor = build_health_monitor(cfg, launcher) if cfg.health_monitor else None
+            if monitor:
+                monitor.start()
+            try:
+                interval = cfg.db_watch_fallback_sec if cfg.db_watch else cfg.daemon_interval_sec
+                launcher.run_forever(interval)
+            finally:
+                # The monitor queries the database until stopped; close the
+                # pooled connections only after that.
+                if monitor:
+                    monitor.stop()
+                launcher.close()
+        else:
+            launcher.start()
 
     except Exception:
         logging.exception("An error occurred during execution:")
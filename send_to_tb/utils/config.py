@@ -1,11 +1,34 @@
 # utils/log/config.py
 
 import os
+import shlex
 from dataclasses import dataclass
 from pathlib import Path
 
 get = os.getenv
 
+
+def get_bool(name: str, default: str) -> bool:
+    """
+    Read a boolean environment variable (1/true/yes/on, case-insensitive).
+    """
+    return get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_mapping(name: str) -> dict[str, str]:
+    """
+    Read a "key:value,key:value" environment variable into a dict.
+    """
+    mapping = {}
+    for item in get(name, "").split(","):
+        if not item.strip():
+            continue
+        key, sep, value = item.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid entry '{item.strip()}' in {name} (expected key:value)")
+        mapping[key.strip()] = value.strip()
+    return mapping
+
 @dataclass(frozen=True)
 class Config:
     """
@@ -16,9 +39,14 @@ class Config:
     # ▶︎ Credentials
     device_token: str
 
+    # ▶︎ Gateway mode (many controllers in one database)
+    device_column: str | None
+    device_tokens: dict
+
     # ▶︎ Paths
     db_path: str
     log_file: str
+    watermark_file: str | None
 
     # ▶︎ Telemetry sending behavior
     max_batch_size: int
@@ -28,19 +56,114 @@ class Config:
     post_timeout_sec: float
     batch_window_sec: float
     min_batch_size_to_split: int
+    send_concurrency: int
+    isolate_rejected: bool
+    async_client: bool
+    http_max_concurrency: int
+    reject_cache_size: int
+
+    # ▶︎ Transport
+    transport: str
+    tb_base_url: str
+    mqtt_host: str
+    mqtt_port: int
+    mqtt_tls: bool
+    mqtt_client_id: str
+    mqtt_keepalive_sec: int
+    mqtt_max_inflight: int
+    gateway_device_name: str
+
+    # ▶︎ Request encoding
+    compact_json: bool
+    gzip_body: bool
+    gzip_level: int
+    gzip_min_bytes: int
+    shape_payloads: bool
+
+    # ▶︎ Outbox / dead-letter
+    outbox_enabled: bool
+    outbox_table: str
+    alarm_outbox_table: str
+    dead_letter_table: str
+    outbox_max_attempts: int
+    outbox_retry_base_sec: float
+    outbox_retry_max_sec: float
+
+    # ▶︎ Deadband filtering
+    deadband_enabled: bool
+    deadband_default: float
+    deadband_keys: dict
+    keyframe_interval_sec: float
+
+    # ▶︎ Backlog catch-up (rollups)
+    catchup_backlog_rows: int
+    catchup_horizon_hours: float
+    catchup_bucket_sec: float
+
+    # ▶︎ Adaptive batch sizing
+    adaptive_batch: bool
+    adaptive_min_batch_size: int
+    adaptive_max_batch_size: int
+    adaptive_increase_step: int
+    adaptive_decrease_factor: float
+    adaptive_latency_target_sec: float
 
     # ▶︎ SQLite / Schema
     sqlite_timeout_sec: float
     schema_version: int
     time_column_name: str
+    fetch_page_size: int
+    retention_days: float
+
+    # ▶︎ Compaction
+    compaction_mode: str
+    incremental_vacuum_pages: int
+    wal_checkpoint_interval_sec: float
+    wal_checkpoint_size_mb: float
+    full_vacuum_freelist_ratio: float
 
     # ▶︎ Table names
     telemetry_table: str
     alarm_table: str
+    forward_alarms: bool
+    alarm_time_column: str | None
+
+    # ▶︎ Metrics
+    metrics_enabled: bool
+    metrics_textfile: str | None
+    metrics_json_file: str | None
+    metrics_backlog_interval_sec: float
+
+    # ▶︎ Profiling
+    profile_enabled: bool
+    profile_dir: str
+    profile_interval_ms: float
+    profile_keep: int
 
     # ▶︎ Logging
     log_level: str
     purge_log_days: int
+    log_max_mb: float
+    log_backup_count: int
+    log_compress: bool
+
+    # ▶︎ Daemon mode
+    daemon_interval_sec: float
+    db_watch: bool
+    db_watch_poll_ms: float
+    db_watch_settle_ms: float
+    db_watch_max_latency_sec: float
+    db_watch_fallback_sec: float
+
+    # ▶︎ Health monitor (daemon mode)
+    health_monitor: bool
+    health_check_interval_sec: float
+    health_stale_after_sec: float
+    health_min_reset_interval_sec: float
+    ftdi_sysfs_dir: str | None
+    watchdog_reset_flag: str
+    watchdog_last_reset_file: str
+    health_reset_command: tuple
 
     @classmethod
     def from_env(cls) -> "Config":
@@ -50,11 +173,23 @@ class Config:
         """
         return cls(
             **cls._load_credentials(),
+            **cls._load_gateway(),
             **cls._load_paths(),
             **cls._load_telemetry(),
+            **cls._load_adaptive_batch(),
+            **cls._load_encoding(),
+            **cls._load_transport(),
+            **cls._load_outbox(),
+            **cls._load_deadband(),
+            **cls._load_catchup(),
             **cls._load_sqlite_schema(),
+            **cls._load_compaction(),
             **cls._load_tables(),
-            **cls._load_logging()
+            **cls._load_metrics(),
+            **cls._load_profiling(),
+            **cls._load_logging(),
+            **cls._load_daemon(),
+            **cls._load_health()
         )
 
     @staticmethod
@@ -67,17 +202,39 @@ class Config:
             raise ValueError("Missing required DEVICE_TOKEN in environment")
         return {"device_token": token.strip()}
 
+    @staticmethod
+    def _load_gateway() -> dict:
+        """
+        Load gateway-mode settings: the controller-address column and the
+        address → device-token mapping. An empty DEVICE_COLUMN disables it.
+        Over HTTP, DEVICE_COLUMN needs DEVICE_TOKENS: otherwise every
+        controller writes into the DEVICE_TOKEN device, and rows of the same
+        timestamp overwrite each other's values.
+        """
+        device_column = get("DEVICE_COLUMN", "").strip() or None
+        device_tokens = get_mapping("DEVICE_TOKENS")
+        if device_tokens and not device_column:
+            raise ValueError("DEVICE_TOKENS requires DEVICE_COLUMN")
+        if device_column and not device_tokens and get("TRANSPORT", "http").strip().lower() != "mqtt":
+            raise ValueError("DEVICE_COLUMN requires DEVICE_TOKENS (or TRANSPORT=mqtt)")
+        return {
+            "device_column": device_column,
+            "device_tokens": device_tokens,
+        }
+
     @staticmethod
     def _load_paths() -> dict:
         """
-        Load database and log file paths, validate DB_PATH.
+        Load database, log and watermark file paths, validate DB_PATH.
         """
         raw_db_path = get("DB_PATH")
         if not raw_db_path:
             raise ValueError("Missing required DB_PATH in environment")
         db_path = os.path.expanduser(raw_db_path)
         log_file = get("LOG_FILE", "sitrad_push.log")
-        return {"db_path": db_path, "log_file": log_file}
+        raw_watermark = get("WATERMARK_FILE", "").strip()
+        watermark_file = os.path.expanduser(raw_watermark) if raw_watermark else None
+        return {"db_path": db_path, "log_file": log_file, "watermark_file": watermark_file}
 
     @staticmethod
     def _load_telemetry() -> dict:
@@ -92,35 +249,218 @@ class Config:
             "post_timeout_sec": float(get("POST_TIMEOUT", "10.0")),
             "batch_window_sec": float(get("BATCH_WINDOW_SEC", "2.0")),
             "min_batch_size_to_split": int(get("MIN_BATCH_SIZE_TO_SPLIT", "1")),
+            "send_concurrency": max(int(get("SEND_CONCURRENCY", "1")), 1),
+            "isolate_rejected": get_bool("ISOLATE_REJECTED", "true"),
+            "async_client": get_bool("ASYNC_CLIENT", "false"),
+            "http_max_concurrency": max(int(get("HTTP_MAX_CONCURRENCY", "4")), 1),
+            "reject_cache_size": int(get("REJECT_CACHE_SIZE", "10000")),
+        }
+
+    @staticmethod
+    def _load_adaptive_batch() -> dict:
+        """
+        Load the AIMD batch-size controller settings (MAX_BATCH_SIZE is the start size).
+        """
+        return {
+            "adaptive_batch": get_bool("ADAPTIVE_BATCH", "false"),
+            "adaptive_min_batch_size": int(get("ADAPTIVE_MIN_BATCH_SIZE", "5")),
+            "adaptive_max_batch_size": int(get("ADAPTIVE_MAX_BATCH_SIZE", "200")),
+            "adaptive_increase_step": int(get("ADAPTIVE_INCREASE_STEP", "5")),
+            "adaptive_decrease_factor": float(get("ADAPTIVE_DECREASE_FACTOR", "0.5")),
+            "adaptive_latency_target_sec": float(get("ADAPTIVE_LATENCY_TARGET_SEC", "2.0")),
+        }
+
+    @staticmethod
+    def _load_encoding() -> dict:
+        """
+        Load request-body encoding options (compact JSON, gzip, ts grouping).
+        """
+        return {
+            "compact_json": get_bool("COMPACT_JSON", "false"),
+            "gzip_body": get_bool("GZIP_BODY", "false"),
+            "gzip_level": int(get("GZIP_LEVEL", "6")),
+            "gzip_min_bytes": int(get("GZIP_MIN_BYTES", "512")),
+            "shape_payloads": get_bool("SHAPE_PAYLOADS", "true"),
+        }
+
+    @staticmethod
+    def _load_transport() -> dict:
+        """
+        Load the wire transport (http | mqtt) and the MQTT session settings.
+        """
+        transport = get("TRANSPORT", "http").strip().lower()
+        if transport not in ("http", "mqtt"):
+            raise ValueError(f"Invalid TRANSPORT '{transport}' (http | mqtt)")
+        return {
+            "transport": transport,
+            "tb_base_url": get("TB_BASE_URL", "https://thingsboard.cloud"),
+            "mqtt_host": get("MQTT_HOST", "mqtt.thingsboard.cloud"),
+            "mqtt_port": int(get("MQTT_PORT", "8883")),
+            "mqtt_tls": get_bool("MQTT_TLS", "true"),
+            "mqtt_client_id": get("MQTT_CLIENT_ID", "send_to_tb"),
+            "mqtt_keepalive_sec": int(get("MQTT_KEEPALIVE_SEC", "60")),
+            "mqtt_max_inflight": max(int(get("MQTT_MAX_INFLIGHT", "20")), 1),
+            "gateway_device_name": get("GATEWAY_DEVICE_NAME", "TC-900 {device}"),
+        }
+
+    @staticmethod
+    def _load_outbox() -> dict:
+        """
+        Load outbox settings: table names, retry back-off and the attempt limit
+        after which a rejected row is quarantined.
+        """
+        return {
+            "outbox_enabled": get_bool("OUTBOX_ENABLED", "true"),
+            "outbox_table": get("OUTBOX_TABLE", "send_to_tb_outbox"),
+            "alarm_outbox_table": get("ALARM_OUTBOX_TABLE", "send_to_tb_alarm_outbox"),
+            "dead_letter_table": get("DEAD_LETTER_TABLE", "send_to_tb_dead_letter"),
+            "outbox_max_attempts": int(get("OUTBOX_MAX_ATTEMPTS", "5")),
+            "outbox_retry_base_sec": float(get("OUTBOX_RETRY_BASE_SEC", "60")),
+            "outbox_retry_max_sec": float(get("OUTBOX_RETRY_MAX_SEC", "3600")),
+        }
+
+    @staticmethod
+    def _load_deadband() -> dict:
+        """
+        Load change-only filtering settings: per-key deadbands and keyframe interval.
+        """
+        return {
+            "deadband_enabled": get_bool("DEADBAND_ENABLED", "false"),
+            "deadband_default": float(get("DEADBAND_DEFAULT", "0")),
+            "deadband_keys": {k: float(v) for k, v in get_mapping("DEADBAND_KEYS").items()},
+            "keyframe_interval_sec": float(get("KEYFRAME_INTERVAL_SEC", "300")),
+        }
+
+    @staticmethod
+    def _load_catchup() -> dict:
+        """
+        Load backlog catch-up settings: backlog size that triggers rollups,
+        age below which rows stay raw, and rollup bucket width.
+        """
+        return {
+            "catchup_backlog_rows": int(get("CATCHUP_BACKLOG_ROWS", "0")),
+            "catchup_horizon_hours": float(get("CATCHUP_HORIZON_HOURS", "6")),
+            "catchup_bucket_sec": float(get("CATCHUP_BUCKET_SEC", "900")),
         }
 
     @staticmethod
     def _load_sqlite_schema() -> dict:
         """
-        Load SQLite-specific configuration: timeout, schema version, and time column name.
+        Load SQLite-specific configuration: timeout, schema version, time column name,
+        the number of rows read per fetch page, and the unsent-row retention.
         """
         return {
             "sqlite_timeout_sec": float(get("SQLITE_TIMEOUT_SEC", "30.0")),
-            "schema_version": int(get("SCHEMA_VERSION", "1")),
+            "schema_version": int(get("SCHEMA_VERSION", "3")),
             "time_column_name": get("TIME_COLUMN_NAME", "inserted_ts_ms"),
+            "fetch_page_size": int(get("FETCH_PAGE_SIZE", "500")),
+            "retention_days": float(get("RETENTION_DAYS", "0")),
+        }
+
+    @staticmethod
+    def _load_compaction() -> dict:
+        """
+        Load the database compaction policy applied after telemetry deletes.
+        """
+        mode = get("COMPACTION_MODE", "incremental").strip().lower()
+        if mode not in ("incremental", "full", "off"):
+            raise ValueError(f"Invalid COMPACTION_MODE '{mode}' (incremental | full | off)")
+        return {
+            "compaction_mode": mode,
+            "incremental_vacuum_pages": int(get("INCREMENTAL_VACUUM_PAGES", "256")),
+            "wal_checkpoint_interval_sec": float(get("WAL_CHECKPOINT_INTERVAL_SEC", "300")),
+            "wal_checkpoint_size_mb": float(get("WAL_CHECKPOINT_SIZE_MB", "16")),
+            "full_vacuum_freelist_ratio": float(get("FULL_VACUUM_FREELIST_RATIO", "0.5")),
         }
 
     @staticmethod
     def _load_tables() -> dict:
         """
-        Load custom table name overrides if provided.
+        Load custom table name overrides if provided, and how the alarm
+        table is handled (forwarded to ThingsBoard, or cleared unsent).
         """
+        alarm_time_column = get("ALARM_TIME_COLUMN", "data").strip()
         return {
             "telemetry_table": get("TELEMETRY_TABLE", "tc900log"),
             "alarm_table": get("ALARM_TABLE", "rel_alarmes"),
+            "forward_alarms": get_bool("FORWARD_ALARMS", "true"),
+            "alarm_time_column": alarm_time_column or None,
+        }
+
+    @staticmethod
+    def _load_metrics() -> dict:
+        """
+        Load metrics settings: collection switch, the optional
+        node-exporter textfile and JSON status file paths, and how often
+        the backlog is counted.
+        """
+        textfile = get("METRICS_TEXTFILE", "").strip()
+        json_file = get("METRICS_JSON_FILE", "").strip()
+        return {
+            "metrics_enabled": get_bool("METRICS_ENABLED", "true"),
+            "metrics_textfile": os.path.expanduser(textfile) if textfile else None,
+            "metrics_json_file": os.path.expanduser(json_file) if json_file else None,
+            "metrics_backlog_interval_sec": float(get("METRICS_BACKLOG_INTERVAL_SEC", "60")),
+        }
+
+    @staticmethod
+    def _load_profiling() -> dict:
+        """
+        Load the cycle profiler settings: switch, output directory
+        (relative paths are under send_to_tb/), sampling interval and rotation.
+        """
+        return {
+            "profile_enabled": get_bool("PROFILE", "false"),
+            "profile_dir": os.path.expanduser(get("PROFILE_DIR", "logs/profiles")),
+            "profile_interval_ms": float(get("PROFILE_INTERVAL_MS", "10")),
+            "profile_keep": int(get("PROFILE_KEEP", "20")),
         }
 
     @staticmethod
     def _load_logging() -> dict:
         """
-        Load logging configuration: log level and retention policy.
+        Load logging configuration: log level, retention policy and
+        size-based rotation of the log file.
         """
         return {
             "log_level": get("LOG_LEVEL", "INFO").upper(),
             "purge_log_days": int(get("PURGE_LOG_DAYS", "1")),
+            "log_max_mb": float(get("LOG_MAX_MB", "5")),
+            "log_backup_count": int(get("LOG_BACKUP_COUNT", "5")),
+            "log_compress": get_bool("LOG_COMPRESS", "true"),
+        }
+
+    @staticmethod
+    def _load_daemon() -> dict:
+        """
+        Load daemon-mode configuration: interval between telemetry cycles,
+        or the database change watcher that replaces it (poll period,
+        burst coalescing window, latency bound and fallback interval).
+        """
+        return {
+            "daemon_interval_sec": float(get("DAEMON_INTERVAL_SEC", "30.0")),
+            "db_watch": get_bool("DB_WATCH", "true"),
+            "db_watch_poll_ms": float(get("DB_WATCH_POLL_MS", "250")),
+            "db_watch_settle_ms": float(get("DB_WATCH_SETTLE_MS", "500")),
+            "db_watch_max_latency_sec": float(get("DB_WATCH_MAX_LATENCY_SEC", "2.0")),
+            "db_watch_fallback_sec": float(get("DB_WATCH_FALLBACK_SEC", "300")),
+        }
+
+    @staticmethod
+    def _load_health() -> dict:
+        """
+        Load the in-process Sitrad health monitor settings: check period,
+        staleness threshold, reset cooldown, FTDI sysfs directory, the
+        watchdog flag files and the command restarting Sitrad.
+        """
+        ftdi_dir = get("FTDI_SYSFS_DIR", "/sys/bus/usb/drivers/ftdi_sio").strip()
+        return {
+            "health_monitor": get_bool("HEALTH_MONITOR", "true"),
+            "health_check_interval_sec": float(get("HEALTH_CHECK_INTERVAL_SEC", "5")),
+            "health_stale_after_sec": float(get("HEALTH_STALE_AFTER_SEC", "120")),
+            "health_min_reset_interval_sec": float(get("HEALTH_MIN_RESET_INTERVAL_SEC", "10")),
+            "ftdi_sysfs_dir": ftdi_dir or None,
+            "watchdog_reset_flag": get("WATCHDOG_RESET_FLAG", "/tmp/watchdog_reset"),
+            "watchdog_last_reset_file": get("WATCHDOG_LAST_RESET_FILE", "/tmp/watchdog_last_reset"),
+            "health_reset_command": tuple(shlex.split(get("HEALTH_RESET_COMMAND", "wineserver -k"))),
         }
@@ -0,0 +1,161 @@
+# utils/db/db_change_watcher.py
+
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class DbChangeWatcher:
+    """
+    Wakes the daemon when Sitrad commits new telemetry rows, instead of
+    sleeping a fixed interval.
+    A dedicated read-only connection is kept open and polls
+    PRAGMA data_version, which changes whenever another connection commits
+    (a single page read, no table access). Our own deletes change it too,
+    so a change only counts when a row newer than the newest insert time
+    already seen shows up, or a row stamped with that same time that was
+    not there before (stamps have a one-second resolution).
+    Bursts are coalesced: once new rows are seen, wait() returns after
+    settle_sec without further inserts, or max_latency_sec after the first
+    one, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float,
+        table: str,
+        time_column: str,
+        poll_interval_sec: float = 0.25,
+        settle_sec: float = 0.5,
+        max_latency_sec: float = 2.0
+    ):
+        """
+        :param db_path:           path to the SQLite database file
+        :param timeout:           SQLite connection timeout in seconds
+        :param table:             telemetry table Sitrad writes to
+        :param time_column:       insert-timestamp column (ms)
+        :param poll_interval_sec: time between two data_version checks
+        :param settle_sec:        quiet time ending a burst of inserts
+        :param max_latency_sec:   longest delay from the first new row to the wake-up
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.table = table
+        self.time_column = time_column
+        self.poll_interval_sec = max(poll_interval_sec, 0.01)
+        self.settle_sec = settle_sec
+        self.max_latency_sec = max(max_latency_sec, settle_sec)
+
+        self._newest_sql = f"""
+            SELECT {time_column}, rowid
+              FROM {table}
+             WHERE {time_column} = (SELECT MAX({time_column}) FROM {table})
+        """
+        self._conn: sqlite3.Connection | None = None
+        self._data_version: int | None = None
+        self._newest_ms = 0
+        self._newest_rowids: set[int] = set()
+        self._last_error: str | None = None
+        self.wakeups = 0
+
+    @property
+    def newest_ms(self) -> int:
+        """
+        Newest insert time (ms) seen by the last poll, 0 before the first one.
+        It outlives the rows themselves, which are deleted once sent.
+        """
+        return self._newest_ms
+
+    def wait(self, timeout_sec: float, stop_event: threading.Event) -> bool:
+        """
+        Block until new rows were committed (and the burst settled), until
+        timeout_sec elapses, or until stop_event is set.
+        Returns True on new rows, False on timeout or stop.
+        """
+        deadline = time.monotonic() + timeout_sec
+        first_change = last_change = None
+        while True:
+            now = time.monotonic()
+            if first_change is None:
+                if now >= deadline:
+                    return False
+                delay = min(self.poll_interval_sec, deadline - now)
+            else:
+                if (now - last_change >= self.settle_sec
+                        or now - first_change >= self.max_latency_sec):
+                    self.wakeups += 1
+                    logger.debug(
+                        "New rows committed — waking after %.2fs of coalescing",
+                        now - first_change
+                    )
+                    return True
+                delay = min(
+                    self.poll_interval_sec,
+                    last_change + self.settle_sec - now,
+                    first_change + self.max_latency_sec - now
+                )
+
+            if stop_event.wait(max(delay, 0)):
+                return False
+            if self._has_new_rows():
+                last_change = time.monotonic()
+                first_change = first_change or last_change
+
+    def close(self) -> None:
+        """Close the watcher's connection."""
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Error closing SQLite connection: %s", e)
+            self._conn = None
+            self._data_version = None
+
+    def _has_new_rows(self) -> bool:
+        """
+        True if data_version changed and the rows stamped with the newest
+        insert time are later than, or not all among, those seen last time.
+        On error the connection is dropped and reopened at the next poll.
+        """
+        try:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+
+            rows = conn.execute(self._newest_sql).fetchall()
+        except sqlite3.Error as e:
+            # Polled several times a second: only log a new kind of failure
+            if str(e) != self._last_error:
+                logger.warning("Change watcher SQLite error: %s", e)
+            self._last_error = str(e)
+            self.close()
+            return False
+
+        self._last_error = None
+        if not rows or not rows[0][0]:
+            return False
+        newest, rowids = rows[0][0], {rowid for _, rowid in rows}
+        if newest < self._newest_ms:
+            return False
+        is_new = newest > self._newest_ms or not rowids <= self._newest_rowids
+        self._newest_ms, self._newest_rowids = newest, rowids
+        return is_new
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Open the read-only connection on first use (never creating the file).
+        data_version is unknown until the first poll, so that poll always
+        compares the newest insert time.
+        """
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, timeout=self.timeout,
+                check_same_thread=False
+            )
+        return self._conn
@@ -1,32 +1,154 @@
 # utils/db/db_cleaner.py
 
 import logging
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from sqlite3 import Error
 from utils.db.db_connect import get_sqlite_connection
 
 logger = logging.getLogger(__name__)
 
-def delete_rows(db_path: str, table_name: str, rowids: List[int], timeout: float) -> None:
+# Ranges shown by summarize_rowids() before eliding the rest
+MAX_LOGGED_RANGES = 4
+
+
+def summarize_rowids(rowids: List[int], max_ranges: int = MAX_LOGGED_RANGES) -> str:
+    """
+    Compact, bounded text for a rowid list: contiguous runs collapsed into
+    ranges, e.g. "1-250, 300, 302-310 (260 row(s))". Beyond max_ranges runs
+    the rest is elided, so the log line stays short for any batch size.
+    """
+    ordered = sorted(rowids)
+    ranges: List[str] = []
+    start = prev = ordered[0]
+    runs = 0
+    for rowid in ordered[1:] + [None]:
+        if rowid is not None and rowid == prev + 1:
+            prev = rowid
+            continue
+        runs += 1
+        if runs <= max_ranges:
+            ranges.append(str(start) if start == prev else f"{start}-{prev}")
+        if rowid is not None:
+            start = prev = rowid
+    if runs > max_ranges:
+        ranges.append(f"… {runs - max_ranges} more range(s)")
+    return f"{', '.join(ranges)} ({len(ordered)} row(s))"
+
+def delete_rows(db_path: str, table_name: str, rowids: List[int], timeout: float) -> int:
     """
-    Deletes rows from the table where rowid is in the given list,
-    then compacts the database using VACUUM.
+    Deletes rows from the table where rowid is in the given list.
+    Returns the number of rowids requested for deletion.
+    Compaction is left to the caller: VACUUM renumbers the rowids of tables
+    without an INTEGER PRIMARY KEY, so it must not run between batches.
     """
     if not rowids:
-        return
+        return 0
 
-    logger.info("Deleting rowids %s from table '%s'", rowids, table_name)
+    logger.info("Deleting rowids %s from table '%s'", summarize_rowids(rowids), table_name)
     placeholders = ",".join("?" for _ in rowids)
     delete_sql = f"DELETE FROM {table_name} WHERE rowid IN ({placeholders})"
     _execute_delete(db_path, delete_sql, tuple(rowids), timeout=timeout)
-    vacuum_database(db_path, timeout)
+    return len(rowids)
 
 
-def delete_all_rows(db_path: str, table_name: str, timeout: float) -> None:
+def delete_rows_by_table(db_path: str, rowids_by_table: Dict[str, List[int]], timeout: float) -> int:
+    """
+    Deletes the given rowids from several tables in one transaction, so the
+    write lock is taken once (e.g. a telemetry batch and acknowledged alarms).
+    Returns the number of rowids requested for deletion.
+    """
+    statements = []
+    for table_name, rowids in rowids_by_table.items():
+        if not rowids:
+            continue
+        logger.info("Deleting rowids %s from table '%s'", summarize_rowids(rowids), table_name)
+        placeholders = ",".join("?" for _ in rowids)
+        statements.append((f"DELETE FROM {table_name} WHERE rowid IN ({placeholders})", tuple(rowids)))
+
+    if not statements:
+        return 0
+    _execute_deletes(db_path, statements, timeout=timeout)
+    return sum(len(params) for _, params in statements)
+
+
+def delete_rows_older_than(
+    db_path: str,
+    table_name: str,
+    time_column: str,
+    cutoff_ms: int,
+    timeout: float,
+    chunk_size: int = 5000
+) -> int:
+    """
+    Deletes rows whose time_column is below cutoff_ms, chunk_size rows per
+    transaction so the write lock is released between chunks.
+    Relies on the time-column index (schema v2) to find the rows.
+    Returns the number of rows deleted; compaction is left to the caller.
+    """
+    delete_sql = f"""
+        DELETE FROM {table_name}
+         WHERE rowid IN (
+                SELECT rowid FROM {table_name}
+                 WHERE {time_column} < ?
+                 LIMIT ?)
+    """
+    deleted = 0
+    conn = get_sqlite_connection(db_path, timeout=timeout)
+    while True:
+        try:
+            with conn:
+                count = conn.execute(delete_sql, (cutoff_ms, chunk_size)).rowcount
+        except Error as e:
+            logger.exception("Error purging old rows from '%s': %s", table_name, e)
+            raise
+        deleted += count
+        if count < chunk_size:
+            break
+
+    if deleted:
+        logger.info("Purged %d row(s) older than %d from table '%s'", deleted, cutoff_ms, table_name)
+    return deleted
+
+
+def delete_rows_in_time_ranges(
+    db_path: str,
+    table_name: str,
+    time_column: str,
+    ranges: List[Tuple],
+    timeout: float,
+    device_column: str | None = None,
+    outbox_table: str | None = None
+) -> int:
+    """
+    Deletes the rows whose time_column falls in any [start_ms, end_ms) range,
+    in one transaction (e.g. the buckets covered by acknowledged rollups).
+    With device_column, each range is (start_ms, end_ms, device) and only
+    that device's rows go (device None matching NULL); rows referenced by
+    outbox_table are kept.
+    Relies on the time-column index (schema v2) to find the rows.
+    Returns the number of rows deleted; compaction is left to the caller.
+    """
+    if not ranges:
+        return 0
+
+    delete_sql = f"DELETE FROM {table_name} WHERE {time_column} >= ? AND {time_column} < ?"
+    if device_column:
+        delete_sql += f" AND {device_column} IS ?"
+    if outbox_table:
+        delete_sql += f" AND rowid NOT IN (SELECT row_ref FROM {outbox_table})"
+
+    deleted = _execute_deletes(db_path, [(delete_sql, tuple(r)) for r in ranges], timeout=timeout)
+    logger.info(
+        "Deleted %d row(s) in %d time range(s) from table '%s'", deleted, len(ranges), table_name
+    )
+    return deleted
+
+
+def delete_all_rows(db_path: str, table_name: str, timeout: float) -> int:
     """
     Deletes all rows from the specified table.
     Does nothing if the table is already empty.
-    Then compacts the database using VACUUM.
+    Returns the number of rows deleted; compaction is left to the caller.
     """
     try:
         with get_sqlite_connection(db_path, timeout=timeout) as conn:
@@ -35,7 +157,7 @@ def delete_all_rows(db_path: str, table_name: str, timeout: float) -> None:
             count = cursor.fetchone()[0]
 
             if count == 0:
-                return
+                return 0
 
             logger.info("Deleting all %d row(s) from table '%s'", count, table_name)
     except Error as e:
@@ -44,28 +166,40 @@ def delete_all_rows(db_path: str, table_name: str, timeout: float) -> None:
 
     delete_sql = f"DELETE FROM {table_name};"
     _execute_delete(db_path, delete_sql, timeout=timeout)
-    vacuum_database(db_path, timeout)
+    return count
 
 
 def _execute_delete(db_path: str, delete_sql: str, params: Tuple = (), timeout: float = 30.0) -> None:
     """
-    Executes the DELETE statement inside a transaction.
+    Executes the DELETE statement inside a transaction on the pooled connection.
+    """
+    _execute_deletes(db_path, [(delete_sql, params)], timeout=timeout)
+
+
+def _execute_deletes(db_path: str, statements: List[Tuple[str, Tuple]], timeout: float = 30.0) -> int:
     """
+    Executes (sql, params) DELETE statements inside one transaction on the pooled connection.
+    Returns the number of rows they deleted.
+    """
+    conn = get_sqlite_connection(db_path, timeout=timeout)
+    deleted = 0
     try:
-        with get_sqlite_connection(db_path, timeout=timeout) as conn:
+        with conn:
             conn.execute("BEGIN;")
-            logger.debug("Executing SQL: %s | Params: %s", delete_sql, params)
-            conn.execute(delete_sql, params)
+            for delete_sql, params in statements:
+                logger.debug("Executing SQL: %s | %d param(s)", delete_sql, len(params))
+                deleted += conn.execute(delete_sql, params).rowcount
             conn.execute("COMMIT;")
-            logger.debug("Transaction committed for SQL: %s", delete_sql)
+            logger.debug("Transaction committed for %d statement(s)", len(statements))
     except Error as e:
         logger.exception("Error executing delete; rolled back transaction: %s", e)
-        try:
-            with get_sqlite_connection(db_path, timeout=timeout) as conn_rollback:
-                conn_rollback.execute("ROLLBACK;")
-        except Exception:
-            pass
+        if conn.in_transaction:
+            try:
+                conn.rollback()
+            except Error:
+                pass
         raise
+    return deleted
 
 
 def vacuum_database(db_path: str, timeout: float = 30.0) -> None:
@@ -0,0 +1,143 @@
+# utils/db/db_compactor.py
+
+import os
+import time
+import logging
+from contextlib import nullcontext
+from sqlite3 import Error
+from utils.db.db_connect import get_sqlite_connection
+from utils.db.db_cleaner import vacuum_database
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_MODES = ("incremental", "full", "off")
+
+
+class DbCompactor:
+    """
+    Decides how and when to give space back after telemetry deletes:
+      - "incremental": PRAGMA incremental_vacuum(N) after each delete,
+        wal_checkpoint(TRUNCATE) on an interval or WAL-size threshold,
+        and a full VACUUM only when the freelist ratio passes a threshold.
+      - "full": legacy behavior, one VACUUM at the end of each cycle.
+      - "off": never compact.
+    A full VACUUM renumbers rowids of tables without an INTEGER PRIMARY KEY,
+    so end_cycle() reports when it ran and callers must drop rowid state
+    (or carry it over through a vacuum_guard).
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float,
+        mode: str,
+        incremental_pages: int,
+        checkpoint_interval_sec: float,
+        checkpoint_wal_bytes: int,
+        full_vacuum_freelist_ratio: float
+    ):
+        """
+        :param db_path:                     path to the SQLite database file
+        :param timeout:                     SQLite connection timeout in seconds
+        :param mode:                        one of COMPACTION_MODES
+        :param incremental_pages:           max pages released per incremental_vacuum call
+        :param checkpoint_interval_sec:     force a TRUNCATE checkpoint at least this often
+        :param checkpoint_wal_bytes:        force a TRUNCATE checkpoint once the WAL is this big
+        :param full_vacuum_freelist_ratio:  freelist/page_count ratio that triggers a full VACUUM
+        """
+        if mode not in COMPACTION_MODES:
+            raise ValueError(f"Unknown compaction mode '{mode}' (expected one of {COMPACTION_MODES})")
+
+        self.db_path = db_path
+        self.timeout = timeout
+        self.mode = mode
+        self.incremental_pages = incremental_pages
+        self.checkpoint_interval_sec = checkpoint_interval_sec
+        self.checkpoint_wal_bytes = checkpoint_wal_bytes
+        self.full_vacuum_freelist_ratio = full_vacuum_freelist_ratio
+
+        self._last_checkpoint = time.monotonic()
+
+    def after_delete(self) -> None:
+        """
+        Release at most incremental_pages free pages (incremental mode only).
+        """
+        if self.mode != "incremental" or self.incremental_pages <= 0:
+            return
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                conn.execute(f"PRAGMA incremental_vacuum({self.incremental_pages});").fetchall()
+        except Error as e:
+            logger.warning("incremental_vacuum failed on '%s': %s", self.db_path, e)
+
+    def end_cycle(self, deleted_rows: int, vacuum_guard=None) -> bool:
+        """
+        Apply the end-of-cycle compaction decision. vacuum_guard, if given,
+        is a context-manager factory entered around a full VACUUM
+        (e.g. Outbox.across_vacuum).
+        Returns True if a full VACUUM ran (rowids may have been renumbered).
+        """
+        if self.mode == "off":
+            return False
+        if self.mode == "full":
+            if not deleted_rows:
+                return False
+            self._vacuum(vacuum_guard)
+            return True
+
+        if self._freelist_ratio() >= self.full_vacuum_freelist_ratio:
+            logger.info("Freelist ratio above %.2f — running full VACUUM", self.full_vacuum_freelist_ratio)
+            self._vacuum(vacuum_guard)
+            self._checkpoint()
+            return True
+
+        if self._checkpoint_due():
+            self._checkpoint()
+        return False
+
+    def _vacuum(self, vacuum_guard) -> None:
+        """Run a full VACUUM inside vacuum_guard() when one is given."""
+        with vacuum_guard() if vacuum_guard else nullcontext():
+            vacuum_database(self.db_path, self.timeout)
+
+    def _freelist_ratio(self) -> float:
+        """
+        Return freelist_count / page_count (0.0 on an empty database or on error).
+        """
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                freelist = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+                pages = conn.execute("PRAGMA page_count;").fetchone()[0]
+        except Error as e:
+            logger.warning("Could not read page counts for '%s': %s", self.db_path, e)
+            return 0.0
+        ratio = freelist / pages if pages else 0.0
+        logger.debug("Freelist %d/%d pages (%.2f) in '%s'", freelist, pages, ratio, self.db_path)
+        return ratio
+
+    def _checkpoint_due(self) -> bool:
+        """
+        True when the checkpoint interval elapsed or the WAL file grew past its threshold.
+        """
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval_sec:
+            return True
+        try:
+            return os.path.getsize(f"{self.db_path}-wal") >= self.checkpoint_wal_bytes
+        except OSError:
+            return False
+
+    def _checkpoint(self) -> None:
+        """
+        Run PRAGMA wal_checkpoint(TRUNCATE) and reset the checkpoint timer.
+        A busy checkpoint (Sitrad holding a read lock) is retried next time.
+        """
+        self._last_checkpoint = time.monotonic()
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                busy, wal_pages, moved = conn.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()
+            logger.debug(
+                "wal_checkpoint(TRUNCATE) on '%s': busy=%d, wal=%d, checkpointed=%d",
+                self.db_path, busy, wal_pages, moved
+            )
+        except Error as e:
+            logger.warning("wal_checkpoint failed on '%s': %s", self.db_path, e)
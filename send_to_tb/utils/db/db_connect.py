@@ -1,14 +1,115 @@
 # utils/db/db_connect.py
 
 import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteConnectionManager:
+    """
+    Keeps one configured connection per (thread, database path) and hands
+    it out again on every request, so PRAGMAs run once and the driver's
+    prepared-statement cache survives across fetch, delete and schema work.
+    Connections stay open until close_all() is called.
+    """
+
+    def __init__(self, cached_statements: int = 128):
+        """
+        :param cached_statements: size of each connection's prepared-statement cache
+        """
+        self.cached_statements = cached_statements
+        self._connections: dict[tuple[int, str], sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def get(self, db_path: str, timeout: float) -> sqlite3.Connection:
+        """
+        Return the calling thread's connection to db_path, opening it on first use.
+        """
+        key = (threading.get_ident(), db_path)
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is not None:
+                self.reused += 1
+                return conn
+
+        conn = self._open(db_path, timeout)
+        with self._lock:
+            self._connections[key] = conn
+            self.opened += 1
+        logger.debug("Opened SQLite connection #%d to '%s'", self.opened, db_path)
+        return conn
+
+    def close_all(self) -> None:
+        """
+        Close every pooled connection (from any thread).
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+
+        for conn in connections:
+            try:
+                conn.close()
+                self.closed += 1
+            except sqlite3.Error as e:
+                logger.warning("Error closing SQLite connection: %s", e)
+
+    def stats(self) -> dict:
+        """
+        Return connection counters: opened, reused, closed and currently open.
+        """
+        with self._lock:
+            return {
+                "opened": self.opened,
+                "reused": self.reused,
+                "closed": self.closed,
+                "open": len(self._connections),
+            }
+
+    def _open(self, db_path: str, timeout: float) -> sqlite3.Connection:
+        """
+        Open a SQLite connection with WAL mode, NORMAL sync, and Row factory enabled.
+        check_same_thread is off only so close_all() can run from the main thread;
+        each connection is otherwise used by the thread that opened it.
+        """
+        conn = sqlite3.connect(
+            db_path,
+            timeout=timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+
+_manager = SqliteConnectionManager()
+
 
 def get_sqlite_connection(db_path: str, timeout: float) -> sqlite3.Connection:
     """
-    Opens a SQLite connection with WAL mode, NORMAL sync, and Row factory enabled.
-    Returns the configured sqlite3.Connection object.
+    Returns the calling thread's pooled connection to db_path
+    (WAL mode, NORMAL sync, Row factory), opening it on first use.
+    Use it as `with conn:` for commit/rollback; it is not closed on exit.
+    """
+    return _manager.get(db_path, timeout)
+
+
+def close_all_connections() -> None:
+    """
+    Close every pooled SQLite connection.
+    """
+    _manager.close_all()
+
+
+def connection_stats() -> dict:
+    """
+    Return the pool's connection counters.
     """
-    conn = sqlite3.connect(db_path, timeout=timeout)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA synchronous=NORMAL;")
-    return conn
+    return _manager.stats()
@@ -0,0 +1,284 @@
+# utils/db/db_outbox.py
+
+import json
+import time
+import logging
+from contextlib import contextmanager
+from sqlite3 import Error
+from utils.db.db_connect import get_sqlite_connection
+
+logger = logging.getLogger(__name__)
+
+
+class Outbox:
+    """
+    Tracks source rows that the server rejected, inside the same SQLite file:
+      - {outbox_table}: one entry per failing row (attempt count, next retry time),
+      - {dead_letter_table}: rows quarantined after max_attempts, with their payload.
+    Rows stay in the telemetry table while they are in the outbox; quarantining
+    moves them to the dead-letter table and deletes them in one transaction.
+    Entries follow their rows across a VACUUM through across_vacuum(), so
+    attempt counts keep adding up towards quarantine.
+    The source is the telemetry table by default; a second Outbox with its
+    own outbox_table tracks the alarm table, whose payloads carry their row
+    under id_key="alarm_rowid".
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float,
+        telemetry_table: str,
+        outbox_table: str,
+        dead_letter_table: str,
+        max_attempts: int,
+        retry_base_sec: float,
+        retry_max_sec: float,
+        id_key: str = "rowid"
+    ):
+        """
+        :param db_path:            path to the SQLite database file
+        :param timeout:            SQLite connection timeout in seconds
+        :param telemetry_table:    table the tracked rowids belong to
+        :param outbox_table:       name of the attempt-tracking table
+        :param dead_letter_table:  name of the quarantine table
+        :param max_attempts:       failed attempts before a row is quarantined
+        :param retry_base_sec:     delay before the first retry (doubles per attempt)
+        :param retry_max_sec:      upper bound for the retry delay
+        :param id_key:             payload field holding the tracked rowid
+        """
+        self.db_path = db_path
+        self.timeout = timeout
+        self.telemetry_table = telemetry_table
+        self.outbox_table = outbox_table
+        self.dead_letter_table = dead_letter_table
+        self.max_attempts = max_attempts
+        self.retry_base_sec = retry_base_sec
+        self.retry_max_sec = retry_max_sec
+        self.id_key = id_key
+
+        self._ensure_tables()
+
+    def record_failures(self, payloads: list[dict], error: str) -> int:
+        """
+        Count one more failed attempt for each payload's row and schedule its retry.
+        Rows reaching max_attempts are quarantined. Returns how many were quarantined.
+        """
+        if not payloads:
+            return 0
+
+        now_ms = int(time.time() * 1000)
+        quarantined = 0
+        conn = get_sqlite_connection(self.db_path, timeout=self.timeout)
+        try:
+            with conn:
+                for payload in payloads:
+                    rowid = payload[self.id_key]
+                    attempts = self._attempts(conn, rowid) + 1
+                    if attempts >= self.max_attempts:
+                        self._quarantine(conn, payload, attempts, error, now_ms)
+                        quarantined += 1
+                    else:
+                        self._schedule_retry(conn, rowid, attempts, error, now_ms)
+        except Error as e:
+            logger.exception("Could not record failed rows in '%s': %s", self.outbox_table, e)
+            raise
+
+        logger.warning(
+            "Outbox: %d failed row(s) rescheduled, %d quarantined in '%s'",
+            len(payloads) - quarantined, quarantined, self.dead_letter_table
+        )
+        return quarantined
+
+    def clear(self, rowids: list[int]) -> None:
+        """
+        Forget outbox entries for rows that were delivered and deleted.
+        """
+        if not rowids:
+            return
+        placeholders = ",".join("?" for _ in rowids)
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                conn.execute(
+                    f"DELETE FROM {self.outbox_table} WHERE row_ref IN ({placeholders})",
+                    tuple(rowids)
+                )
+        except Error as e:
+            logger.warning("Could not clear outbox entries: %s", e)
+
+    @contextmanager
+    def across_vacuum(self):
+        """
+        Wrap a VACUUM, which may renumber the telemetry rowids. Before it,
+        each entry's row is located by its position in rowid order (VACUUM
+        copies rows in that order; rows inserted meanwhile go after them).
+        After it, the entry moves to the row at the same position if that
+        row has the same content; unmatched entries are dropped.
+        """
+        try:
+            snapshot = self._locate_entries()
+        except Error as e:
+            logger.warning("Could not locate outbox rows before VACUUM: %s", e)
+            snapshot = None
+
+        yield
+
+        if snapshot is None:
+            self.reset()
+            return
+        if not snapshot:
+            return
+        try:
+            kept = self._relocate_entries(snapshot)
+        except Error as e:
+            logger.warning("Could not relocate outbox rows after VACUUM: %s", e)
+            self.reset()
+            return
+        logger.info(
+            "Outbox: %d/%d entry(ies) kept across VACUUM", kept, len(snapshot)
+        )
+
+    def reset(self) -> None:
+        """
+        Forget every outbox entry (used after a VACUUM renumbered the rowids).
+        Dead-letter rows keep their payload and are not affected.
+        """
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                conn.execute(f"DELETE FROM {self.outbox_table}")
+        except Error as e:
+            logger.warning("Could not reset outbox: %s", e)
+
+    def prune(self) -> int:
+        """
+        Drop outbox entries whose telemetry row no longer exists. Returns the count.
+        """
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                cursor = conn.execute(
+                    f"DELETE FROM {self.outbox_table} "
+                    f"WHERE row_ref NOT IN (SELECT rowid FROM {self.telemetry_table})"
+                )
+                return cursor.rowcount
+        except Error as e:
+            logger.warning("Could not prune outbox: %s", e)
+            return 0
+
+    def _ensure_tables(self) -> None:
+        """
+        Create the outbox and dead-letter tables if they are missing.
+        """
+        try:
+            with get_sqlite_connection(self.db_path, timeout=self.timeout) as conn:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.outbox_table} (
+                        row_ref        INTEGER PRIMARY KEY,
+                        attempts       INTEGER NOT NULL,
+                        next_retry_ms  INTEGER NOT NULL,
+                        first_fail_ms  INTEGER NOT NULL,
+                        last_error     TEXT
+                    )
+                """)
+                conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS idx_{self.outbox_table}_next_retry
+                        ON {self.outbox_table} (next_retry_ms)
+                """)
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.dead_letter_table} (
+                        id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                        source_rowid    INTEGER NOT NULL,
+                        ts              INTEGER,
+                        payload         TEXT NOT NULL,
+                        attempts        INTEGER NOT NULL,
+                        last_error      TEXT,
+                        quarantined_ms  INTEGER NOT NULL
+                    )
+                """)
+        except Error as e:
+            logger.exception("Could not create outbox tables: %s", e)
+            raise
+
+    def _locate_entries(self) -> list[tuple]:
+        """
+        Return (position, row content, outbox entry) for each entry whose
+        telemetry row still exists, position being 1-based in rowid order.
+        """
+        conn = get_sqlite_connection(self.db_path, timeout=self.timeout)
+        entries = conn.execute(
+            f"SELECT row_ref, attempts, next_retry_ms, first_fail_ms, last_error "
+            f"FROM {self.outbox_table} ORDER BY row_ref"
+        ).fetchall()
+        located = []
+        for entry in entries:
+            row = conn.execute(
+                f"SELECT * FROM {self.telemetry_table} WHERE rowid = ?", (entry[0],)
+            ).fetchone()
+            if row is None:
+                continue
+            position = conn.execute(
+                f"SELECT COUNT(*) FROM {self.telemetry_table} WHERE rowid <= ?", (entry[0],)
+            ).fetchone()[0]
+            located.append((position, tuple(row), tuple(entry[1:])))
+        return located
+
+    def _relocate_entries(self, snapshot: list[tuple]) -> int:
+        """
+        Rewrite the outbox from a _locate_entries() snapshot taken before a
+        VACUUM. Returns the number of entries kept.
+        """
+        kept = 0
+        conn = get_sqlite_connection(self.db_path, timeout=self.timeout)
+        with conn:
+            conn.execute(f"DELETE FROM {self.outbox_table}")
+            for position, content, entry in snapshot:
+                row = conn.execute(
+                    f"SELECT rowid, * FROM {self.telemetry_table} "
+                    f"ORDER BY rowid LIMIT 1 OFFSET ?", (position - 1,)
+                ).fetchone()
+                if row is None or tuple(row)[1:] != content:
+                    continue
+                conn.execute(
+                    f"INSERT INTO {self.outbox_table} "
+                    f"(row_ref, attempts, next_retry_ms, first_fail_ms, last_error) "
+                    f"VALUES (?, ?, ?, ?, ?)",
+                    (row[0], *entry)
+                )
+                kept += 1
+        return kept
+
+    def _attempts(self, conn, rowid: int) -> int:
+        """Return the recorded attempt count for rowid (0 if untracked)."""
+        row = conn.execute(
+            f"SELECT attempts FROM {self.outbox_table} WHERE row_ref = ?", (rowid,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _schedule_retry(self, conn, rowid: int, attempts: int, error: str, now_ms: int) -> None:
+        """Upsert the outbox entry with an exponential back-off retry time."""
+        delay_sec = min(self.retry_base_sec * 2 ** (attempts - 1), self.retry_max_sec)
+        conn.execute(
+            f"""
+            INSERT INTO {self.outbox_table} (row_ref, attempts, next_retry_ms, first_fail_ms, last_error)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(row_ref) DO UPDATE SET
+                attempts = excluded.attempts,
+                next_retry_ms = excluded.next_retry_ms,
+                last_error = excluded.last_error
+            """,
+            (rowid, attempts, now_ms + int(delay_sec * 1000), now_ms, error)
+        )
+
+    def _quarantine(self, conn, payload: dict, attempts: int, error: str, now_ms: int) -> None:
+        """Move a row to the dead-letter table and delete it from its table and the outbox."""
+        rowid = payload[self.id_key]
+        conn.execute(
+            f"""
+            INSERT INTO {self.dead_letter_table}
+                (source_rowid, ts, payload, attempts, last_error, quarantined_ms)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (rowid, payload.get("ts"), json.dumps(payload), attempts, error, now_ms)
+        )
+        conn.execute(f"DELETE FROM {self.telemetry_table} WHERE rowid = ?", (rowid,))
+        conn.execute(f"DELETE FROM {self.outbox_table} WHERE row_ref = ?", (rowid,))
+        logger.error("Quarantined RowId=%s after %d attempt(s): %s", rowid, attempts, error)
@@ -1,15 +1,41 @@
 # utils/db/db_schema_manager.py
 
+import re
+import time
 import logging
 from sqlite3 import Error
 from utils.db.db_connect import get_sqlite_connection
 
 logger = logging.getLogger(__name__)
 
-def ensure_schema(db_path: str, table: str, time_column: str, target_version: int, timeout: float) -> None:
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Insert time in ms, as written by the v1 trigger and the backfill
+STAMP_EXPR = "CAST(strftime('%s','now') AS INTEGER) * 1000"
+
+# Single-row INSERTs timed (and rolled back) when reporting the stamping cost
+INSERT_PROBE_ROWS = 200
+
+
+def ensure_schema(
+    db_path: str,
+    table: str,
+    time_column: str,
+    target_version: int,
+    timeout: float,
+    incremental_auto_vacuum: bool = False
+) -> bool:
     """
-    Ensure that the given table has a time column & trigger, and that
-    PRAGMA user_version equals target_version.
+    Ensure that the given table has a time column stamped on insert, and that
+    PRAGMA user_version equals target_version. Migrations:
+      v1: time column, insert trigger, backfill of existing rows,
+      v2: index on the time column (time-range reads and purges),
+      v3: table rebuilt with a DEFAULT expression on the time column,
+          replacing the trigger's second UPDATE per insert (rowids kept).
+    The whole migration runs in one IMMEDIATE transaction.
+    With incremental_auto_vacuum, also switch the database to
+    PRAGMA auto_vacuum=INCREMENTAL (a one-time full VACUUM).
+    Returns True if that VACUUM ran, since it may renumber rowids.
     """
     try:
         with get_sqlite_connection(db_path, timeout=timeout) as conn:
@@ -20,14 +46,24 @@ def ensure_schema(db_path: str, table: str, time_column: str, target_version: in
 
             if current_version < target_version:
                 logger.info("Migrating table '%s' from v%d → v%d", table, current_version, target_version)
-                _add_time_column(cur, table, time_column)
-                _create_time_trigger(cur, table, time_column)
-                _backfill_time_column(cur, table, time_column)
+                cur.execute("BEGIN IMMEDIATE;")
+                if current_version < 1:
+                    _add_time_column(cur, table, time_column)
+                    _create_time_trigger(cur, table, time_column)
+                    _backfill_time_column(cur, table, time_column)
+                if current_version < 2 <= target_version:
+                    _create_time_index(cur, table, time_column)
+                if current_version < 3 <= target_version:
+                    _stamp_with_column_default(cur, table, time_column)
                 _set_user_version(cur, target_version)
                 conn.commit()
             else:
                 logger.debug("No migration needed for '%s' (already at v%d)", table, current_version)
 
+            if incremental_auto_vacuum:
+                return _ensure_incremental_auto_vacuum(conn)
+            return False
+
     except Error as e:
         logger.exception("Schema migration failed for '%s': %s", table, e)
         raise
@@ -45,6 +81,23 @@ def _set_user_version(cursor, version: int) -> None:
     logger.debug("Set PRAGMA user_version to %d", version)
 
 
+def _ensure_incremental_auto_vacuum(conn) -> bool:
+    """
+    Switch auto_vacuum to INCREMENTAL if needed. Changing it on an existing
+    database only takes effect after a VACUUM, so this rewrites the file once.
+    Returns True if the VACUUM ran.
+    """
+    mode = conn.execute("PRAGMA auto_vacuum;").fetchone()[0]
+    if mode == AUTO_VACUUM_INCREMENTAL:
+        logger.debug("auto_vacuum already INCREMENTAL")
+        return False
+
+    logger.info("Switching auto_vacuum from %d to INCREMENTAL (one-time VACUUM)", mode)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+    conn.execute("VACUUM;")
+    return True
+
+
 def _add_time_column(cursor, table: str, column: str) -> None:
     """
     Ensure the time-column exists (INTEGER, default 0) on the given table.
@@ -65,13 +118,13 @@ def _create_time_trigger(cursor, table: str, column: str) -> None:
     Create an AFTER INSERT trigger that stamps new rows'
     `{column}` with the current time in milliseconds.
     """
-    trigger_name = f"set_{column}_on_{table}"
+    trigger_name = _time_trigger_name(table, column)
     sql = f"""
       CREATE TRIGGER IF NOT EXISTS {trigger_name}
       AFTER INSERT ON {table}
       BEGIN
         UPDATE {table}
-           SET {column} = CAST(strftime('%s','now') AS INTEGER) * 1000
+           SET {column} = {STAMP_EXPR}
          WHERE rowid = NEW.rowid;
       END;
     """
@@ -79,14 +132,129 @@ def _create_time_trigger(cursor, table: str, column: str) -> None:
     logger.info("Ensured trigger '%s' exists on '%s'", trigger_name, table)
 
 
+def _time_trigger_name(table: str, column: str) -> str:
+    """Name of the v1 stamping trigger."""
+    return f"set_{column}_on_{table}"
+
+
+def time_index_name(table: str, column: str) -> str:
+    """Name of the v2 index on the time column."""
+    return f"idx_{table}_{column}"
+
+
+def _create_time_index(cursor, table: str, column: str) -> None:
+    """
+    Index the time-column. Sitrad appends in time order, so new entries land
+    on the right edge of the B-tree and the insert cost stays small.
+    """
+    index_name = time_index_name(table, column)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({column});")
+    logger.info("Ensured index '%s' exists on '%s'(%s)", index_name, table, column)
+
+
 def _backfill_time_column(cursor, table: str, column: str) -> None:
     """
     Backfill the time-column for existing rows where it is still zero.
     """
     sql = f"""
         UPDATE {table}
-           SET {column} = CAST(strftime('%s','now') AS INTEGER) * 1000
+           SET {column} = {STAMP_EXPR}
          WHERE {column} = 0;
     """
     cursor.execute(sql)
     logger.info("Backfilled %d rows in '%s' where '%s'=0", cursor.rowcount, table, column)
+
+
+def _stamp_with_column_default(cursor, table: str, column: str) -> None:
+    """
+    Replace the stamping trigger by a DEFAULT expression on the time-column.
+    SQLite cannot change a column default in place (and ADD COLUMN refuses
+    non-constant defaults), so the table is rebuilt: same DDL with the new
+    default, rows copied with their rowids, then its indexes and other
+    triggers recreated. Rowids are preserved, so the watermark stays valid.
+    Logs the per-insert cost measured before and after.
+    """
+    before = _measure_insert_cost(cursor, table)
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (table,))
+    create_sql = cursor.fetchone()[0]
+    new_table = f"{table}__v3"
+    new_sql, replaced = re.subn(
+        rf"\b({re.escape(column)}\s+INTEGER)\s+DEFAULT\s+0\b",
+        rf"\1 DEFAULT ({STAMP_EXPR})",
+        create_sql,
+        count=1,
+        flags=re.IGNORECASE
+    )
+    new_sql, renamed = re.subn(
+        rf"^(\s*CREATE\s+TABLE\s+)[\"'`\[]?{re.escape(table)}[\"'`\]]?",
+        rf"\g<1>{new_table}",
+        new_sql,
+        count=1,
+        flags=re.IGNORECASE
+    )
+    if not (replaced and renamed):
+        logger.warning(
+            "Unexpected definition of '%s'(%s); keeping the insert trigger: %s",
+            table, column, create_sql
+        )
+        return
+
+    cursor.execute(f"PRAGMA table_info({table});")
+    info = cursor.fetchall()
+    columns = ", ".join(row[1] for row in info)
+    # An INTEGER PRIMARY KEY already is the rowid; otherwise copy it explicitly
+    has_rowid_alias = any(row[5] == 1 and row[2].upper() == "INTEGER" for row in info)
+    copy_columns = columns if has_rowid_alias else f"rowid, {columns}"
+
+    trigger_name = _time_trigger_name(table, column)
+    cursor.execute(
+        "SELECT sql FROM sqlite_master "
+        " WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL AND name != ?;",
+        (table, trigger_name)
+    )
+    dependents = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(new_sql)
+    cursor.execute(f"INSERT INTO {new_table} ({copy_columns}) SELECT {copy_columns} FROM {table};")
+    copied = cursor.rowcount
+    cursor.execute(f"DROP TABLE {table};")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table};")
+    for sql in dependents:
+        cursor.execute(sql)
+    logger.info(
+        "Rebuilt '%s' with DEFAULT stamping on '%s' (%d row(s) copied, trigger '%s' dropped)",
+        table, column, copied, trigger_name
+    )
+
+    after = _measure_insert_cost(cursor, table)
+    if before and after:
+        logger.info(
+            "Insert cost on '%s': %.1f µs and %.0f row write(s) per insert with the trigger, "
+            "%.1f µs and %.0f with the column default",
+            table, before[0], before[1], after[0], after[1]
+        )
+
+
+def _measure_insert_cost(cursor, table: str, rows: int = INSERT_PROBE_ROWS) -> tuple[float, float] | None:
+    """
+    Time single-row INSERTs of default values inside a savepoint that is
+    rolled back. Returns (µs per insert, row writes per insert, counting
+    trigger writes), or None if the table rejects default-only rows.
+    """
+    conn = cursor.connection
+    cursor.execute("SAVEPOINT measure_insert;")
+    try:
+        changes = conn.total_changes
+        started = time.perf_counter()
+        for _ in range(rows):
+            cursor.execute(f"INSERT INTO {table} DEFAULT VALUES;")
+        elapsed = time.perf_counter() - started
+        writes = conn.total_changes - changes
+    except Error as e:
+        logger.debug("Could not measure insert cost on '%s': %s", table, e)
+        return None
+    finally:
+        cursor.execute("ROLLBACK TO measure_insert;")
+        cursor.execute("RELEASE measure_insert;")
+    return elapsed * 1e6 / rows, writes / rows
@@ -7,7 +7,8 @@ from pathlib import Path
 
 def purge_old_logs(log_dir: str | Path, max_age_days: int):
     """
-    Delete .log files in log_dir older than `max_age_days`.
+    Delete .log files and their rotated .gz archives in log_dir
+    older than `max_age_days`.
     """
     logger = logging.getLogger(__name__)
     log_dir = Path(log_dir)
@@ -17,7 +18,8 @@ def purge_old_logs(log_dir: str | Path, max_age_days: int):
     now = time.time()
     cutoff = now - (max_age_days * 86400)
 
-    for log_file in log_dir.glob("*.log"):
+    candidates = [*log_dir.glob("*.log"), *log_dir.glob("*.log.*.gz")]
+    for log_file in candidates:
         try:
             if log_file.stat().st_mtime < cutoff:
                 log_file.unlink()
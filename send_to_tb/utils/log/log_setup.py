@@ -1,26 +1,87 @@
 # utils/log/log_setup.py
 
+import os
 import sys
+import gzip
+import queue
+import atexit
+import shutil
 import logging
 from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_logging(pkg_dir: Path, level: str, log_file: str) -> logging.Logger:
+_listener: QueueListener | None = None
+
+
+def setup_logging(
+    pkg_dir: Path,
+    level: str,
+    log_file: str,
+    max_bytes: int = 5 * 1024 * 1024,
+    backup_count: int = 5,
+    compress: bool = True,
+    stream=None
+) -> logging.Logger:
     """
     Configure logging with given level and output path.
     Logs are written to logs/<LOG_FILE> and also streamed to console.
+    Callers only put records on an in-memory queue; a QueueListener thread
+    formats them and writes the console and the file, so the send/delete
+    hot path never waits on the SD card. The file rotates at max_bytes,
+    keeping backup_count older files, gzip-compressed if compress is set.
     """
+    global _listener
     log_level = getattr(logging, level.upper(), logging.INFO)
 
     logs_dir = pkg_dir / "logs"
     logs_dir.mkdir(parents=True, exist_ok=True)
     log_path = logs_dir / log_file
 
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler(log_path, mode="a")
-        ]
+    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+    file_handler = RotatingFileHandler(
+        log_path, mode="a", maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
     )
+    if compress:
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
+    console_handler = logging.StreamHandler(stream or sys.stdout)
+    for handler in (console_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    record_queue = queue.SimpleQueue()
+    _listener = QueueListener(record_queue, console_handler, file_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    # The queued record only carries the message (with any traceback);
+    # the listener's handlers add the timestamp and level.
+    queue_handler = QueueHandler(record_queue)
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=log_level, handlers=[queue_handler], force=True)
     return logging.getLogger("send_to_thingsboard")
+
+
+def stop_logging() -> None:
+    """
+    Flush the queued records and stop the listener thread (also run at exit).
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def _gzip_namer(name: str) -> str:
+    """Rotated files are named <LOG_FILE>.<n>.gz."""
+    return f"{name}.gz"
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    """Compress the file being rotated out into dest, then remove it."""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)